@@ -0,0 +1,161 @@
+# alerts.py
+import operator
+
+# Districts shown in the dashboard alerts panel, in order
+ALERT_DISTRICTS = ['Ampara', 'Colombo', 'Galle', 'Kandy', 'Trincomalee']
+
+# Every rule applied to a forecast, by name, in evaluation order. A rule with
+# 'rows' yields the label of its first row whose tests all hold, else its
+# 'default'; a rule with 'points' adds up the points of every row whose tests
+# hold. A test is (variable, op, threshold) on a forecast value or on an
+# earlier rule's result; (variable, op, threshold, step) raises the threshold
+# by `step` per place of the district in the alerts panel ('position').
+# rules.classify() evaluates the same table over whole arrays.
+RULES = {
+    'weather_type': {
+        'rows': [
+            ('storm', [('rainfall', '>', 30), ('windspeed', '>', 30)]),
+            ('rainy', [('rainfall', '>', 30)]),
+            ('hot', [('temperature', '>', 33)]),
+            ('cold', [('temperature', '<', 22)]),
+            ('windy', [('windspeed', '>', 25)]),
+            ('rainy', [('rainfall', '>', 10)])
+        ],
+        'default': 'sunny'
+    },
+    'temperature_trend': {
+        'rows': [
+            ('Hot', [('temperature', '>', 33)]),
+            ('Cool', [('temperature', '<', 22)])
+        ],
+        'default': 'Normal'
+    },
+    'rainfall_status': {
+        'rows': [
+            ('Heavy', [('rainfall', '>', 50)]),
+            ('Moderate', [('rainfall', '>', 20)]),
+            ('Light', [('rainfall', '>', 0)])
+        ],
+        'default': 'None'
+    },
+    'wind_status': {
+        'rows': [
+            ('Storm', [('windspeed', '>', 40)]),
+            ('Strong', [('windspeed', '>', 20)])
+        ],
+        'default': 'Normal'
+    },
+    'severe': {
+        'rows': [
+            (True, [('temperature', '>', 35)]),
+            (True, [('rainfall', '>', 50)]),
+            (True, [('windspeed', '>', 40)])
+        ],
+        'default': False
+    },
+    # Thresholds rise along the panel so its districts show varied alert colours
+    'alert_level': {
+        'rows': [
+            ('high', [('temperature', '>', 33, 1)]),
+            ('high', [('rainfall', '>', 30, 5)]),
+            ('high', [('windspeed', '>', 25, 3)]),
+            ('medium', [('temperature', '>', 30, 1)]),
+            ('medium', [('rainfall', '>', 15, 5)]),
+            ('medium', [('windspeed', '>', 15, 3)])
+        ],
+        'default': 'low'
+    },
+    'risk_score': {
+        'points': [
+            (3, [('temperature', '>', 35)]),
+            (5, [('rainfall', '>', 50)]),
+            (2, [('rainfall', '>', 20)]),
+            (4, [('windspeed', '>', 40)]),
+            (1, [('windspeed', '>', 20)])
+        ]
+    },
+    'risk_level': {
+        'rows': [
+            ('High', [('risk_score', '>', 5)]),
+            ('Medium', [('risk_score', '>', 2)])
+        ],
+        'default': 'Low'
+    }
+}
+
+ALERT_MESSAGES = {
+    'high': "Severe weather warning",
+    'medium': "Weather watch",
+    'low': "Normal conditions"
+}
+
+OPERATORS = {'>': operator.gt, '>=': operator.ge, '<': operator.lt, '<=': operator.le}
+
+def _compile(tests):
+    # (variable, compare, threshold, step) with the operator looked up once
+    return [(variable, OPERATORS[op], threshold, step[0] if step else 0)
+            for variable, op, threshold, *step in tests]
+
+# Per rule: the earlier rules it reads, and its rows with compiled tests
+_COMPILED = {
+    rule: ([variable for _, tests in spec.get('rows') or spec['points']
+            for variable, *_ in tests if variable in RULES],
+           [(result, _compile(tests)) for result, tests in spec.get('rows') or spec['points']])
+    for rule, spec in RULES.items()
+}
+
+def _holds(tests, values):
+    for variable, compare, threshold, step in tests:
+        if step:
+            threshold = threshold + step * values.get('position', 0)
+        if not compare(values[variable], threshold):
+            return False
+    return True
+
+def evaluate(rule, values):
+    """Result of RULES[rule] for one forecast; `values` maps variables to numbers.
+
+    Earlier rules a test refers to are evaluated as needed.
+
+    >>> evaluate('risk_level', {'temperature': 36, 'rainfall': 25, 'windspeed': 10})
+    'Medium'
+    """
+    depends, rows = _COMPILED[rule]
+    for variable in depends:
+        if variable not in values:
+            values = {**values, variable: evaluate(variable, values)}
+    spec = RULES[rule]
+    if 'points' in spec:
+        return sum(points for points, tests in rows if _holds(tests, values))
+    for label, tests in rows:
+        if _holds(tests, values):
+            return label
+    return spec['default']
+
+def get_weather_type(prediction):
+    """Determine weather type from prediction"""
+    return evaluate('weather_type', prediction)
+
+def get_temperature_trend(temp):
+    """Get temperature trend indicator"""
+    return evaluate('temperature_trend', {'temperature': temp})
+
+def get_rainfall_status(rainfall):
+    """Get rainfall status"""
+    return evaluate('rainfall_status', {'rainfall': rainfall})
+
+def get_wind_status(windspeed):
+    """Get wind status"""
+    return evaluate('wind_status', {'windspeed': windspeed})
+
+def is_severe_weather(prediction):
+    """Check if weather is severe"""
+    return evaluate('severe', prediction)
+
+def get_alert_level(prediction, position=0):
+    """Alert level and message for the dashboard alerts panel.
+
+    Thresholds rise with the district's `position` in the panel.
+    """
+    level = evaluate('alert_level', {**prediction, 'position': position})
+    return level, ALERT_MESSAGES[level]
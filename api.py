@@ -0,0 +1,379 @@
+# api.py
+# Headless JSON forecast API for downstream systems (SMS alerting, rescue dispatch).
+# `app` is a plain WSGI application, so any WSGI server can host it;
+# `python api.py` serves it on a threaded keep-alive HTTP/1.1 server.
+import argparse
+import io
+import json
+import logging
+import sys
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import pandas as pd
+
+from forecast import (sri_lanka_districts, predict_weather, predict_weather_batch, island_snapshot,
+                      model_version, install_model_engine)
+from export import EXPORT_FORMATS, iter_forecast_export
+from alerts import ALERT_DISTRICTS, ALERT_MESSAGES, get_weather_type, is_severe_weather
+from rules import classify
+from ensemble import DEFAULT_MEMBERS, ensemble_forecast
+from scheduler import precompute_scheduler
+from telemetry import telemetry
+
+logger = logging.getLogger(__name__)
+
+# Largest district x date grid one batch request may ask for
+MAX_BATCH_CELLS = 25 * 366
+
+# Dates the API forecasts; the engine's lookback and pandas' nanosecond
+# timestamps both run out well outside these
+FIRST_DATE = pd.Timestamp('1900-01-01')
+LAST_DATE = pd.Timestamp('2200-12-31')
+
+# Largest district x date x member ensemble one request may ask for (the island for a month at 500 members)
+MAX_ENSEMBLE_DRAWS = 25 * 31 * 500
+
+class BadRequest(ValueError):
+    """Raised for requests the API cannot answer; reported as HTTP 400"""
+
+class Stream:
+    """Handler result sent as a streamed download instead of one JSON document"""
+
+    def __init__(self, chunks, content_type, filename):
+        self.chunks = chunks
+        self.content_type = content_type
+        self.filename = filename
+
+def load_engine(warm_up=False):
+    """Install the trained model engine once per process, as the app does"""
+    try:
+        return install_model_engine(warm_up=warm_up)
+    except OSError as e:
+        logger.warning("Model files could not be loaded (%s); serving simulated forecasts", e)
+        return None
+
+def _values(value, name):
+    """A JSON body field as a list: a string is one value, other non-lists are rejected"""
+    if isinstance(value, str):
+        return [value]
+    if not isinstance(value, list):
+        raise BadRequest(f"{name} must be a list or a comma-separated string")
+    return value
+
+def _districts(values):
+    """Validate a district list; an empty list means every district"""
+    districts = [d.strip() for value in values for d in str(value).split(',') if d.strip()]
+    unknown = [d for d in districts if d not in sri_lanka_districts]
+    if unknown:
+        raise BadRequest(f"Unknown districts: {', '.join(unknown)}")
+    return districts or list(sri_lanka_districts)
+
+def _days(value):
+    """Validate a day count: a whole number from 1 to MAX_BATCH_CELLS"""
+    # JSON gives ints, floats and bools; int() would truncate 2.7 and accept true
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        raise BadRequest("days must be a whole number")
+    try:
+        days = int(value)
+    except (TypeError, ValueError):
+        raise BadRequest("days must be a whole number") from None
+    if not 1 <= days <= MAX_BATCH_CELLS:
+        raise BadRequest(f"days must be between 1 and {MAX_BATCH_CELLS}")
+    return days
+
+def _timestamp(value):
+    """Parse a date from FIRST_DATE to LAST_DATE"""
+    try:
+        date = pd.Timestamp(value)
+    except (TypeError, ValueError) as e:
+        raise BadRequest(f"Invalid date: {e}") from None
+    if not FIRST_DATE <= date <= LAST_DATE:
+        raise BadRequest(f"Dates must be between {FIRST_DATE:%Y-%m-%d} and {LAST_DATE:%Y-%m-%d}")
+    return date
+
+def _dates(values, start=None, days=None):
+    """Validate dates given as a list or as start + days; defaults to today"""
+    dates = [d.strip() for value in values for d in str(value).split(',') if d.strip()]
+    # Checked before the range is built, which would otherwise allocate every date
+    periods = 1 if days is None else _days(days)
+    if not dates and (start or days is not None):
+        first = _timestamp(start or datetime.now().date())
+        dates = pd.date_range(first, periods=periods, freq='D')
+    parsed = [_timestamp(d).strftime("%Y-%m-%d") for d in dates]
+    return parsed or [datetime.now().strftime("%Y-%m-%d")]
+
+def _with_alerts(record):
+    """Attach the weather type and severity flags the app shows"""
+    record['weather_type'] = get_weather_type(record)
+    record['severe'] = is_severe_weather(record)
+    return record
+
+def _records_with_alerts(frame, position=None):
+    """Records of a forecast frame with the weather type and severity flags, classified in one pass.
+
+    With `position` (each row's place in the alerts panel) alert levels
+    and messages are attached too.
+    """
+    rules = ['weather_type', 'severe'] + ([] if position is None else ['alert_level'])
+    classes = classify(frame, rules, 0 if position is None else position)
+    columns = {rule: values.tolist() for rule, values in classes.items()}
+    if position is not None:
+        columns['alert_message'] = [ALERT_MESSAGES[level] for level in columns['alert_level']]
+    return frame.assign(**columns).to_dict('records')
+
+def get_health(params, body):
+    return {'status': 'ok', 'model_version': model_version(), 'precompute': precompute_scheduler.status()}
+
+def get_districts(params, body):
+    return {'districts': [{'district': d, **coords} for d, coords in sri_lanka_districts.items()]}
+
+def get_forecast(params, body):
+    district = _districts(params.get('district', []))
+    if len(district) != 1:
+        raise BadRequest("Pass exactly one district")
+    date = _dates(params.get('date', []))[0]
+    return _with_alerts(predict_weather(district[0], date))
+
+def get_forecast_batch(params, body):
+    if body:
+        districts = _districts(_values(body.get('districts', []), 'districts'))
+        dates = _dates(_values(body.get('dates', []), 'dates'), body.get('start'), body.get('days'))
+    else:
+        districts = _districts(params.get('districts', []))
+        dates = _dates(params.get('dates', []), params.get('start', [None])[0], params.get('days', [None])[0])
+    if len(districts) * len(dates) > MAX_BATCH_CELLS:
+        raise BadRequest(f"At most {MAX_BATCH_CELLS} district x date cells per request")
+    records = _records_with_alerts(predict_weather_batch(districts, dates))
+    return {'model_version': model_version(), 'forecasts': records}
+
+def get_forecast_ensemble(params, body):
+    districts = _districts(params.get('districts', []))
+    dates = _dates(params.get('dates', []), params.get('start', [None])[0], params.get('days', [None])[0])
+    try:
+        members = int(params.get('members', [DEFAULT_MEMBERS])[0])
+        q = [float(p) for p in params.get('q', ['10,50,90'])[0].split(',') if p.strip()]
+    except ValueError:
+        raise BadRequest("members must be a whole number and q a comma-separated list of percentiles")
+    if len(districts) * len(dates) * members > MAX_ENSEMBLE_DRAWS:
+        raise BadRequest(f"At most {MAX_ENSEMBLE_DRAWS} district x date x member draws per request")
+    if not all(0 <= p <= 100 for p in q):
+        raise BadRequest("Percentiles must be between 0 and 100")
+    try:
+        records = ensemble_forecast(districts, dates, members).frame(q).to_dict('records')
+    except ValueError as e:
+        raise BadRequest(str(e))
+    return {'model_version': model_version(), 'forecasts': records}
+
+def get_alerts(params, body):
+    districts = _districts(params.get('districts', [])) if params.get('districts') else ALERT_DISTRICTS
+    island = island_snapshot(_dates(params.get('date', []))[0])
+    frame = island.frame(districts).drop(columns=['lat', 'lon'])
+    return {'model_version': model_version(), 'alerts': _records_with_alerts(frame, range(len(districts)))}
+
+def get_forecast_export(params, body):
+    districts = _districts(params.get('districts', []))
+    fmt = params.get('format', ['ndjson'])[0]
+    start = _dates(params.get('start', []))[0]
+    if params.get('end'):
+        end = _timestamp(params['end'][0])
+    else:
+        end = _timestamp(pd.Timestamp(start) + pd.Timedelta(days=_days(params.get('days', ['1'])[0]) - 1))
+    try:
+        chunks = iter_forecast_export(districts, start, end, fmt)
+    except ValueError as e:
+        raise BadRequest(str(e))
+    return Stream(chunks, EXPORT_FORMATS[fmt], f"forecast_{start}_{end:%Y-%m-%d}.{fmt}")
+
+def get_metrics(params, body):
+    # Plain text in the Prometheus exposition format
+    return telemetry.prometheus_text()
+
+# (method, path) -> handler(params, body)
+ROUTES = {
+    ('GET', '/health'): get_health,
+    ('GET', '/districts'): get_districts,
+    ('GET', '/forecast'): get_forecast,
+    ('GET', '/forecast/batch'): get_forecast_batch,
+    ('GET', '/forecast/ensemble'): get_forecast_ensemble,
+    ('POST', '/forecast/batch'): get_forecast_batch,
+    ('GET', '/alerts'): get_alerts,
+    ('GET', '/forecast/export'): get_forecast_export,
+    ('GET', '/metrics'): get_metrics
+}
+
+def _json_response(start_response, status, payload):
+    data = json.dumps(payload).encode('utf-8')
+    start_response(status, [('Content-Type', 'application/json'),
+                            ('Content-Length', str(len(data)))])
+    return [data]
+
+def _content_length(value):
+    try:
+        length = int(value or 0)
+    except ValueError:
+        raise BadRequest("Content-Length must be a whole number") from None
+    if length < 0:
+        raise BadRequest("Content-Length must not be negative")
+    return length
+
+def app(environ, start_response):
+    """WSGI entry point"""
+    method = environ['REQUEST_METHOD']
+    path = environ.get('PATH_INFO', '/').rstrip('/') or '/'
+    handler = ROUTES.get((method, path))
+    if handler is None:
+        if any(route_path == path for _, route_path in ROUTES):
+            return _json_response(start_response, '405 Method Not Allowed', {'error': 'Method not allowed'})
+        return _json_response(start_response, '404 Not Found', {'error': f'No such endpoint: {path}'})
+
+    params = parse_qs(environ.get('QUERY_STRING', ''))
+    body = None
+    try:
+        length = _content_length(environ.get('CONTENT_LENGTH'))
+        if length:
+            body = json.loads(environ['wsgi.input'].read(length))
+            if not isinstance(body, dict):
+                raise BadRequest("Request body must be a JSON object")
+        with telemetry.span(f'api_{handler.__name__}'):
+            result = handler(params, body)
+        if isinstance(result, str):
+            data = result.encode('utf-8')
+            start_response('200 OK', [('Content-Type', 'text/plain; version=0.0.4; charset=utf-8'),
+                                      ('Content-Length', str(len(data)))])
+            return [data]
+        if isinstance(result, Stream):
+            # No Content-Length: the server sends it with chunked transfer encoding
+            start_response('200 OK', [('Content-Type', result.content_type),
+                                      ('Content-Disposition', f'attachment; filename="{result.filename}"')])
+            return (chunk.encode('utf-8') for chunk in result.chunks)
+        return _json_response(start_response, '200 OK', result)
+    except (BadRequest, json.JSONDecodeError) as e:
+        return _json_response(start_response, '400 Bad Request', {'error': str(e)})
+    except Exception:
+        logger.exception("Unhandled error serving %s %s", method, path)
+        return _json_response(start_response, '500 Internal Server Error', {'error': 'Internal server error'})
+
+class WSGIRequestHandler(BaseHTTPRequestHandler):
+    """Minimal HTTP/1.1 bridge to a WSGI app with persistent connections.
+
+    Responses without a Content-Length are streamed with chunked transfer
+    encoding, one chunk per item the app yields.
+    """
+
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out as separate writes; don't let Nagle hold the body back
+    disable_nagle_algorithm = True
+    wsgi_app = staticmethod(app)
+
+    def _run(self):
+        path, _, query = self.path.partition('?')
+        content_length = self.headers.get('Content-Length') or '0'
+        try:
+            length = _content_length(content_length)
+        except BadRequest:
+            # Passed on as is for app() to answer 400; the unread body can't
+            # be skipped without its length, so the connection closes after
+            length = 0
+            self.close_connection = True
+        environ = {
+            'REQUEST_METHOD': self.command,
+            'PATH_INFO': path,
+            'QUERY_STRING': query,
+            'CONTENT_TYPE': self.headers.get('Content-Type', ''),
+            'CONTENT_LENGTH': content_length,
+            'SERVER_NAME': self.server.server_address[0],
+            'SERVER_PORT': str(self.server.server_address[1]),
+            'SERVER_PROTOCOL': self.request_version,
+            'REMOTE_ADDR': self.client_address[0],
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': io.BytesIO(self.rfile.read(length) if length else b''),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False
+        }
+        for name, value in self.headers.items():
+            key = 'HTTP_' + name.upper().replace('-', '_')
+            if key not in ('HTTP_CONTENT_TYPE', 'HTTP_CONTENT_LENGTH'):
+                environ[key] = value
+
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'], response['headers'] = status, headers
+
+        result = self.wsgi_app(environ, start_response)
+        try:
+            headers = dict((name.lower(), value) for name, value in response['headers'])
+            code, _, reason = response['status'].partition(' ')
+            self.send_response(int(code), reason)
+            for name, value in response['headers']:
+                self.send_header(name, value)
+
+            if 'content-length' in headers:
+                self.end_headers()
+                for data in result:
+                    self.wfile.write(data)
+                return
+
+            chunked = self.request_version == 'HTTP/1.1'
+            if chunked:
+                self.send_header('Transfer-Encoding', 'chunked')
+            else:
+                # HTTP/1.0 clients read until the connection closes
+                self.close_connection = True
+            self.end_headers()
+            try:
+                for data in result:
+                    if data and chunked:
+                        self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+                    elif data:
+                        self.wfile.write(data)
+            except Exception:
+                # Too late for an error status; dropping the connection tells the client
+                logger.exception("Stream for %s failed part way", path)
+                self.close_connection = True
+                return
+            if chunked:
+                self.wfile.write(b'0\r\n\r\n')
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+
+    do_GET = _run
+    do_POST = _run
+
+    def log_message(self, format, *args):
+        logger.info("%s - %s", self.address_string(), format % args)
+
+def serve(host='127.0.0.1', port=8000, warm_up=True):
+    """Run the API on a threaded keep-alive HTTP server until interrupted"""
+    engine = load_engine(warm_up)
+    precompute_scheduler.start()
+    if engine is not None:
+        from registry import model_watcher  # mock mode never imports the model code
+        model_watcher.start()
+    server = ThreadingHTTPServer((host, port), WSGIRequestHandler)
+    server.daemon_threads = True
+    logger.info("Forecast API (model %s) listening on http://%s:%d", model_version(), host, port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve weather forecasts as JSON")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--no-warmup', action='store_true', help="Load the model on the first request instead")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    serve(args.host, args.port, warm_up=not args.no_warmup)
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,30 @@
 # app.py
 import streamlit as st
-import pandas as pd
-import numpy as np
-import plotly.graph_objects as go
-import plotly.express as px
+import hashlib
+import os
+import sys
 from datetime import datetime, timedelta
-import pickle
-import joblib
-# Removed TensorFlow import - using sklearn instead
+from lazy import LazyModule
+from districts import sri_lanka_districts
+from telemetry import telemetry, timed
+import jobs
+from alerts import (ALERT_DISTRICTS, ALERT_MESSAGES, get_weather_type, get_temperature_trend,
+                    get_rainfall_status, get_wind_status)
+
+# Stylesheets served by Streamlit at app/static/ (see .streamlit/config.toml)
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+
+# Days the bulk export's download button may cover. Streamlit holds a
+# download in memory, so longer ranges go through the streaming CLI or API.
+MAX_DOWNLOAD_DAYS = 31
+
+# Heavy modules are imported on first use, so pages that never chart or
+# forecast (Rescue, About) paint without loading pandas or the model
+pd = LazyModule('pandas')
+np = LazyModule('numpy')
+go = LazyModule('plotly.graph_objects')
+px = LazyModule('plotly.express')
+rules = LazyModule('rules')
 
 # Page configuration
 st.set_page_config(
@@ -20,52 +37,51 @@ st.set_page_config(
 # Load your trained model and components
 @st.cache_resource
 def load_weather_model():
-    """Load trained weather model - using mock data for demo"""
-    # For demo purposes, we'll use mock model components
-    # Replace these with your actual model files when available
+    """Set up the trained LSTM engine; its artifacts load on the first forecast"""
+    # WEATHER_FORECAST_MODE=mock keeps the simulated generator for every district;
+    # WEATHER_MODEL_WARMUP=1 loads the model at startup instead of on the first forecast
+    from forecast import install_model_engine
     try:
-        # model = joblib.load('weather_model.pkl')  # Use sklearn model instead
-        # feature_scaler = joblib.load('feature_scaler.pkl')
-        # target_scaler = joblib.load('target_scaler.pkl')
-        # return model, feature_scaler, target_scaler
-        
-        # Mock components for demo
-        return None, None, None
-    except FileNotFoundError:
-        st.warning("Model files not found. Using demo mode with simulated predictions.")
-        return None, None, None
-
-# Load components
-model, feature_scaler, target_scaler = load_weather_model()
-
-# District data for Sri Lanka
-sri_lanka_districts = {
-    'Ampara': {'lat': 7.2833, 'lon': 81.6667},
-    'Colombo': {'lat': 6.9271, 'lon': 79.8612},
-    'Kandy': {'lat': 7.2906, 'lon': 80.6337},
-    'Galle': {'lat': 6.0329, 'lon': 80.2168},
-    'Jaffna': {'lat': 9.6615, 'lon': 80.0255},
-    'Matara': {'lat': 5.9556, 'lon': 80.5483},
-    'Trincomalee': {'lat': 8.5874, 'lon': 81.2152},
-    'Anuradhapura': {'lat': 8.3114, 'lon': 80.4037},
-    'Badulla': {'lat': 6.9934, 'lon': 81.0550},
-    'Batticaloa': {'lat': 7.7167, 'lon': 81.7000},
-    'Gampaha': {'lat': 7.0917, 'lon': 79.9997},
-    'Hambantota': {'lat': 6.1245, 'lon': 81.1185},
-    'Kalutara': {'lat': 6.5894, 'lon': 79.9573},
-    'Kegalle': {'lat': 7.2533, 'lon': 80.3464},
-    'Kilinochchi': {'lat': 9.3961, 'lon': 80.3989},
-    'Kurunegala': {'lat': 7.4863, 'lon': 80.3623},
-    'Mannar': {'lat': 8.9816, 'lon': 79.9047},
-    'Matale': {'lat': 7.4675, 'lon': 80.6234},
-    'Moneragala': {'lat': 6.8724, 'lon': 81.3507},
-    'Mullaitivu': {'lat': 9.2673, 'lon': 80.8142},
-    'Nuwara Eliya': {'lat': 6.9497, 'lon': 80.7891},
-    'Polonnaruwa': {'lat': 7.9329, 'lon': 81.0081},
-    'Puttalam': {'lat': 8.0374, 'lon': 79.8283},
-    'Ratnapura': {'lat': 6.7057, 'lon': 80.3847},
-    'Vavuniya': {'lat': 8.7514, 'lon': 80.4971}
-}
+        return install_model_engine(warm_up=os.environ.get("WEATHER_MODEL_WARMUP", "0") == "1")
+    except OSError as e:
+        st.warning(f"Model files could not be loaded ({e}). Using demo mode with simulated predictions.")
+        return None
+
+def _install_model(module):
+    # Forecasts and the figures keyed on model_version() need the engine in place
+    load_weather_model()
+
+forecast = LazyModule('forecast', on_load=_install_model)
+export = LazyModule('export', on_load=_install_model)
+figures = LazyModule('figures', on_load=_install_model)
+ensemble = LazyModule('ensemble', on_load=_install_model)
+# Its worker processes install the model themselves
+scenarios = LazyModule('scenarios')
+
+@st.cache_resource
+def start_precompute():
+    """Start the process's background forecast precomputation, with the model the pages use"""
+    load_weather_model()
+    from scheduler import precompute_scheduler
+    return precompute_scheduler.add_task(warm_figures).start()
+
+@st.cache_resource
+def start_model_watcher():
+    """Swap in the model registry's active version whenever it changes, without a restart"""
+    if load_weather_model() is None:
+        return None  # mock mode: there is no model to swap
+    from registry import model_watcher
+    return model_watcher.start()
+
+def warm_figures(dates):
+    """Figures of the precomputed days that pages would otherwise build on a rerun"""
+    figures.cached_figure(prediction_confidence_figure, dates[0].strftime("%Y-%m-%d"))
+
+def load_weather_history():
+    """The memory-mapped daily observations of the active model; built from predictor.pkl on first use"""
+    # Opened once per process and reopened after a model reload
+    from history import history_store
+    return history_store()
 
 # Weather icons dictionary
 weather_icons = {
@@ -78,458 +94,38 @@ weather_icons = {
     'cold': '❄️'
 }
 
+# Styles
+@st.cache_resource
+def load_stylesheet(name, modified):
+    """CSS text of static/<name> and its URL, versioned by a hash of the contents.
+
+    `modified` (the file's mtime) is only part of the cache key, so edits
+    are picked up without a restart.
+    """
+    with open(os.path.join(STATIC_DIR, name), encoding='utf-8') as f:
+        css = f.read()
+    version = hashlib.sha256(css.encode('utf-8')).hexdigest()[:12]
+    return css, f"app/static/{name}?v={version}"
+
+@timed(name='styles')
+def inject_styles(name='app.css'):
+    """Link static/<name>; what this sends per rerun is counted as style_bytes.
+
+    The browser fetches the stylesheet once per version and then keeps it.
+    Without server.enableStaticServing the CSS is sent inline instead.
+    """
+    css, url = load_stylesheet(name, os.stat(os.path.join(STATIC_DIR, name)).st_mtime_ns)
+    if st.get_option("server.enableStaticServing"):
+        html = f'<link rel="stylesheet" href="{url}">'
+    else:
+        html = f"<style>\n{css}</style>"
+    telemetry.count('style_bytes', len(html.encode('utf-8')))
+    st.markdown(html, unsafe_allow_html=True)
+
 # Navigation
 def main():
-    # Stunning Navigation Bar CSS - Focus on Sidebar Only
-    st.markdown("""
-    <style>
-    /* Import premium fonts */
-    @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700;800&display=swap');
-    
-    /* Hide default Streamlit branding */
-    #MainMenu {visibility: hidden;}
-    footer {visibility: hidden;}
-    
-    /* STUNNING SIDEBAR NAVIGATION */
-    .css-1d391kg, .css-1lcbmhc, .css-17eq0hr, .css-1y4p8pa {
-        background: linear-gradient(145deg, #667eea 0%, #764ba2 30%, #f093fb 70%, #f5576c 100%) !important;
-        box-shadow: 0 25px 80px rgba(102, 126, 234, 0.6) !important;
-        border-right: 1px solid rgba(255, 255, 255, 0.2) !important;
-    }
-    
-    .sidebar .sidebar-content {
-        background: transparent !important;
-        color: white !important;
-        padding: 1rem 0.8rem !important;
-    }
-    
-    /* Fix sidebar container margins */
-    .css-1lcbmhc .css-1outpf7 {
-        padding-top: 1rem !important;
-        padding-left: 1rem !important;
-        padding-right: 1rem !important;
-    }
-    
-    /* Navigation Header - Ultra Premium */
-    .nav-brand {
-        background: linear-gradient(135deg, rgba(255,255,255,0.25) 0%, rgba(255,255,255,0.1) 100%);
-        backdrop-filter: blur(20px);
-        border: 2px solid rgba(255,255,255,0.3);
-        border-radius: 25px;
-        padding: 1.8rem 1.2rem;
-        margin: 0 0 1.5rem 0;
-        text-align: center;
-        box-shadow: 
-            0 20px 60px rgba(0,0,0,0.2),
-            inset 0 1px 0 rgba(255,255,255,0.4);
-        position: relative;
-        overflow: hidden;
-    }
-    
-    .nav-brand::before {
-        content: '';
-        position: absolute;
-        top: -50%;
-        left: -50%;
-        width: 200%;
-        height: 200%;
-        background: linear-gradient(45deg, transparent, rgba(255,255,255,0.1), transparent);
-        transform: rotate(45deg);
-        animation: shimmer 3s infinite;
-    }
-    
-    @keyframes shimmer {
-        0% { transform: translateX(-100%) translateY(-100%) rotate(45deg); }
-        100% { transform: translateX(100%) translateY(100%) rotate(45deg); }
-    }
-    
-    .nav-brand h1 {
-        color: white;
-        font-family: 'Inter', sans-serif;
-        font-weight: 800;
-        font-size: 1.8rem;
-        margin: 0;
-        text-shadow: 0 4px 20px rgba(0,0,0,0.4);
-        background: linear-gradient(45deg, #fff, #f0f8ff, #e6f3ff);
-        -webkit-background-clip: text;
-        -webkit-text-fill-color: transparent;
-        background-clip: text;
-        position: relative;
-        z-index: 2;
-    }
-    
-    .nav-subtitle {
-        color: rgba(255, 255, 255, 0.95);
-        font-family: 'Inter', sans-serif;
-        font-size: 0.9rem;
-        margin-top: 0.8rem;
-        font-weight: 400;
-        letter-spacing: 1px;
-        text-transform: uppercase;
-        position: relative;
-        z-index: 2;
-    }
-    
-    /* Navigation Menu Title */
-    .nav-menu-title {
-        color: rgba(255, 255, 255, 0.9) !important;
-        font-family: 'Inter', sans-serif !important;
-        font-weight: 600 !important;
-        font-size: 1.1rem !important;
-        margin: 1.5rem 0 1rem 0 !important;
-        text-shadow: 0 2px 10px rgba(0,0,0,0.3) !important;
-        text-transform: uppercase !important;
-        letter-spacing: 1px !important;
-    }
-    
-    /* Radio Button Container - Ultra Modern */
-    .stRadio > div {
-        background: rgba(255, 255, 255, 0.08) !important;
-        border-radius: 25px !important;
-        padding: 1.2rem !important;
-        backdrop-filter: blur(20px) !important;
-        border: 1px solid rgba(255, 255, 255, 0.2) !important;
-        box-shadow: 
-            0 15px 50px rgba(0,0,0,0.15),
-            inset 0 1px 0 rgba(255,255,255,0.2) !important;
-        margin: 0 0 1.5rem 0 !important;
-    }
-    
-    /* Show the radio button label with beautiful styling */
-    .stRadio > div > label {
-        color: rgba(255, 255, 255, 0.9) !important;
-        font-family: 'Inter', sans-serif !important;
-        font-weight: 600 !important;
-        font-size: 1rem !important;
-        margin-bottom: 1rem !important;
-        text-shadow: 0 2px 10px rgba(0,0,0,0.3) !important;
-        text-transform: uppercase !important;
-        letter-spacing: 0.5px !important;
-        display: block !important;
-    }
-    
-    /* Ensure radio options are visible */
-    .stRadio > div > div {
-        gap: 0.5rem !important;
-        display: flex !important;
-        flex-direction: column !important;
-    }
-    
-    .stRadio > div > div > div {
-        margin: 0.3rem 0 !important;
-        display: block !important;
-    }
-    
-    .stRadio > div > div > div > div {
-        background: rgba(255, 255, 255, 0.15) !important;
-        border-radius: 15px !important;
-        margin: 0 !important;
-        padding: 1rem 1.2rem !important;
-        transition: all 0.4s cubic-bezier(0.4, 0, 0.2, 1) !important;
-        border: 1px solid rgba(255, 255, 255, 0.2) !important;
-        backdrop-filter: blur(15px) !important;
-        cursor: pointer !important;
-        display: flex !important;
-        align-items: center !important;
-        width: 100% !important;
-        min-height: 50px !important;
-    }
-    
-    /* Ensure all text elements are visible */
-    .stRadio > div > div > div > div > label {
-        color: rgba(255, 255, 255, 0.95) !important;
-        font-family: 'Inter', sans-serif !important;
-        font-weight: 500 !important;
-        font-size: 0.95rem !important;
-        margin: 0 !important;
-        cursor: pointer !important;
-        display: flex !important;
-        align-items: center !important;
-        width: 100% !important;
-        text-shadow: 0 1px 3px rgba(0,0,0,0.3) !important;
-    }
-    
-    /* Force visibility of all text content */
-    .stRadio > div > div > div > div > label > *,
-    .stRadio > div > div > div > div > label > span,
-    .stRadio > div > div > div > div > label > div:last-child {
-        color: rgba(255, 255, 255, 0.95) !important;
-        font-family: 'Inter', sans-serif !important;
-        font-weight: 500 !important;
-        font-size: 0.95rem !important;
-        display: inline !important;
-        visibility: visible !important;
-    }
-    
-    /* Hide only the radio circle */
-    .stRadio > div > div > div > div > label > div:first-child {
-        display: none !important;
-    }
-    
-    /* Hover Effects - Stunning Animation */
-    .stRadio > div > div > div > div:hover {
-        background: rgba(255, 255, 255, 0.25) !important;
-        transform: translateX(8px) scale(1.02) !important;
-        box-shadow: 
-            0 20px 60px rgba(0,0,0,0.25),
-            0 0 30px rgba(255,255,255,0.2) !important;
-        border: 1px solid rgba(255, 255, 255, 0.4) !important;
-    }
-    
-    .stRadio > div > div > div > div:hover > label,
-    .stRadio > div > div > div > div:hover > label > span {
-        color: white !important;
-        font-weight: 600 !important;
-    }
-    
-    /* Active/Selected State - Spectacular */
-    .stRadio > div > div > div > div[data-checked="true"] {
-        background: linear-gradient(135deg, #ff6b6b 0%, #ffa500 50%, #ff8a80 100%) !important;
-        box-shadow: 
-            0 25px 80px rgba(255, 107, 107, 0.6),
-            0 0 40px rgba(255, 165, 0, 0.4),
-            inset 0 1px 0 rgba(255,255,255,0.3) !important;
-        transform: translateX(12px) scale(1.05) !important;
-        border: 1px solid rgba(255, 255, 255, 0.6) !important;
-    }
-    
-    .stRadio > div > div > div > div[data-checked="true"] > label,
-    .stRadio > div > div > div > div[data-checked="true"] > label > span {
-        color: white !important;
-        font-weight: 700 !important;
-        text-shadow: 0 2px 10px rgba(0,0,0,0.4) !important;
-    }
-    
-    .stRadio > div > div > div > div[data-checked="true"]::before {
-        content: '';
-        position: absolute;
-        top: 0;
-        left: -100%;
-        width: 100%;
-        height: 100%;
-        background: linear-gradient(90deg, transparent, rgba(255,255,255,0.3), transparent);
-        animation: slideIn 0.8s ease-out;
-    }
-    
-    @keyframes slideIn {
-        0% { left: -100%; }
-        100% { left: 100%; }
-    }
-    
-    /* Individual Radio Options - Premium Design */
-    .stRadio > div > div > div > div {
-        background: rgba(255, 255, 255, 0.15) !important;
-        border-radius: 15px !important;
-        margin: 0.5rem 0 !important;
-        padding: 1rem 1.2rem !important;
-        transition: all 0.4s cubic-bezier(0.4, 0, 0.2, 1) !important;
-        border: 1px solid rgba(255, 255, 255, 0.2) !important;
-        backdrop-filter: blur(15px) !important;
-        font-family: 'Inter', sans-serif !important;
-        font-weight: 500 !important;
-        font-size: 0.95rem !important;
-        color: rgba(255, 255, 255, 0.95) !important;
-        text-shadow: 0 1px 3px rgba(0,0,0,0.3) !important;
-        position: relative !important;
-        overflow: hidden !important;
-        cursor: pointer !important;
-        display: flex !important;
-        align-items: center !important;
-    }
-    
-    /* Show the radio button text properly */
-    .stRadio > div > div > div > div > label {
-        color: rgba(255, 255, 255, 0.95) !important;
-        font-family: 'Inter', sans-serif !important;
-        font-weight: 500 !important;
-        font-size: 0.95rem !important;
-        margin: 0 !important;
-        cursor: pointer !important;
-        display: flex !important;
-        align-items: center !important;
-        width: 100% !important;
-    }
-    
-    /* Hide the default radio circle */
-    .stRadio > div > div > div > div > label > div {
-        display: none !important;
-    }
-    
-    /* Hover Effects - Stunning Animation */
-    .stRadio > div > div > div > div:hover {
-        background: rgba(255, 255, 255, 0.25) !important;
-        transform: translateX(8px) scale(1.02) !important;
-        box-shadow: 
-            0 20px 60px rgba(0,0,0,0.25),
-            0 0 30px rgba(255,255,255,0.2) !important;
-        border: 1px solid rgba(255, 255, 255, 0.4) !important;
-    }
-    
-    .stRadio > div > div > div > div:hover > label {
-        color: white !important;
-        font-weight: 600 !important;
-    }
-    
-    /* Active/Selected State - Spectacular */
-    .stRadio > div > div > div > div[data-checked="true"] {
-        background: linear-gradient(135deg, #ff6b6b 0%, #ffa500 50%, #ff8a80 100%) !important;
-        box-shadow: 
-            0 25px 80px rgba(255, 107, 107, 0.6),
-            0 0 40px rgba(255, 165, 0, 0.4),
-            inset 0 1px 0 rgba(255,255,255,0.3) !important;
-        transform: translateX(12px) scale(1.05) !important;
-        border: 1px solid rgba(255, 255, 255, 0.6) !important;
-    }
-    
-    .stRadio > div > div > div > div[data-checked="true"] > label {
-        color: white !important;
-        font-weight: 700 !important;
-        text-shadow: 0 2px 10px rgba(0,0,0,0.4) !important;
-    }
-    
-    .stRadio > div > div > div > div[data-checked="true"]::before {
-        content: '';
-        position: absolute;
-        top: 0;
-        left: -100%;
-        width: 100%;
-        height: 100%;
-        background: linear-gradient(90deg, transparent, rgba(255,255,255,0.3), transparent);
-        animation: slideIn 0.8s ease-out;
-    }
-    
-    @keyframes slideIn {
-        0% { left: -100%; }
-        100% { left: 100%; }
-    }
-        transition: all 0.5s cubic-bezier(0.4, 0, 0.2, 1) !important;
-        border: 1px solid rgba(255, 255, 255, 0.15) !important;
-        backdrop-filter: blur(15px) !important;
-        font-family: 'Inter', sans-serif !important;
-        font-weight: 500 !important;
-        font-size: 0.95rem !important;
-        color: rgba(255, 255, 255, 0.9) !important;
-        text-shadow: 0 1px 3px rgba(0,0,0,0.3) !important;
-        position: relative !important;
-        overflow: hidden !important;
-    }
-    
-    /* Hover Effects - Stunning Animation */
-    .stRadio > div > div > div > div:hover {
-        background: rgba(255, 255, 255, 0.2) !important;
-        transform: translateX(10px) scale(1.03) !important;
-        box-shadow: 
-            0 20px 60px rgba(0,0,0,0.25),
-            0 0 30px rgba(255,255,255,0.2) !important;
-        border: 1px solid rgba(255, 255, 255, 0.4) !important;
-        color: white !important;
-    }
-    
-    /* Active/Selected State - Spectacular */
-    .stRadio > div > div > div > div[data-checked="true"] {
-        background: linear-gradient(135deg, #ff6b6b 0%, #ffa500 50%, #ff8a80 100%) !important;
-        box-shadow: 
-            0 25px 80px rgba(255, 107, 107, 0.6),
-            0 0 40px rgba(255, 165, 0, 0.4),
-            inset 0 1px 0 rgba(255,255,255,0.3) !important;
-        transform: translateX(15px) scale(1.05) !important;
-        border: 1px solid rgba(255, 255, 255, 0.6) !important;
-        color: white !important;
-        font-weight: 700 !important;
-        text-shadow: 0 2px 10px rgba(0,0,0,0.4) !important;
-    }
-    
-    .stRadio > div > div > div > div[data-checked="true"]::before {
-        content: '';
-        position: absolute;
-        top: 0;
-        left: -100%;
-        width: 100%;
-        height: 100%;
-        background: linear-gradient(90deg, transparent, rgba(255,255,255,0.3), transparent);
-        animation: slideIn 0.8s ease-out;
-    }
-    
-    @keyframes slideIn {
-        0% { left: -100%; }
-        100% { left: 100%; }
-    }
-    
-    /* Sidebar Stats Section */
-    .sidebar-stats {
-        background: rgba(255, 255, 255, 0.1);
-        backdrop-filter: blur(20px);
-        border-radius: 20px;
-        padding: 1.2rem;
-        margin: 1rem 0;
-        border: 1px solid rgba(255, 255, 255, 0.2);
-        box-shadow: 
-            0 15px 40px rgba(0,0,0,0.15),
-            inset 0 1px 0 rgba(255,255,255,0.2);
-    }
-    
-    .sidebar-stats h3 {
-        color: white;
-        font-family: 'Inter', sans-serif;
-        font-weight: 600;
-        margin: 0 0 1rem 0;
-        font-size: 0.95rem;
-        text-transform: uppercase;
-        letter-spacing: 0.5px;
-        text-shadow: 0 2px 10px rgba(0,0,0,0.3);
-    }
-    
-    /* Sidebar Metrics */
-    .sidebar .sidebar-content .metric-container {
-        background: rgba(255, 255, 255, 0.08) !important;
-        border-radius: 12px !important;
-        padding: 0.6rem !important;
-        margin: 0.2rem 0 !important;
-        border: 1px solid rgba(255, 255, 255, 0.15) !important;
-        transition: all 0.3s ease !important;
-    }
-    
-    .sidebar .sidebar-content .metric-container:hover {
-        background: rgba(255, 255, 255, 0.15) !important;
-        transform: scale(1.02) !important;
-    }
-    
-    /* Emergency Contacts Styling */
-    .emergency-contacts {
-        background: linear-gradient(135deg, rgba(255,107,107,0.2) 0%, rgba(255,69,0,0.2) 100%);
-        border-radius: 15px;
-        padding: 1rem;
-        border: 1px solid rgba(255, 107, 107, 0.3);
-        margin: 0;
-        line-height: 1.6;
-    }
-    
-    .emergency-contacts code {
-        background: rgba(255, 255, 255, 0.2) !important;
-        color: white !important;
-        padding: 0.2rem 0.5rem !important;
-        border-radius: 6px !important;
-        font-weight: 600 !important;
-        font-size: 0.9rem !important;
-    }
-    
-    /* Responsive Design */
-    @media (max-width: 768px) {
-        .nav-brand {
-            padding: 1.5rem 1rem;
-        }
-        
-        .nav-brand h1 {
-            font-size: 1.5rem;
-        }
-        
-        .stRadio > div > div > div > div {
-            padding: 1rem !important;
-            font-size: 0.9rem !important;
-        }
-    }
-    </style>
-    """, unsafe_allow_html=True)
+    # Stunning Navigation Bar CSS - Focus on Sidebar Only (static/app.css)
+    inject_styles()
     
     # Ultra-Stunning Navigation Sidebar
     with st.sidebar:
@@ -594,61 +190,8 @@ def main():
         about_page()
 
 # ==================== DASHBOARD PAGE ====================
+@timed
 def dashboard_page():
-    # Add custom CSS for better styling
-    st.markdown("""
-    <style>
-    .main-header {
-        background: linear-gradient(90deg, #667eea 0%, #764ba2 100%);
-        padding: 2rem;
-        border-radius: 10px;
-        color: white;
-        text-align: center;
-        margin-bottom: 2rem;
-    }
-    .metric-card {
-        background: white;
-        padding: 1.5rem;
-        border-radius: 10px;
-        box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-        border-left: 4px solid #667eea;
-        margin-bottom: 1rem;
-    }
-    .alert-card {
-        padding: 1.5rem !important;
-        border-radius: 10px !important;
-        margin-bottom: 1rem !important;
-        border-left: 6px solid !important;
-        box-shadow: 0 2px 8px rgba(0,0,0,0.1) !important;
-        font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif !important;
-    }
-    .alert-high { 
-        border-left-color: #dc3545 !important; 
-        background-color: #f8d7da !important;
-        color: #721c24 !important;
-    }
-    .alert-medium { 
-        border-left-color: #fd7e14 !important; 
-        background-color: #fff3cd !important;
-        color: #856404 !important;
-    }
-    .alert-low { 
-        border-left-color: #28a745 !important; 
-        background-color: #d4edda !important;
-        color: #155724 !important;
-    }
-    .alert-card strong {
-        font-size: 1.1em !important;
-        display: block !important;
-        margin-bottom: 0.5rem !important;
-    }
-    .alert-card small {
-        font-size: 0.9em !important;
-        opacity: 0.8 !important;
-    }
-    </style>
-    """, unsafe_allow_html=True)
-    
     # Main header
     st.markdown("""
     <div class="main-header">
@@ -676,7 +219,8 @@ def dashboard_page():
         # Current Weather Stats aligned with District Location
         st.subheader("📊 Current Weather Status")
         today = datetime.now().strftime("%Y-%m-%d")
-        prediction = predict_weather(selected_district, today)
+        island = forecast.island_snapshot(today)
+        prediction = island.prediction(selected_district)
         
         st.metric(
             label="🌡️ Temperature",
@@ -703,27 +247,12 @@ def dashboard_page():
     # Weather alerts panel
     st.subheader("⚠️ Weather Alerts & Warnings")
     
-    # Generate alerts for multiple districts
-    alert_districts = ['Ampara', 'Colombo', 'Galle', 'Kandy', 'Trincomalee']
-    
-    for i, district in enumerate(alert_districts):
-        pred = predict_weather(district, today)
-        
-        # Determine alert level with more varied conditions
-        alert_level = "low"
-        alert_message = "Normal conditions"
-        
-        # Create more varied alert conditions to ensure we see different colors
-        temp_threshold = 30 + (i * 1)  # Lower thresholds to trigger alerts
-        rain_threshold = 15 + (i * 5)
-        wind_threshold = 15 + (i * 3)
-        
-        if pred['temperature'] > temp_threshold + 3 or pred['rainfall'] > rain_threshold + 15 or pred['windspeed'] > wind_threshold + 10:
-            alert_level = "high"
-            alert_message = "Severe weather warning"
-        elif pred['temperature'] > temp_threshold or pred['rainfall'] > rain_threshold or pred['windspeed'] > wind_threshold:
-            alert_level = "medium"
-            alert_message = "Weather watch"
+    # Generate alerts for multiple districts, classified together
+    alert_levels = rules.classify(island.frame(ALERT_DISTRICTS), ['alert_level'],
+                                  position=range(len(ALERT_DISTRICTS)))['alert_level']
+    for district, alert_level in zip(ALERT_DISTRICTS, alert_levels.tolist()):
+        pred = island.prediction(district)
+        alert_message = ALERT_MESSAGES[alert_level]
         
         # Use Streamlit's native colored containers for better reliability
         if alert_level == "high":
@@ -739,6 +268,7 @@ def dashboard_page():
         st.write("")  # Add spacing between alerts
 
 # ==================== PREDICTION PAGE ====================
+@timed
 def predict_page():
     st.title("🔮 Weather Prediction")
     
@@ -768,14 +298,26 @@ def predict_page():
         with col3:
             confidence_level = st.slider("Confidence Level", 50, 100, 85)
         
-
+        col1, col2 = st.columns(2)
+        with col1:
+            use_ensemble = st.checkbox("🎲 Ensemble forecast", value=True,
+                                       help="Draw many possible outcomes to show ranges and the odds of severe weather")
+        with col2:
+            ensemble_members = st.select_slider("Ensemble members", options=[50, 100, 200, 500], value=100,
+                                                disabled=not use_ensemble)
         
         # Generate prediction
         if st.button("🔮 Generate Weather Prediction", type="primary"):
             with st.spinner("AI is analyzing weather patterns..."):
                 try:
                     date_str = selected_date.strftime("%Y-%m-%d")
-                    prediction = predict_weather(district, date_str)
+                    prediction = forecast.predict_weather(district, date_str)
+                    outlook = None
+                    if prediction and use_ensemble:
+                        members = ensemble.ensemble_forecast([district], [date_str], ensemble_members)
+                        outlook = members.frame(q=(50 - confidence_level / 2, 50 + confidence_level / 2)).iloc[0]
+                        # Confidence from the spread of the members
+                        prediction['confidence'] = int(outlook['confidence'])
                     
                     if prediction:
                         # Display prediction results
@@ -823,6 +365,9 @@ def predict_page():
                             else:
                                 st.error("⚠️ Low Confidence")
                         
+                        if outlook is not None:
+                            show_ensemble_outlook(outlook, confidence_level)
+                        
                         # Download prediction
                         df_prediction = pd.DataFrame([prediction])
                         csv = df_prediction.to_csv(index=False)
@@ -841,6 +386,62 @@ def predict_page():
                     st.error(f"❌ Error generating prediction: {str(e)}")
                     st.write("Please check your inputs and try again.")
         
+        # Bulk export of a district x date range
+        with st.expander("📦 Bulk Forecast Export"):
+            export_districts = st.multiselect(
+                "Districts",
+                list(sri_lanka_districts.keys()),
+                default=list(sri_lanka_districts.keys()),
+                key="export_districts"
+            )
+            col1, col2 = st.columns(2)
+            with col1:
+                export_range = st.date_input(
+                    "Date range",
+                    value=(today, today + timedelta(days=MAX_DOWNLOAD_DAYS - 1)),
+                    key="export_range"
+                )
+            with col2:
+                export_format = st.radio("Format", list(export.EXPORT_FORMATS), horizontal=True, key="export_format")
+            
+            if export_districts and len(export_range) == 2:
+                export_start, export_end = export_range
+                export_days = (export_end - export_start).days + 1
+                if export_days <= MAX_DOWNLOAD_DAYS:
+                    # Generated only when the button is clicked
+                    st.download_button(
+                        label=f"📥 Download {len(export_districts)} districts × {export_days} days",
+                        data=lambda: "".join(export.iter_forecast_export(export_districts, export_start, export_end, export_format)),
+                        file_name=f"weather_forecast_{export_start}_{export_end}.{export_format}",
+                        mime=export.EXPORT_FORMATS[export_format]
+                    )
+                else:
+                    districts_arg = ",".join(export_districts) if len(export_districts) < len(sri_lanka_districts) else ""
+                    query = f"start={export_start}&end={export_end}&format={export_format}" + \
+                            (f"&districts={districts_arg}" if districts_arg else "")
+                    st.info(f"Downloads here cover up to {MAX_DOWNLOAD_DAYS} days. {export_days} days stream "
+                            f"in constant memory from the forecast API, `GET /forecast/export?{query}`, or from "
+                            f"`python export.py --start {export_start} --end {export_end} --format {export_format}"
+                            + (f' --districts "{districts_arg}"' if districts_arg else "") + "`.")
+        
+        # Island-wide ensembles run in worker processes, so the session stays responsive
+        with st.expander("🧮 Island Scenario Run"):
+            col1, col2 = st.columns(2)
+            with col1:
+                scenario_days = st.slider("Days ahead", 7, 365, 365, key="scenario_days")
+            with col2:
+                scenario_members = st.select_slider("Members", options=[50, 100, 200, 500], value=200,
+                                                    key="scenario_members")
+            run = st.session_state.get('scenario_run')
+            running = run is not None and run.status == 'running'
+            st.button(f"▶️ Run {len(sri_lanka_districts)} districts × {scenario_days} days × {scenario_members} members",
+                      on_click=start_scenario, args=(today, scenario_days, scenario_members), disabled=running,
+                      key="scenario_start")
+            if running:
+                show_scenario_progress()
+            elif run is not None:
+                show_scenario_result(run)
+        
         # Prediction confidence display
         st.subheader("🎯 Prediction Confidence Analysis")
         
@@ -862,7 +463,7 @@ def predict_page():
         if st.button("📊 Generate Parameters Overview", type="secondary"):
             try:
                 date_str = param_date.strftime("%Y-%m-%d")
-                param_prediction = predict_weather(param_district, date_str)
+                param_prediction = forecast.predict_weather(param_district, date_str)
                 
                 # Display weather parameters with gauges
                 col1, col2, col3 = st.columns(3)
@@ -917,7 +518,7 @@ def predict_page():
                     for i in range(7):
                         forecast_date = start_date + timedelta(days=i)
                         forecast_date_str = forecast_date.strftime("%Y-%m-%d")
-                        day_prediction = predict_weather(forecast_district, forecast_date_str)
+                        day_prediction = forecast.predict_weather(forecast_district, forecast_date_str)
                         day_prediction['day'] = forecast_date.strftime("%a, %b %d")
                         day_prediction['date_obj'] = forecast_date
                         forecast_data.append(day_prediction)
@@ -987,7 +588,7 @@ def predict_page():
             sample_data = []
             for i in range(3):
                 date = datetime.now() + timedelta(days=i)
-                pred = predict_weather(forecast_district, date.strftime("%Y-%m-%d"))
+                pred = forecast.predict_weather(forecast_district, date.strftime("%Y-%m-%d"))
                 sample_data.append(pred)
             
             df_sample = pd.DataFrame(sample_data)
@@ -1014,6 +615,7 @@ def predict_page():
             create_interactive_prediction_map(map_date, weather_param)
 
 # ==================== COMPARE DISTRICTS PAGE ====================
+@timed
 def compare_page():
     st.title("📊 District Comparison")
     
@@ -1078,93 +680,12 @@ def compare_page():
                 help="Which weather parameter to analyze"
             )
         
-        if st.button("📈 Generate Trend Analysis", type="primary") and trend_districts:
-            with st.spinner(f"Generating {trend_days}-day trend analysis..."):
-                # Generate trend data
-                trend_data = []
-                base_date = datetime.now()
-                
-                for district in trend_districts:
-                    district_trends = []
-                    for i in range(trend_days):
-                        trend_date = base_date + timedelta(days=i)
-                        trend_date_str = trend_date.strftime("%Y-%m-%d")
-                        prediction = predict_weather(district, trend_date_str)
-                        prediction['date_obj'] = trend_date
-                        district_trends.append(prediction)
-                    trend_data.append({'district': district, 'data': district_trends})
-                
-                # Create trend charts
-                if trend_metric in ["Temperature", "All Metrics"]:
-                    st.markdown("#### 🌡️ Temperature Trends")
-                    fig_temp = go.Figure()
-                    
-                    for district_data in trend_data:
-                        dates = [d['date_obj'] for d in district_data['data']]
-                        temps = [d['temperature'] for d in district_data['data']]
-                        
-                        fig_temp.add_trace(go.Scatter(
-                            x=dates, y=temps,
-                            mode='lines+markers',
-                            name=district_data['district'],
-                            line=dict(width=3),
-                            marker=dict(size=6)
-                        ))
-                    
-                    fig_temp.update_layout(
-                        title=f"{trend_days}-Day Temperature Trends",
-                        xaxis_title="Date",
-                        yaxis_title="Temperature (°C)",
-                        hovermode="x unified",
-                        height=400
-                    )
-                    
-                    st.plotly_chart(fig_temp, width='stretch')
-                
-                if trend_metric in ["Rainfall", "All Metrics"]:
-                    st.markdown("#### 🌧️ Rainfall Trends")
-                    fig_rain = go.Figure()
-                    
-                    for district_data in trend_data:
-                        dates = [d['date_obj'] for d in district_data['data']]
-                        rainfall = [d['rainfall'] for d in district_data['data']]
-                        
-                        fig_rain.add_trace(go.Scatter(
-                            x=dates, y=rainfall,
-                            mode='lines+markers',
-                            name=district_data['district'],
-                            line=dict(width=3),
-                            marker=dict(size=6)
-                        ))
-                    
-                    fig_rain.update_layout(
-                        title=f"{trend_days}-Day Rainfall Trends",
-                        xaxis_title="Date",
-                        yaxis_title="Rainfall (mm)",
-                        hovermode="x unified",
-                        height=400
-                    )
-                    
-                    st.plotly_chart(fig_rain, width='stretch')
-                
-                # Summary statistics
-                st.markdown("#### 📊 Trend Summary")
-                
-                summary_data = []
-                for district_data in trend_data:
-                    temps = [d['temperature'] for d in district_data['data']]
-                    rainfall = [d['rainfall'] for d in district_data['data']]
-                    
-                    summary_data.append({
-                        'District': district_data['district'],
-                        'Avg Temperature': f"{np.mean(temps):.1f}°C",
-                        'Max Temperature': f"{np.max(temps):.1f}°C",
-                        'Total Rainfall': f"{np.sum(rainfall):.1f}mm",
-                        'Avg Daily Rain': f"{np.mean(rainfall):.1f}mm"
-                    })
-                
-                df_summary = pd.DataFrame(summary_data)
-                st.dataframe(df_summary, width='stretch')
+        # Computed in the job pool, one district at a time; changing the settings cancels it
+        trend_clicked = st.button("📈 Generate Trend Analysis", type="primary") and bool(trend_districts)
+        trend_job = jobs.session_job(st.session_state.setdefault('jobs', {}), 'trend', trend_analysis_parts,
+                                     tuple(trend_districts), trend_days, datetime.now().date(),
+                                     start=trend_clicked, total=len(trend_districts))
+        show_job(trend_job, 'trend', show_trend_analysis, trend_days, trend_metric)
     
     with tab3:
         st.subheader("Geographic Weather Comparison")
@@ -1178,81 +699,21 @@ def compare_page():
             key="geo_date"
         )
         
-        if st.button("🗺️ Generate Geographic Analysis", type="primary"):
-            with st.spinner("Analyzing geographic weather patterns..."):
-                # Generate data for all districts
-                all_predictions = []
-                date_str = geo_date.strftime("%Y-%m-%d")
-                
-                for district, coords in sri_lanka_districts.items():
-                    pred = predict_weather(district, date_str)
-                    pred['lat'] = coords['lat']
-                    pred['lon'] = coords['lon']
-                    all_predictions.append(pred)
-                
-                df_geo = pd.DataFrame(all_predictions)
-                
-                # Create geographic heatmap
-                st.markdown("#### 🌡️ Temperature Distribution Map")
-                
-                fig_map = go.Figure(go.Scattermap(
-                    lat=df_geo['lat'],
-                    lon=df_geo['lon'],
-                    mode='markers',
-                    marker=dict(
-                        size=df_geo['temperature'] / df_geo['temperature'].max() * 30 + 10,
-                        color=df_geo['temperature'],
-                        colorscale='RdYlBu_r',
-                        showscale=True,
-                        colorbar=dict(title="Temperature (°C)")
-                    ),
-                    text=[f"{row['district']}<br>Temp: {row['temperature']}°C<br>Rain: {row['rainfall']}mm" 
-                          for _, row in df_geo.iterrows()],
-                    hoverinfo='text'
-                ))
-                
-                fig_map.update_layout(
-                    map_style="open-street-map",
-                    map=dict(
-                        center=dict(lat=7.8731, lon=80.7718),
-                        zoom=6.5
-                    ),
-                    height=500,
-                    title=f"Weather Distribution - {geo_date.strftime('%Y-%m-%d')}"
-                )
-                
-                st.plotly_chart(fig_map, width='stretch')
-                
-                # Regional statistics
-                st.markdown("#### 📊 Regional Weather Statistics")
-                
-                col1, col2, col3 = st.columns(3)
-                
-                with col1:
-                    st.metric(
-                        label="🌡️ Highest Temperature",
-                        value=f"{df_geo['temperature'].max():.1f}°C",
-                        delta=df_geo.loc[df_geo['temperature'].idxmax(), 'district']
-                    )
-                
-                with col2:
-                    st.metric(
-                        label="🌧️ Highest Rainfall",
-                        value=f"{df_geo['rainfall'].max():.1f}mm",
-                        delta=df_geo.loc[df_geo['rainfall'].idxmax(), 'district']
-                    )
-                
-                with col3:
-                    st.metric(
-                        label="🌡️ Temperature Range",
-                        value=f"{df_geo['temperature'].max() - df_geo['temperature'].min():.1f}°C",
-                        delta="Variation across island"
-                    )
+        geo_clicked = st.button("🗺️ Generate Geographic Analysis", type="primary")
+        geo_job = jobs.session_job(st.session_state.setdefault('jobs', {}), 'geographic', geographic_analysis_parts,
+                                   geo_date, start=geo_clicked, total=2)
+        show_job(geo_job, 'geographic', show_geographic_analysis)
 
 # ==================== HISTORICAL DATA PAGE ====================
+@timed
 def historical_page():
     st.title("📈 Historical Weather Data")
     
+    history = load_weather_history()
+    if history is None:
+        st.warning("Historical observations could not be loaded from the model files.")
+        return
+    
     tab1, tab2, tab3, tab4 = st.tabs(["📊 All Districts", "📅 Seasonal", "⚠️ Extremes", "🗺️ District Map"])
     
     with tab1:
@@ -1261,16 +722,31 @@ def historical_page():
         # Time range selection
         col1, col2, col3 = st.columns(3)
         with col1:
-            start_year = st.selectbox("Start Year", [2020, 2021, 2022, 2023], index=0)
+            start_year = st.selectbox("Start Year", history.years, index=0)
         with col2:
-            end_year = st.selectbox("End Year", [2021, 2022, 2023, 2024], index=3)
+            end_year = st.selectbox("End Year", history.years, index=len(history.years) - 1)
         with col3:
             metric = st.selectbox("Metric", ["Temperature", "Rainfall", "Windspeed"])
         
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            resolution = st.selectbox("Resolution", ["Monthly", "Daily"])
+        with col2:
+            downsampling = st.selectbox("Downsampling", ["LTTB", "Min-max", "Off"],
+                                        disabled=resolution != "Daily",
+                                        help="Reduce each daily series to about one point per pixel")
+        with col3:
+            webgl = st.checkbox("Use WebGL traces", value=False,
+                                help="Render with the GPU; faster for long daily series")
+        
         # Generate historical data for all districts
-        if st.button("📊 Generate Historical Analysis", type="primary"):
-            with st.spinner("Generating historical data for all districts..."):
-                create_all_districts_historical_chart(start_year, end_year, metric)
+        # Traces stream in from the job pool a district at a time
+        history_clicked = st.button("📊 Generate Historical Analysis", type="primary")
+        history_job = jobs.session_job(st.session_state.setdefault('jobs', {}), 'historical',
+                                       historical_chart_parts, history, start_year, end_year, metric,
+                                       resolution, downsampling, webgl,
+                                       start=history_clicked, total=len(history.districts) + 1)
+        show_job(history_job, 'historical', show_historical_chart)
         
         # District comparison heatmap
         st.subheader("🌡️ District Weather Heatmap")
@@ -1286,7 +762,7 @@ def historical_page():
         # Seasonal analysis for selected districts
         selected_districts = st.multiselect(
             "Select districts for seasonal analysis",
-            list(sri_lanka_districts.keys()),
+            history.districts,
             default=['Colombo', 'Kandy', 'Galle', 'Ampara']
         )
         
@@ -1314,6 +790,7 @@ def historical_page():
             create_interactive_weather_map(map_date, weather_param)
 
 # ==================== RESCUE SYSTEM PAGE ====================
+@timed
 def rescue_page():
     st.title("🛟 Emergency Rescue System")
     
@@ -1501,6 +978,7 @@ def rescue_page():
                 st.checkbox(item, key=f"check_{item}")
 
 # ==================== ABOUT PAGE ====================
+@timed
 def about_page():
     st.title("ℹ️ About This System")
     
@@ -1538,105 +1016,56 @@ def about_page():
     *Developed for Sri Lanka Weather Forecasting & Rescue System Project*
     """)
 
+    # Model load report (filled once the LSTM has served a forecast)
+    # Only asked when an earlier rerun already loaded the forecast module
+    # The engine serving now, which a registry reload may have replaced since startup
+    model_engine = forecast.current_model_engine() if 'forecast' in sys.modules else None
+    if model_engine is not None and model_engine.load_report:
+        report = model_engine.load_report
+        rss = report['rss_delta_bytes']
+        rss_text = f", +{rss / 2**20:.1f} MB resident" if rss is not None else ""
+        st.caption(f"Model {model_engine.version} loaded from {report['source']} "
+                   f"in {report['seconds']:.2f}s{rss_text}")
+
 # ==================== HELPER FUNCTIONS ====================
-def predict_weather(district, date):
-    """Enhanced prediction function with realistic variations"""
-    # This is where you'd integrate your actual LSTM model
-    # For now, returning enhanced mock data with realistic variations
-    
-    # Create a unique seed based on both district and date for varied predictions
-    date_obj = datetime.strptime(date, "%Y-%m-%d")
-    seed_value = hash(f"{district}_{date}") % 10000
-    np.random.seed(seed_value)
-    
-    # District-specific base values (realistic for Sri Lankan geography)
-    district_profiles = {
-        'Nuwara Eliya': {'base_temp': 20, 'temp_var': 3, 'rain_factor': 1.5, 'wind_base': 12},
-        'Kandy': {'base_temp': 24, 'temp_var': 2, 'rain_factor': 1.3, 'wind_base': 10},
-        'Colombo': {'base_temp': 28, 'temp_var': 2, 'rain_factor': 1.2, 'wind_base': 15},
-        'Galle': {'base_temp': 27, 'temp_var': 2, 'rain_factor': 1.4, 'wind_base': 18},
-        'Jaffna': {'base_temp': 30, 'temp_var': 3, 'rain_factor': 0.8, 'wind_base': 20},
-        'Trincomalee': {'base_temp': 29, 'temp_var': 2, 'rain_factor': 1.0, 'wind_base': 22},
-        'Ampara': {'base_temp': 31, 'temp_var': 3, 'rain_factor': 0.9, 'wind_base': 16},
-        'Hambantota': {'base_temp': 32, 'temp_var': 3, 'rain_factor': 0.7, 'wind_base': 25},
-        'Anuradhapura': {'base_temp': 30, 'temp_var': 3, 'rain_factor': 0.8, 'wind_base': 14},
-        'Badulla': {'base_temp': 22, 'temp_var': 2, 'rain_factor': 1.2, 'wind_base': 12},
-        'Batticaloa': {'base_temp': 29, 'temp_var': 2, 'rain_factor': 1.1, 'wind_base': 19},
-        'Gampaha': {'base_temp': 27, 'temp_var': 2, 'rain_factor': 1.3, 'wind_base': 13},
-        'Kalutara': {'base_temp': 28, 'temp_var': 2, 'rain_factor': 1.4, 'wind_base': 16},
-        'Kegalle': {'base_temp': 25, 'temp_var': 2, 'rain_factor': 1.3, 'wind_base': 11},
-        'Kurunegala': {'base_temp': 28, 'temp_var': 3, 'rain_factor': 1.0, 'wind_base': 13},
-        'Matale': {'base_temp': 26, 'temp_var': 2, 'rain_factor': 1.2, 'wind_base': 12},
-        'Matara': {'base_temp': 27, 'temp_var': 2, 'rain_factor': 1.5, 'wind_base': 17},
-        'Moneragala': {'base_temp': 26, 'temp_var': 3, 'rain_factor': 1.0, 'wind_base': 14},
-        'Polonnaruwa': {'base_temp': 29, 'temp_var': 3, 'rain_factor': 0.9, 'wind_base': 15},
-        'Puttalam': {'base_temp': 29, 'temp_var': 3, 'rain_factor': 0.8, 'wind_base': 21},
-        'Ratnapura': {'base_temp': 26, 'temp_var': 2, 'rain_factor': 1.6, 'wind_base': 10},
-        'Vavuniya': {'base_temp': 30, 'temp_var': 3, 'rain_factor': 0.8, 'wind_base': 16},
-        'Kilinochchi': {'base_temp': 30, 'temp_var': 3, 'rain_factor': 0.9, 'wind_base': 18},
-        'Mannar': {'base_temp': 29, 'temp_var': 3, 'rain_factor': 0.7, 'wind_base': 23},
-        'Mullaitivu': {'base_temp': 29, 'temp_var': 3, 'rain_factor': 0.8, 'wind_base': 20}
-    }
+def geographic_map_figure(island):
+    """Temperature map of every district in an IslandSnapshot"""
+    df_geo = island.frame()
     
-    # Get district profile or use default
-    profile = district_profiles.get(district, {'base_temp': 27, 'temp_var': 2, 'rain_factor': 1.0, 'wind_base': 15})
-    
-    # Seasonal variations
-    month = date_obj.month
-    day_of_year = date_obj.timetuple().tm_yday
-    
-    # Temperature variations
-    seasonal_temp_adj = 2 * np.sin((day_of_year - 80) * 2 * np.pi / 365)  # Peak in April, low in October
-    base_temp = profile['base_temp'] + seasonal_temp_adj + np.random.normal(0, profile['temp_var'])
-    
-    # Monsoon patterns for rainfall
-    if month in [5, 6, 7, 8, 9]:  # Southwest monsoon
-        rain_base = 25 + np.random.exponential(15)
-    elif month in [10, 11, 12, 1, 2]:  # Northeast monsoon
-        rain_base = 15 + np.random.exponential(10)
-    else:  # Inter-monsoon
-        rain_base = 5 + np.random.exponential(8)
-    
-    base_rain = rain_base * profile['rain_factor']
-    
-    # Wind speed variations (higher during monsoons and in coastal areas)
-    wind_seasonal = 1.3 if month in [5, 6, 7, 8, 9, 10, 11, 12] else 1.0
-    base_wind = profile['wind_base'] * wind_seasonal + np.random.normal(0, 3)
-    
-    # Add some randomness for future dates (less predictable further out)
-    days_ahead = (date_obj - datetime.now()).days
-    if days_ahead > 0:
-        uncertainty_factor = min(days_ahead / 30, 1.0)  # Max uncertainty at 30 days
-        base_temp += np.random.normal(0, uncertainty_factor * 2)
-        base_rain += np.random.normal(0, uncertainty_factor * 5)
-        base_wind += np.random.normal(0, uncertainty_factor * 3)
-        confidence_reduction = uncertainty_factor * 20
-    else:
-        confidence_reduction = 0
-    
-    # Ensure realistic ranges
-    base_temp = max(15, min(40, base_temp))  # Temperature between 15-40°C
-    base_rain = max(0, base_rain)  # No negative rainfall
-    base_wind = max(5, min(60, base_wind))  # Wind between 5-60 km/h
-    
-    # Calculate confidence (higher for recent dates, lower for distant future)
-    base_confidence = 90 - confidence_reduction + np.random.normal(0, 5)
-    confidence = max(50, min(100, base_confidence))
-    
-    prediction = {
-        'district': district,
-        'date': date,
-        'temperature': round(base_temp, 1),
-        'rainfall': round(base_rain, 1),
-        'windspeed': round(base_wind, 1),
-        'confidence': round(confidence),
-        'forecast_time': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    }
+    fig = go.Figure(go.Scattermap(
+        lat=df_geo['lat'],
+        lon=df_geo['lon'],
+        mode='markers',
+        marker=dict(
+            size=df_geo['temperature'] / df_geo['temperature'].max() * 30 + 10,
+            color=df_geo['temperature'],
+            colorscale='RdYlBu_r',
+            showscale=True,
+            colorbar=dict(title="Temperature (°C)")
+        ),
+        text=[f"{row['district']}<br>Temp: {row['temperature']}°C<br>Rain: {row['rainfall']}mm" 
+              for _, row in df_geo.iterrows()],
+        hoverinfo='text'
+    ))
     
-    return prediction
+    fig.update_layout(
+        map_style="open-street-map",
+        map=dict(
+            center=dict(lat=7.8731, lon=80.7718),
+            zoom=6.5
+        ),
+        height=500,
+        title=f"Weather Distribution - {island.date}"
+    )
+    return fig
 
+@timed
 def plot_district_map(district):
     """Plot selected district on map with improved styling"""
+    st.plotly_chart(figures.cached_figure(district_map_figure, district), width='stretch')
+
+def district_map_figure(district):
+    """Map of every district with `district` highlighted"""
     lat = sri_lanka_districts[district]['lat']
     lon = sri_lanka_districts[district]['lon']
     
@@ -1686,8 +1115,7 @@ def plot_district_map(district):
         margin={"r":10,"t":10,"l":10,"b":10},
         showlegend=False
     )
-    
-    st.plotly_chart(fig, width='stretch')
+    return fig
 
 def display_prediction_card(prediction):
     """Display prediction in a nice card"""
@@ -1695,30 +1123,28 @@ def display_prediction_card(prediction):
         return
     
     with st.container():
+        # Layout lives in static/app.css; only the values are sent each rerun
         st.markdown(f"""
-        <div style="padding: 20px; border-radius: 10px; background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white;">
-            <h3 style="margin: 0;">{prediction['district']}</h3>
-            <p style="margin: 5px 0;">{prediction['date']}</p>
-            <div style="display: flex; justify-content: space-between; margin-top: 20px;">
-                <div style="text-align: center;">
-                    <h1 style="margin: 0;">{prediction['temperature']}°C</h1>
-                    <p style="margin: 0;">Temperature</p>
-                </div>
-                <div style="text-align: center;">
-                    <h1 style="margin: 0;">{prediction['rainfall']}mm</h1>
-                    <p style="margin: 0;">Rainfall</p>
-                </div>
-                <div style="text-align: center;">
-                    <h1 style="margin: 0;">{prediction['windspeed']}km/h</h1>
-                    <p style="margin: 0;">Windspeed</p>
-                </div>
+        <div class="prediction-card">
+            <h3>{prediction['district']}</h3>
+            <p class="prediction-date">{prediction['date']}</p>
+            <div class="prediction-values">
+                <div><h1>{prediction['temperature']}°C</h1><p>Temperature</p></div>
+                <div><h1>{prediction['rainfall']}mm</h1><p>Rainfall</p></div>
+                <div><h1>{prediction['windspeed']}km/h</h1><p>Windspeed</p></div>
             </div>
-            <p style="margin-top: 20px; text-align: center;">Confidence: {prediction['confidence']}%</p>
+            <p class="prediction-confidence">Confidence: {prediction['confidence']}%</p>
         </div>
         """, unsafe_allow_html=True)
 
+@timed
 def create_weather_gauges(prediction):
     """Create gauge charts for weather parameters"""
+    return figures.cached_figure(weather_gauges_figure, prediction['temperature'], prediction['rainfall'],
+                         prediction['windspeed'])
+
+def weather_gauges_figure(temperature, rainfall, windspeed):
+    """Temperature, rainfall and windspeed gauges"""
     fig = make_subplots(
         rows=1, cols=3,
         specs=[[{'type': 'indicator'}, {'type': 'indicator'}, {'type': 'indicator'}]],
@@ -1728,7 +1154,7 @@ def create_weather_gauges(prediction):
     # Temperature gauge
     fig.add_trace(go.Indicator(
         mode="gauge+number",
-        value=prediction['temperature'],
+        value=temperature,
         title={'text': "°C"},
         gauge={'axis': {'range': [15, 40]},
                'bar': {'color': "red"},
@@ -1744,7 +1170,7 @@ def create_weather_gauges(prediction):
     # Rainfall gauge
     fig.add_trace(go.Indicator(
         mode="gauge+number",
-        value=prediction['rainfall'],
+        value=rainfall,
         title={'text': "mm"},
         gauge={'axis': {'range': [0, 100]},
                'bar': {'color': "blue"},
@@ -1760,7 +1186,7 @@ def create_weather_gauges(prediction):
     # Windspeed gauge
     fig.add_trace(go.Indicator(
         mode="gauge+number",
-        value=prediction['windspeed'],
+        value=windspeed,
         title={'text': "km/h"},
         gauge={'axis': {'range': [0, 60]},
                'bar': {'color': "green"},
@@ -1776,17 +1202,13 @@ def create_weather_gauges(prediction):
     fig.update_layout(height=300, margin=dict(l=20, r=20, t=50, b=20))
     return fig
 
+@timed
 def compare_districts_weather(districts, date):
     """Compare weather across districts"""
-    predictions = []
-    for district in districts:
-        pred = predict_weather(district, date.strftime("%Y-%m-%d"))
-        if pred:
-            predictions.append(pred)
+    df_comparison = forecast.island_snapshot(date).frame(districts)
     
-    if predictions:
+    if not df_comparison.empty:
         # Create comparison table
-        df_comparison = pd.DataFrame(predictions)
         
         st.subheader("📋 Comparison Table")
         st.dataframe(df_comparison[['district', 'temperature', 'rainfall', 'windspeed', 'confidence']], 
@@ -1816,23 +1238,143 @@ def compare_districts_weather(districts, date):
         # Risk assessment
         st.subheader("⚠️ Risk Assessment")
         
-        risk_scores = []
-        for pred in predictions:
-            score = 0
-            if pred['temperature'] > 35: score += 3
-            if pred['rainfall'] > 50: score += 5
-            if pred['rainfall'] > 20: score += 2
-            if pred['windspeed'] > 40: score += 4
-            if pred['windspeed'] > 20: score += 1
-            risk_scores.append(score)
-        
-        df_comparison['risk_score'] = risk_scores
-        df_comparison['risk_level'] = pd.cut(df_comparison['risk_score'],
-                                           bins=[-1, 2, 5, 10],
-                                           labels=['Low', 'Medium', 'High'])
+        risk = rules.classify(df_comparison, ['risk_score', 'risk_level'])
+        df_comparison['risk_score'] = risk['risk_score']
+        df_comparison['risk_level'] = risk['risk_level']
         
         st.dataframe(df_comparison[['district', 'risk_score', 'risk_level']], width='stretch')
 
+def trend_analysis_parts(districts, days, start):
+    """Trend job: (district, forecasts) for each district in turn"""
+    dates = pd.date_range(start, periods=days, freq='D')
+    for district in districts:
+        df = forecast.predict_weather_batch([district], dates)
+        df['date_obj'] = dates.to_pydatetime()
+        yield district, df
+
+@timed
+def show_trend_analysis(parts, complete, trend_days, trend_metric):
+    """Trend charts and summary of the districts computed so far"""
+    trend_data = [{'district': district, 'data': df.to_dict('records')} for district, df in parts]
+    
+    # Create trend charts
+    if trend_metric in ["Temperature", "All Metrics"]:
+        st.markdown("#### 🌡️ Temperature Trends")
+        fig_temp = go.Figure()
+        
+        for district_data in trend_data:
+            dates = [d['date_obj'] for d in district_data['data']]
+            temps = [d['temperature'] for d in district_data['data']]
+            
+            fig_temp.add_trace(go.Scatter(
+                x=dates, y=temps,
+                mode='lines+markers',
+                name=district_data['district'],
+                line=dict(width=3),
+                marker=dict(size=6)
+            ))
+        
+        fig_temp.update_layout(
+            title=f"{trend_days}-Day Temperature Trends",
+            xaxis_title="Date",
+            yaxis_title="Temperature (°C)",
+            hovermode="x unified",
+            height=400
+        )
+        
+        st.plotly_chart(fig_temp, width='stretch')
+    
+    if trend_metric in ["Rainfall", "All Metrics"]:
+        st.markdown("#### 🌧️ Rainfall Trends")
+        fig_rain = go.Figure()
+        
+        for district_data in trend_data:
+            dates = [d['date_obj'] for d in district_data['data']]
+            rainfall = [d['rainfall'] for d in district_data['data']]
+            
+            fig_rain.add_trace(go.Scatter(
+                x=dates, y=rainfall,
+                mode='lines+markers',
+                name=district_data['district'],
+                line=dict(width=3),
+                marker=dict(size=6)
+            ))
+        
+        fig_rain.update_layout(
+            title=f"{trend_days}-Day Rainfall Trends",
+            xaxis_title="Date",
+            yaxis_title="Rainfall (mm)",
+            hovermode="x unified",
+            height=400
+        )
+        
+        st.plotly_chart(fig_rain, width='stretch')
+    
+    # Summary statistics
+    st.markdown("#### 📊 Trend Summary")
+    
+    summary_data = []
+    for district_data in trend_data:
+        temps = [d['temperature'] for d in district_data['data']]
+        rainfall = [d['rainfall'] for d in district_data['data']]
+        
+        summary_data.append({
+            'District': district_data['district'],
+            'Avg Temperature': f"{np.mean(temps):.1f}°C",
+            'Max Temperature': f"{np.max(temps):.1f}°C",
+            'Total Rainfall': f"{np.sum(rainfall):.1f}mm",
+            'Avg Daily Rain': f"{np.mean(rainfall):.1f}mm"
+        })
+    
+    df_summary = pd.DataFrame(summary_data)
+    st.dataframe(df_summary, width='stretch')
+
+def geographic_analysis_parts(date):
+    """Geographic job: the island snapshot for `date`, then its map"""
+    # Slice the shared island snapshot for this date
+    island = forecast.island_snapshot(date)
+    yield island
+    yield figures.cached_figure(geographic_map_figure, island, key=(island.date, island.made))
+
+@timed
+def show_geographic_analysis(parts, complete):
+    """Temperature map and regional statistics, as far as computed"""
+    if not parts:
+        return
+    island = parts[0]
+    df_geo = island.frame()
+    
+    # Create geographic heatmap
+    st.markdown("#### 🌡️ Temperature Distribution Map")
+    if len(parts) > 1:
+        st.plotly_chart(parts[1], width='stretch')
+    
+    # Regional statistics
+    st.markdown("#### 📊 Regional Weather Statistics")
+    
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        st.metric(
+            label="🌡️ Highest Temperature",
+            value=f"{df_geo['temperature'].max():.1f}°C",
+            delta=df_geo.loc[df_geo['temperature'].idxmax(), 'district']
+        )
+    
+    with col2:
+        st.metric(
+            label="🌧️ Highest Rainfall",
+            value=f"{df_geo['rainfall'].max():.1f}mm",
+            delta=df_geo.loc[df_geo['rainfall'].idxmax(), 'district']
+        )
+    
+    with col3:
+        st.metric(
+            label="🌡️ Temperature Range",
+            value=f"{df_geo['temperature'].max() - df_geo['temperature'].min():.1f}°C",
+            delta="Variation across island"
+        )
+
 def show_rescue_preparedness(district):
     """Show rescue preparedness for district"""
     preparedness = {
@@ -1852,72 +1394,126 @@ def show_rescue_preparedness(district):
     for i, tip in enumerate(tips, 1):
         st.write(f"{i}. {tip}")
 
-def get_weather_type(prediction):
-    """Determine weather type from prediction"""
-    if prediction['rainfall'] > 30:
-        return 'storm' if prediction['windspeed'] > 30 else 'rainy'
-    elif prediction['temperature'] > 33:
-        return 'hot'
-    elif prediction['temperature'] < 22:
-        return 'cold'
-    elif prediction['windspeed'] > 25:
-        return 'windy'
-    elif prediction['rainfall'] > 10:
-        return 'rainy'
-    else:
-        return 'sunny'
-
-def get_temperature_trend(temp):
-    """Get temperature trend indicator"""
-    if temp > 33:
-        return "Hot"
-    elif temp < 22:
-        return "Cool"
-    else:
-        return "Normal"
-
-def get_rainfall_status(rainfall):
-    """Get rainfall status"""
-    if rainfall > 50:
-        return "Heavy"
-    elif rainfall > 20:
-        return "Moderate"
-    elif rainfall > 0:
-        return "Light"
-    else:
-        return "None"
-
-def get_wind_status(windspeed):
-    """Get wind status"""
-    if windspeed > 40:
-        return "Storm"
-    elif windspeed > 20:
-        return "Strong"
-    else:
-        return "Normal"
-
-def is_severe_weather(prediction):
-    """Check if weather is severe"""
-    return (prediction['temperature'] > 35 or 
-            prediction['rainfall'] > 50 or 
-            prediction['windspeed'] > 40)
-
 def get_district_emergency_number(district):
     """Get district-specific emergency number"""
     # Mock function - replace with actual numbers
     return f"011-{np.random.randint(1000000, 9999999)}"
 
+def show_ensemble_outlook(outlook, confidence_level):
+    """Ranges and severe-weather odds from one row of an ensemble frame"""
+    low, high = 50 - confidence_level / 2, 50 + confidence_level / 2
+    st.markdown(f"#### 🎲 Ensemble Outlook ({outlook['members']} members)")
+    col1, col2, col3 = st.columns(3)
+    for col, (variable, label, unit) in zip((col1, col2, col3), [('temperature', "🌡️ Temperature", "°C"),
+                                                              ('rainfall', "🌧️ Rainfall", "mm"),
+                                                              ('windspeed', "💨 Windspeed", "km/h")]):
+        with col:
+            st.metric(f"{label} ({confidence_level}% range)",
+                      f"{outlook[f'{variable}_p{low:g}']}–{outlook[f'{variable}_p{high:g}']} {unit}")
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("P(rain > 50 mm)", f"{outlook['p_rainfall_gt_50']:.0%}")
+    col2.metric("P(wind > 40 km/h)", f"{outlook['p_windspeed_gt_40']:.0%}")
+    col3.metric("P(temp > 35°C)", f"{outlook['p_temperature_gt_35']:.0%}")
+    col4.metric("P(severe weather)", f"{outlook['p_severe']:.0%}")
+
+def start_scenario(start, days, members):
+    """Start the island scenario of the Scenario Run expander, cancelling one still running"""
+    previous = st.session_state.get('scenario_run')
+    if previous is not None and previous.status == 'running':
+        previous.cancel()
+    dates = pd.date_range(start.date(), periods=days, freq='D')
+    st.session_state['scenario_run'] = scenarios.run_scenario(list(sri_lanka_districts), dates, members)
+
+@st.fragment(run_every=1.0)
+def show_scenario_progress():
+    """Progress of the session's scenario run, redrawn every second while it runs"""
+    run = st.session_state.get('scenario_run')
+    if run is None:
+        return
+    if run.status != 'running':
+        # Redraw the whole page, which then shows the result instead of this fragment
+        st.rerun()
+    st.progress(run.progress(), text=f"{run.progress():.0%} · {run.elapsed:.0f} s · "
+                                     f"{run.cells_per_second:,.0f} member cells/s")
+    st.button("⏹️ Cancel", on_click=run.cancel, key="scenario_cancel")
+
+def show_job(job, key, render, *args):
+    """Draw a tab's background job: render(parts, complete, *args) as parts arrive, then in full"""
+    if job is None or job.status == 'cancelled':
+        return
+    if job.status == 'failed':
+        st.error(f"❌ {job.error}")
+    elif job.done():
+        render(job.results(), True, *args)
+    else:
+        show_job_progress(key, render, *args)
+
+@st.fragment(run_every=0.5)
+def show_job_progress(key, render, *args):
+    """Partial results of the session's job `key`, redrawn twice a second while it runs"""
+    job = st.session_state.get('jobs', {}).get(key)
+    if job is None:
+        return
+    if job.done():
+        # Redraw the whole page, which then shows the finished result instead of this fragment
+        st.rerun()
+    st.progress(job.progress(), text=f"Computing… {job.elapsed:.1f} s")
+    render(job.results(), False, *args)
+
+def show_scenario_result(run):
+    """Summary and download of a finished, failed or cancelled scenario run"""
+    if run.status == 'cancelled':
+        st.info(f"Scenario cancelled at {run.progress():.0%}.")
+        return
+    if run.status == 'failed':
+        st.error(f"❌ Scenario failed: {run.error}")
+        return
+    result = run.result()
+    st.success(f"✅ {run.total_cells:,} member cells in {run.elapsed:.1f} s "
+               f"({run.cells_per_second:,.0f}/s)")
+    summary = pd.DataFrame({
+        'District': run.districts,
+        'Max P(severe)': result['p_severe'].max(axis=1),
+        'Days P(severe) > 50%': (result['p_severe'] > 0.5).sum(axis=1),
+        'Wettest p90 (mm)': result['rainfall_p90'].max(axis=1),
+        'Hottest p90 (°C)': result['temperature_p90'].max(axis=1),
+        'Mean confidence': result['confidence'].mean(axis=1).round(1)
+    }).sort_values('Max P(severe)', ascending=False)
+    st.dataframe(summary, width='stretch', hide_index=True,
+                 column_config={'Max P(severe)': st.column_config.ProgressColumn(min_value=0, max_value=1, format="percent")})
+    st.download_button(
+        label="📥 Download scenario CSV",
+        data=lambda: run.frame().to_csv(index=False),
+        file_name=f"scenario_{run.dates[0]}_{run.dates[-1]}_{run.members}.csv",
+        mime="text/csv"
+    )
+
+@timed
 def create_prediction_confidence_chart():
     """Create prediction confidence analysis chart"""
-    # Generate sample confidence data for different time periods
+    # The island's ensembles change once a day
+    fig = figures.cached_figure(prediction_confidence_figure, datetime.now().strftime("%Y-%m-%d"))
+    st.plotly_chart(fig, width='stretch')
+
+def prediction_confidence_figure(day):
+    """Ensemble confidence vs time horizon for forecasts made on `day`, over every district"""
+    dates = pd.date_range(day, periods=31, freq='D')[1:]
+    confidence = ensemble.ensemble_forecast(list(sri_lanka_districts), dates).confidence()
     days_ahead = list(range(1, 31))
-    confidence_values = [90 - (day * 1.2) + np.random.normal(0, 3) for day in days_ahead]
-    confidence_values = [max(50, min(100, conf)) for conf in confidence_values]
     
     fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=days_ahead + days_ahead[::-1],
+        y=confidence.max(axis=0).tolist() + confidence.min(axis=0)[::-1].tolist(),
+        fill='toself',
+        fillcolor='rgba(0, 0, 255, 0.15)',
+        line=dict(width=0),
+        name='District range',
+        hoverinfo='skip'
+    ))
     fig.add_trace(go.Scatter(
         x=days_ahead,
-        y=confidence_values,
+        y=confidence.mean(axis=0).round(1),
         mode='lines+markers',
         name='Prediction Confidence',
         line=dict(color='blue', width=3),
@@ -1930,25 +1526,19 @@ def create_prediction_confidence_chart():
         yaxis_title="Confidence (%)",
         height=300
     )
-    
-    st.plotly_chart(fig, width='stretch')
+    return fig
 
+@timed
 def create_weather_parameters_overview():
     """Create weather parameters overview"""
     # Generate sample data for all districts
     districts = list(sri_lanka_districts.keys())[:8]  # Show first 8 districts
-    today = datetime.now().strftime("%Y-%m-%d")
-    
-    data = []
-    for district in districts:
-        pred = predict_weather(district, today)
-        data.append(pred)
-    
-    df = pd.DataFrame(data)
+    df = forecast.island_snapshot(datetime.now()).frame(districts)
     
     # Create overview table
     st.dataframe(df[['district', 'temperature', 'rainfall', 'confidence']], width='stretch')
 
+@timed
 def create_multi_day_forecast_analysis(districts):
     """Create multi-day forecast analysis for selected districts"""
     forecast_data = {}
@@ -1958,7 +1548,7 @@ def create_multi_day_forecast_analysis(districts):
         for i in range(7):
             forecast_date = datetime.now() + timedelta(days=i)
             forecast_date_str = forecast_date.strftime("%Y-%m-%d")
-            prediction = predict_weather(district, forecast_date_str)
+            prediction = forecast.predict_weather(district, forecast_date_str)
             prediction['date'] = forecast_date
             district_forecasts.append(prediction)
         forecast_data[district] = district_forecasts
@@ -1988,17 +1578,11 @@ def create_multi_day_forecast_analysis(districts):
     
     st.plotly_chart(fig, width='stretch')
 
+@timed
 def create_district_prediction_analysis():
     """Create district prediction analysis"""
-    # Generate predictions for all districts for today
-    today = datetime.now().strftime("%Y-%m-%d")
-    all_predictions = []
-    
-    for district in sri_lanka_districts.keys():
-        pred = predict_weather(district, today)
-        all_predictions.append(pred)
-    
-    df = pd.DataFrame(all_predictions)
+    # Predictions for all districts for today
+    df = forecast.island_snapshot(datetime.now()).frame()
     
     # Create heatmap
     fig = go.Figure(data=go.Heatmap(
@@ -2016,6 +1600,7 @@ def create_district_prediction_analysis():
     
     st.plotly_chart(fig, width='stretch')
 
+@timed
 def create_prediction_timeline():
     """Create prediction comparison timeline"""
     # Sample timeline data
@@ -2027,7 +1612,7 @@ def create_prediction_timeline():
     for district in districts:
         temps = []
         for date in dates:
-            pred = predict_weather(district, date.strftime("%Y-%m-%d"))
+            pred = forecast.predict_weather(district, date.strftime("%Y-%m-%d"))
             temps.append(pred['temperature'])
         
         fig.add_trace(go.Scatter(
@@ -2047,19 +1632,18 @@ def create_prediction_timeline():
     
     st.plotly_chart(fig, width='stretch')
 
+@timed
 def create_interactive_prediction_map(date, weather_param):
     """Create interactive prediction map"""
+    island = forecast.island_snapshot(date)
+    fig = figures.cached_figure(prediction_map_figure, island, weather_param,
+                        key=(island.date, island.made, weather_param))
+    st.plotly_chart(fig, width='stretch')
+
+def prediction_map_figure(island, weather_param):
+    """Map of every district's forecast `weather_param` in an IslandSnapshot"""
     # Get predictions for all districts
-    all_predictions = []
-    date_str = date.strftime("%Y-%m-%d")
-    
-    for district, coords in sri_lanka_districts.items():
-        pred = predict_weather(district, date_str)
-        pred['lat'] = coords['lat']
-        pred['lon'] = coords['lon']
-        all_predictions.append(pred)
-    
-    df_map = pd.DataFrame(all_predictions)
+    df_map = island.frame()
     
     # Select parameter
     param_map = {
@@ -2093,89 +1677,60 @@ def create_interactive_prediction_map(date, weather_param):
             zoom=6.5
         ),
         height=500,
-        title=f"{weather_param} Predictions - {date.strftime('%Y-%m-%d')}"
+        title=f"{weather_param} Predictions - {island.date}"
     )
-    
-    st.plotly_chart(fig, width='stretch')
+    return fig
 
 def make_subplots(*args, **kwargs):
     """Helper function to avoid import issues"""
     from plotly.subplots import make_subplots as ms
     return ms(*args, **kwargs)
 
-def create_all_districts_historical_chart(start_year, end_year, metric):
-    """Create historical chart for all districts"""
-    
-    # Generate sample data for all districts
-    dates = pd.date_range(f'{start_year}-01-01', f'{end_year}-12-31', freq='M')
-    
-    fig = go.Figure()
-    
-    # Color palette for districts
-    colors = px.colors.qualitative.Set3
-    
-    for i, district in enumerate(sri_lanka_districts.keys()):
-        # Generate realistic data based on district characteristics
-        np.random.seed(hash(district) % 1000)
-        
-        if metric == "Temperature":
-            # Base temperature with seasonal variation
-            base_values = 27 + 3 * np.sin(np.linspace(0, (end_year-start_year)*2*np.pi, len(dates)))
-            # Add district-specific variation
-            if district in ['Nuwara Eliya', 'Kandy']:  # Hill country - cooler
-                base_values -= 5
-            elif district in ['Ampara', 'Hambantota']:  # Dry zone - hotter
-                base_values += 3
-            values = base_values + np.random.normal(0, 1.5, len(dates))
-            unit = "°C"
-            
-        elif metric == "Rainfall":
-            # Monsoon patterns
-            seasonal_pattern = np.where(
-                (dates.month >= 5) & (dates.month <= 9), 
-                50,  # Southwest monsoon
-                np.where((dates.month >= 10) | (dates.month <= 2), 30, 10)  # Northeast monsoon
-            )
-            # Wet zone gets more rain
-            if district in ['Colombo', 'Galle', 'Kalutara', 'Ratnapura']:
-                seasonal_pattern *= 1.5
-            values = seasonal_pattern + np.random.exponential(10, len(dates))
-            unit = "mm"
-            
-        else:  # Windspeed
-            base_values = 15 + 5 * np.sin(np.linspace(0, (end_year-start_year)*2*np.pi, len(dates)))
-            # Coastal areas more windy
-            if district in ['Colombo', 'Galle', 'Trincomalee', 'Batticaloa']:
-                base_values += 5
-            values = base_values + np.random.normal(0, 3, len(dates))
-            unit = "km/h"
-        
-        fig.add_trace(go.Scatter(
-            x=dates,
-            y=values,
-            name=district,
-            line=dict(color=colors[i % len(colors)]),
-            mode='lines',
-            hovertemplate=f'<b>{district}</b><br>Date: %{{x}}<br>{metric}: %{{y:.1f}} {unit}<extra></extra>'
-        ))
-    
-    fig.update_layout(
-        title=f"Historical {metric} Trends - All Districts ({start_year}-{end_year})",
-        xaxis_title="Date",
-        yaxis_title=f"{metric} ({unit})",
-        hovermode="x unified",
-        height=600,
-        legend=dict(
-            orientation="v",
-            yanchor="top",
-            y=1,
-            xanchor="left",
-            x=1.02
-        )
-    )
-    
+def historical_chart_parts(history, start_year, end_year, metric, resolution="Monthly",
+                           downsampling="LTTB", webgl=False):
+    """Historical job: the chart's titles, then one trace per district with observations"""
+    variable = metric.lower()
+    df = history.frame(variable, start_year=start_year, end_year=end_year)
+    if df.empty:
+        yield {'empty': f"No observations recorded between {start_year} and {end_year}."}
+        return
+    unit = {"temperature": "°C", "rainfall": "mm", "windspeed": "km/h"}[variable]
+    
+    if resolution == "Daily":
+        # One point per pixel of the wide layout is all the browser can show
+        budget = figures.point_budget() if downsampling != "Off" else None
+        method = None if downsampling == "Off" else downsampling
+        note = f"Daily observations, {downsampling} downsampled to {budget} points per district" \
+            if budget and len(df) >= figures.MIN_REDUCTION * budget else "Daily observations"
+    else:
+        # Monthly means (monthly totals for rainfall)
+        if variable == 'rainfall':
+            df = df.resample('MS').sum(min_count=1)
+        else:
+            df = df.resample('MS').mean()
+        budget, method = None, None
+        note = f"Monthly {'totals' if variable == 'rainfall' else 'means'} of daily observations"
+    
+    yield {'title': f"Historical {metric} Trends - All Districts ({start_year}-{end_year})",
+           'y_title': f"{metric} ({unit})",
+           'note': f"{note} for the {len(df.columns)} districts on record."}
+    yield from figures.trend_traces(df, metric, unit, budget=budget, method=method, webgl=webgl)
+
+@timed
+def show_historical_chart(parts, complete):
+    """Historical chart for all districts, with the traces received so far"""
+    if not parts:
+        return
+    header, traces = parts[0], parts[1:]
+    if 'empty' in header:
+        st.info(header['empty'])
+        return
+    fig = figures.trend_layout(go.Figure(data=traces), header['title'], header['y_title'])
     st.plotly_chart(fig, width='stretch')
+    if complete:
+        st.caption(header['note'])
 
+@timed
 def create_district_heatmap():
     """Create heatmap showing current weather across all districts"""
     
@@ -2184,11 +1739,8 @@ def create_district_heatmap():
     metrics = ['Temperature', 'Rainfall', 'Windspeed']
     
     # Create data matrix
-    data_matrix = []
-    for district in districts:
-        prediction = predict_weather(district, datetime.now().strftime("%Y-%m-%d"))
-        row = [prediction['temperature'], prediction['rainfall'], prediction['windspeed']]
-        data_matrix.append(row)
+    df_now = forecast.island_snapshot(datetime.now()).frame(districts)
+    data_matrix = df_now[['temperature', 'rainfall', 'windspeed']].values
     
     # Create heatmap
     fig = go.Figure(data=go.Heatmap(
@@ -2208,100 +1760,46 @@ def create_district_heatmap():
     
     st.plotly_chart(fig, width='stretch')
 
+@timed
 def create_monthly_averages_table():
     """Create table showing monthly averages for all districts"""
+    monthly = load_weather_history().rollups()['monthly']
     
-    # Generate sample monthly data
-    months = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 
-              'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
-    
-    data = []
-    for district in sri_lanka_districts.keys():
-        np.random.seed(hash(district) % 1000)
-        
-        # Generate realistic monthly temperatures
-        base_temp = 27
-        if district in ['Nuwara Eliya', 'Kandy']:
-            base_temp = 22
-        elif district in ['Ampara', 'Hambantota']:
-            base_temp = 30
-            
-        monthly_temps = [base_temp + 2*np.sin((i-3)*np.pi/6) + np.random.normal(0, 1) 
-                        for i in range(12)]
-        
-        # Generate monthly rainfall (monsoon patterns)
-        monthly_rain = []
-        for i in range(12):
-            if i in [4, 5, 6, 7, 8]:  # SW Monsoon
-                rain = 80 + np.random.exponential(20)
-            elif i in [9, 10, 11, 0, 1]:  # NE Monsoon
-                rain = 50 + np.random.exponential(15)
-            else:
-                rain = 20 + np.random.exponential(10)
-            
-            if district in ['Colombo', 'Galle', 'Kalutara']:  # Wet zone
-                rain *= 1.3
-                
-            monthly_rain.append(rain)
-        
-        row = {
-            'District': district,
-            **{f'{month}_Temp': f"{temp:.1f}°C" for month, temp in zip(months, monthly_temps)},
-            **{f'{month}_Rain': f"{rain:.0f}mm" for month, rain in zip(months, monthly_rain)}
-        }
-        data.append(row)
-    
-    df = pd.DataFrame(data)
+    # Rendered from the precomputed district x month cube
+    temp_config = {month: st.column_config.NumberColumn(month, format="%.1f°C") for month in monthly.periods}
+    rain_config = {month: st.column_config.NumberColumn(month, format="%.0fmm") for month in monthly.periods}
+    df_temp = pd.DataFrame(monthly.mean('temperature'), index=monthly.districts, columns=monthly.periods)
+    df_rain = pd.DataFrame(monthly.period_total('rainfall'), index=monthly.districts, columns=monthly.periods)
     
     # Display temperature table
     st.write("**Monthly Average Temperatures**")
-    temp_cols = ['District'] + [f'{month}_Temp' for month in months]
-    st.dataframe(df[temp_cols], width='stretch')
+    st.dataframe(df_temp.rename_axis('District'), column_config=temp_config, width='stretch')
     
     # Display rainfall table
     st.write("**Monthly Average Rainfall**")
-    rain_cols = ['District'] + [f'{month}_Rain' for month in months]
-    st.dataframe(df[rain_cols], width='stretch')
+    st.dataframe(df_rain.rename_axis('District'), column_config=rain_config, width='stretch')
 
+@timed
 def create_seasonal_analysis(selected_districts):
     """Create seasonal analysis for selected districts"""
+    history = load_weather_history()
+    seasonal = history.rollups()['seasonal']
     
-    seasons = {
-        'Spring': [3, 4, 5],
-        'Summer': [6, 7, 8], 
-        'Autumn': [9, 10, 11],
-        'Winter': [12, 1, 2]
-    }
+    # Mean daily temperature and mean monthly rainfall per season, from the rollup cube
+    seasonal_temps = seasonal.mean('temperature')
+    seasonal_rain = seasonal.period_total('rainfall')
     
     fig = go.Figure()
     
     for district in selected_districts:
-        seasonal_temps = []
-        seasonal_rain = []
-        
-        for season, months in seasons.items():
-            np.random.seed(hash(district + season) % 1000)
-            
-            # Calculate seasonal averages
-            temp = 27 + np.random.normal(0, 2)
-            rain = 30 + np.random.exponential(20)
-            
-            # Adjust for district characteristics
-            if district in ['Nuwara Eliya', 'Kandy']:
-                temp -= 5
-            elif district in ['Ampara', 'Hambantota']:
-                temp += 3
-                
-            if season in ['Summer', 'Autumn'] and district in ['Colombo', 'Galle']:
-                rain *= 2
-                
-            seasonal_temps.append(temp)
-            seasonal_rain.append(rain)
+        if not history.has_data(district):
+            continue
+        row = seasonal.rows[district]
         
         # Add temperature trace
         fig.add_trace(go.Scatter(
-            x=list(seasons.keys()),
-            y=seasonal_temps,
+            x=seasonal.periods,
+            y=seasonal_temps[row],
             name=f'{district} - Temp',
             mode='lines+markers',
             yaxis='y'
@@ -2309,8 +1807,8 @@ def create_seasonal_analysis(selected_districts):
         
         # Add rainfall trace
         fig.add_trace(go.Scatter(
-            x=list(seasons.keys()),
-            y=seasonal_rain,
+            x=seasonal.periods,
+            y=seasonal_rain[row],
             name=f'{district} - Rain',
             mode='lines+markers',
             yaxis='y2',
@@ -2321,39 +1819,39 @@ def create_seasonal_analysis(selected_districts):
         title="Seasonal Weather Patterns",
         xaxis_title="Season",
         yaxis=dict(title="Temperature (°C)", side="left"),
-        yaxis2=dict(title="Rainfall (mm)", side="right", overlaying="y"),
+        yaxis2=dict(title="Rainfall (mm/month)", side="right", overlaying="y"),
         hovermode="x unified",
         height=500
     )
     
     st.plotly_chart(fig, width='stretch')
+    
+    missing = [d for d in selected_districts if not history.has_data(d)]
+    if missing:
+        st.caption(f"No observations on record for {', '.join(missing)}.")
 
+@timed
 def create_extreme_weather_analysis():
     """Create analysis of extreme weather events"""
-    
-    # Generate sample extreme weather data
-    districts = list(sri_lanka_districts.keys())
-    
-    extreme_data = []
-    for district in districts:
-        np.random.seed(hash(district) % 1000)
-        
-        # Generate extreme events
-        max_temp = 35 + np.random.exponential(3)
-        max_rain = 100 + np.random.exponential(50)
-        max_wind = 60 + np.random.exponential(20)
-        
-        extreme_data.append({
-            'District': district,
-            'Max Temperature': f"{max_temp:.1f}°C",
-            'Max Rainfall (24h)': f"{max_rain:.0f}mm",
-            'Max Windspeed': f"{max_wind:.0f}km/h",
-            'Heat Wave Days': np.random.randint(5, 25),
-            'Flood Risk': np.random.choice(['Low', 'Medium', 'High'], p=[0.4, 0.4, 0.2])
-        })
-    
-    df_extreme = pd.DataFrame(extreme_data)
-    st.dataframe(df_extreme, width='stretch')
+    monthly = load_weather_history().rollups()['monthly']
+    
+    # Extremes over the district x month cube
+    max_rain = monthly.max('rainfall').max(axis=1)
+    years = monthly.count['temperature'].sum(axis=1) / 365.25
+    df_extreme = pd.DataFrame({
+        'District': monthly.districts,
+        'Max Temperature': monthly.max('temperature').max(axis=1),
+        'Max Rainfall (24h)': max_rain,
+        'Max Windspeed': monthly.max('windspeed').max(axis=1),
+        # Days above the 33°C "Hot" mark, per year
+        'Heat Wave Days': np.round(monthly.count_above('temperature', 33).sum(axis=1) / years).astype(int),
+        'Flood Risk': np.select([max_rain > 50, max_rain > 30], ['High', 'Medium'], 'Low')
+    })
+    st.dataframe(df_extreme, width='stretch', hide_index=True, column_config={
+        'Max Temperature': st.column_config.NumberColumn(format="%.1f°C"),
+        'Max Rainfall (24h)': st.column_config.NumberColumn(format="%.0fmm"),
+        'Max Windspeed': st.column_config.NumberColumn(format="%.0fkm/h")
+    })
     
     # Extreme events chart
     fig = go.Figure()
@@ -2375,6 +1873,7 @@ def create_extreme_weather_analysis():
     
     st.plotly_chart(fig, width='stretch')
 
+@timed
 def create_alerts_timeline():
     """Create timeline of historical weather alerts"""
     
@@ -2415,18 +1914,13 @@ def create_alerts_timeline():
     st.subheader("Recent Alerts Summary")
     st.dataframe(df_alerts.sort_values('Date', ascending=False).head(10), width='stretch')
 
+@timed
 def create_interactive_weather_map(date, weather_param):
     """Create interactive weather map for all districts"""
     
     # Get predictions for all districts
-    all_predictions = []
-    for district in sri_lanka_districts.keys():
-        pred = predict_weather(district, date.strftime("%Y-%m-%d"))
-        pred['lat'] = sri_lanka_districts[district]['lat']
-        pred['lon'] = sri_lanka_districts[district]['lon']
-        all_predictions.append(pred)
-    
-    df_map = pd.DataFrame(all_predictions)
+    island = forecast.island_snapshot(date)
+    df_map = island.frame()
     
     # Select the parameter to display
     param_map = {
@@ -2437,6 +1931,39 @@ def create_interactive_weather_map(date, weather_param):
     
     param_col = param_map[weather_param]
     
+    fig = figures.cached_figure(weather_map_figure, island, weather_param,
+                        key=(island.date, island.made, weather_param))
+    st.plotly_chart(fig, width='stretch')
+    
+    # Summary statistics
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        st.metric(
+            label=f"Highest {weather_param}",
+            value=f"{df_map[param_col].max():.1f}",
+            delta=df_map.loc[df_map[param_col].idxmax(), 'district']
+        )
+    
+    with col2:
+        st.metric(
+            label=f"Lowest {weather_param}",
+            value=f"{df_map[param_col].min():.1f}",
+            delta=df_map.loc[df_map[param_col].idxmin(), 'district']
+        )
+    
+    with col3:
+        st.metric(
+            label=f"Average {weather_param}",
+            value=f"{df_map[param_col].mean():.1f}",
+            delta=f"±{df_map[param_col].std():.1f}"
+        )
+
+def weather_map_figure(island, weather_param):
+    """Map of every district's `weather_param` in an IslandSnapshot, with units"""
+    df_map = island.frame()
+    param_col = {'Temperature': 'temperature', 'Rainfall': 'rainfall', 'Windspeed': 'windspeed'}[weather_param]
+    
     # Create the map
     fig = go.Figure()
     
@@ -2463,36 +1990,59 @@ def create_interactive_weather_map(date, weather_param):
             zoom=6.5
         ),
         height=600,
-        title=f"{weather_param} Distribution - {date.strftime('%Y-%m-%d')}",
+        title=f"{weather_param} Distribution - {island.date}",
         margin={"r":0,"t":50,"l":0,"b":0}
     )
-    
-    st.plotly_chart(fig, width='stretch')
-    
-    # Summary statistics
-    col1, col2, col3 = st.columns(3)
-    
-    with col1:
-        st.metric(
-            label=f"Highest {weather_param}",
-            value=f"{df_map[param_col].max():.1f}",
-            delta=df_map.loc[df_map[param_col].idxmax(), 'district']
-        )
-    
-    with col2:
-        st.metric(
-            label=f"Lowest {weather_param}",
-            value=f"{df_map[param_col].min():.1f}",
-            delta=df_map.loc[df_map[param_col].idxmin(), 'district']
-        )
-    
-    with col3:
-        st.metric(
-            label=f"Average {weather_param}",
-            value=f"{df_map[param_col].mean():.1f}",
-            delta=f"±{df_map[param_col].std():.1f}"
-        )
+    return fig
+
+def debug_panel_enabled():
+    """WEATHER_DEBUG_PANEL=1, or ?debug=1 in the page URL, shows the performance panel"""
+    return os.environ.get("WEATHER_DEBUG_PANEL", "0") == "1" or st.query_params.get("debug") == "1"
+
+def show_debug_panel(report):
+    """Sidebar panel with the spans and counters of the rerun that just finished"""
+    counters = report.counters
+    with st.sidebar.expander("🛠️ Performance (last rerun)", expanded=True):
+        st.caption(f"Rerun took {report.seconds * 1000:.0f} ms, computing "
+                   f"{counters.get('forecast_cells_computed', 0)} forecasts")
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("Forecasts", counters.get('forecasts', 0))
+            st.metric("Figure cache hits", counters.get('figure_cache_hits', 0))
+        with col2:
+            st.metric("Forecast cache hits", counters.get('forecast_cache_hits', 0))
+            st.metric("Style bytes", f"{counters.get('style_bytes', 0):,}")
+        if report.spans:
+            st.dataframe(
+                pd.DataFrame(report.rows()),
+                hide_index=True,
+                column_config={
+                    'total_ms': st.column_config.NumberColumn("total ms", format="%.1f"),
+                    'max_ms': st.column_config.NumberColumn("max ms", format="%.1f")
+                }
+            )
+        if 'scheduler' in sys.modules:
+            job = sys.modules['scheduler'].precompute_scheduler.status()
+            st.caption(f"Precompute: {job['state']}, {job['runs']} runs, last {job['last_reason']} run "
+                       f"{job['last_run']} in {job['last_duration_ms']} ms"
+                       + (f", next {job['next_reason']} run {job['next_run']}" if job['next_run'] else "")
+                       + (f" ⚠️ {job['last_error']}" if job['last_error'] else ""))
+        if 'registry' in sys.modules:
+            watcher = sys.modules['registry'].model_watcher
+            if watcher.last_error:
+                st.caption(f"Model reload failed ⚠️ {watcher.last_error}")
+        st.download_button("📥 Prometheus metrics", telemetry.prometheus_text(),
+                           file_name="weather_metrics.prom", mime="text/plain")
 
 # Run the app
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    with telemetry.rerun() as report:
+        main()
+    # After the first page is drawn, so its cold start doesn't wait for pandas and the model
+    start_precompute()
+    start_model_watcher()
+    # WEATHER_METRICS_FILE gets the process totals after every rerun, for node_exporter's textfile collector
+    if os.environ.get("WEATHER_METRICS_FILE"):
+        telemetry.dump(os.environ["WEATHER_METRICS_FILE"])
+    if debug_panel_enabled():
+        show_debug_panel(report)
\ No newline at end of file
@@ -0,0 +1,561 @@
+# bench.py
+# Reproducible benchmarks for the forecast engine, figure builders and pages.
+# `python bench.py --help` shows the command line; results are JSON and can be
+# checked against a stored baseline (bench_baseline.json) to catch regressions.
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from concurrent.futures import Executor, Future
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_FILE = os.path.join(APP_DIR, 'bench_baseline.json')
+
+# A case is slower than its baseline when its best time grows by more than this
+# fraction and by more than NOISE_MS; medians of small cases swing too much
+# between runs on a busy machine to gate on
+TOLERANCE = 0.5
+NOISE_MS = 2.0
+
+class InlineExecutor(Executor):
+    """Runs each submitted call at once in the caller's thread.
+
+    Page cases install it as the job pool, so the work of background
+    jobs is timed with the page that starts it.
+    """
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        return future
+
+class StreamlitStub:
+    """Stand-in for the `st` module while page functions run outside Streamlit.
+
+    Widgets return their defaults and buttons are pressed, so every builder
+    behind a button runs. Charts and tables are serialized the way
+    Streamlit serializes them; everything else is a no-op. `sent_bytes`
+    counts what would have gone to the browser.
+    """
+
+    def __init__(self, press_buttons=True):
+        self.press_buttons = press_buttons
+        self.session_state = {}
+        self.sent_bytes = 0
+        self.sidebar = self
+        self.column_config = self
+
+    def __getattr__(self, name):
+        return self._element
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def _element(self, *args, **kwargs):
+        self.sent_bytes += sum(len(a) for a in args if isinstance(a, str))
+        return self
+
+    def columns(self, spec, **kwargs):
+        return [self] * (spec if isinstance(spec, int) else len(spec))
+
+    def tabs(self, labels):
+        return [self] * len(labels)
+
+    def selectbox(self, label, options, index=0, **kwargs):
+        options = list(options)
+        return options[index] if options and index is not None else None
+
+    radio = selectbox
+
+    def select_slider(self, label, options=(), value=None, **kwargs):
+        return list(options)[0] if value is None else value
+
+    def multiselect(self, label, options, default=None, **kwargs):
+        return list(default or [])
+
+    def slider(self, label, min_value=None, max_value=None, value=None, **kwargs):
+        return min_value if value is None else value
+
+    def number_input(self, label, min_value=None, max_value=None, value=None, **kwargs):
+        return min_value if value is None else value
+
+    def text_input(self, label, value='', **kwargs):
+        return value
+
+    def checkbox(self, label, value=False, **kwargs):
+        return value
+
+    def date_input(self, label, value=None, **kwargs):
+        as_date = lambda v: v.date() if isinstance(v, datetime) else v
+        if value is None:
+            return date.today()
+        return tuple(as_date(v) for v in value) if isinstance(value, (list, tuple)) else as_date(value)
+
+    def button(self, *args, **kwargs):
+        return self.press_buttons
+
+    def download_button(self, *args, **kwargs):
+        # The data callable runs only when a user clicks
+        return False
+
+    def plotly_chart(self, figure_or_data, **kwargs):
+        import plotly.io
+        import plotly.tools
+        figure = plotly.tools.return_figure_from_figure_or_data(figure_or_data, validate_figure=True)
+        self.sent_bytes += len(plotly.io.to_json(figure, validate=False))
+        return self
+
+    def dataframe(self, data, **kwargs):
+        from streamlit import dataframe_util
+        self.sent_bytes += len(dataframe_util.convert_anything_to_arrow_bytes(data))
+        return self
+
+    table = dataframe
+
+def clear_caches():
+    """Forget every cached forecast, snapshot and figure, for cold runs"""
+    from forecast import forecast_cache, clear_snapshots
+    from figures import figure_cache
+    forecast_cache.clear()
+    clear_snapshots()
+    figure_cache.clear()
+
+class Case:
+    """A named measurement; `setup` runs untimed before every timed call of `fn`.
+
+    With `metrics`, `fn` returns a dict of extra figures (sizes, counts)
+    reported next to the timings.
+    """
+
+    def __init__(self, name, fn, setup=None, metrics=False):
+        self.name = name
+        self.fn = fn
+        self.setup = setup
+        self.metrics = metrics
+
+def run_case(case, repeat):
+    """Median and best wall time of `repeat` runs after one warm-up run, in ms"""
+    times = []
+    extra = {}
+    for i in range(repeat + 1):
+        if case.setup is not None:
+            case.setup()
+        start = time.perf_counter()
+        result = case.fn()
+        elapsed = time.perf_counter() - start
+        if i:
+            times.append(elapsed * 1000)
+        if case.metrics:
+            extra = result
+    return {'median_ms': round(statistics.median(times), 3), 'best_ms': round(min(times), 3), **extra}
+
+def calibrate(repeat=15):
+    """Best time of a fixed NumPy + pure-Python workload, in ms.
+
+    Baselines are scaled by the ratio of calibrations, so a run on a slower
+    or busier machine isn't reported as a regression of every case.
+    """
+    data = np.random.default_rng(0).random(100_000)
+    def workload():
+        np.sort(data)
+        sum(i * i for i in range(20_000))
+        json.dumps({str(i): i for i in range(2_000)})
+    return run_case(Case('calibration', workload), repeat)['best_ms']
+
+def synthetic_history(districts=25, start='2020-01-01', end='2024-12-31', seed=0):
+    """Daily temperature-like series, one column per district"""
+    dates = pd.date_range(start, end, freq='D')
+    rng = np.random.default_rng(seed)
+    season = 27 + 3 * np.sin(np.arange(len(dates)) * 2 * np.pi / 365.25)
+    values = season[:, None] + rng.normal(0, 1.5, (len(dates), districts))
+    return pd.DataFrame(values, index=dates, columns=[f'District {i + 1}' for i in range(districts)])
+
+def forecast_cases():
+    from forecast import (sri_lanka_districts, forecast_cache, clear_snapshots, predict_weather,
+                          predict_weather_batch, island_snapshot)
+    today = datetime.now().strftime("%Y-%m-%d")
+    districts = list(sri_lanka_districts)
+    month = pd.date_range(today, periods=30, freq='D')
+
+    def cold_snapshot():
+        forecast_cache.clear()
+        clear_snapshots()
+
+    return [
+        Case('forecast/single/cold', lambda: predict_weather('Colombo', today), forecast_cache.clear),
+        Case('forecast/single/warm', lambda: predict_weather('Colombo', today)),
+        Case('forecast/single/mock-district', lambda: predict_weather('Badulla', today), forecast_cache.clear),
+        Case('forecast/snapshot-25/cold', lambda: island_snapshot(today), cold_snapshot),
+        Case('forecast/snapshot-25/warm', lambda: island_snapshot(today)),
+        Case('forecast/grid-25x30', lambda: predict_weather_batch(districts, month, cache=False))
+    ]
+
+def rules_cases():
+    from forecast import sri_lanka_districts, predict_weather_batch
+    from alerts import RULES, evaluate
+    from rules import classify
+    grid = predict_weather_batch(list(sri_lanka_districts), pd.date_range('2025-01-01', periods=30, freq='D'),
+                                 cache=False)
+    records = grid.to_dict('records')
+    return [
+        Case('rules/grid-25x30/vectorized', lambda: classify(grid)),
+        Case('rules/grid-25x30/scalar', lambda: [{rule: evaluate(rule, r) for rule in RULES} for r in records])
+    ]
+
+def ensemble_cases():
+    from forecast import sri_lanka_districts
+    from ensemble import ensemble_forecast
+    districts = list(sri_lanka_districts)
+    today = pd.Timestamp(datetime.now().date())
+    cases = []
+    # How the island's ensemble (draws plus percentile/exceedance summary) scales with members
+    for days in (1, 30):
+        dates = pd.date_range(today, periods=days, freq='D')
+        for members in (50, 100, 200, 500):
+            cases.append(Case(f'ensemble/island-{days}d/{members}',
+                              lambda dates=dates, members=members: ensemble_forecast(districts, dates, members).frame()))
+    return cases
+
+def figure_cases(history):
+    from figures import point_budget, trend_figure, figure_cache
+    import app
+
+    def history_chart(history=history, **options):
+        def build():
+            fig = trend_figure(history, "Historical Temperature", "Temperature (°C)",
+                               "Temperature", "°C", **options)
+            return {'points': sum(len(trace.y) for trace in fig.data),
+                    'payload_bytes': len(fig.to_json().encode('utf-8'))}
+        return build
+
+    budget = point_budget()
+    prediction = {'temperature': 29.5, 'rainfall': 12.0, 'windspeed': 18.0}
+    # Long enough that downsampling has points to save
+    long_history = synthetic_history(start='1990-01-01')
+    return [
+        Case('figure/history-chart/full', history_chart(budget=None, method=None), metrics=True),
+        Case('figure/history-chart/full-webgl', history_chart(budget=None, method=None, webgl=True),
+             metrics=True),
+        Case('figure/history-chart/lttb', history_chart(budget=budget, method='LTTB'), metrics=True),
+        Case('figure/history-chart/minmax', history_chart(budget=budget, method='Min-max'), metrics=True),
+        Case('figure/history-chart-35y/full', history_chart(budget=None, method=None, history=long_history),
+             metrics=True),
+        Case('figure/history-chart-35y/lttb', history_chart(budget=budget, method='LTTB', history=long_history),
+             metrics=True),
+        Case('figure/history-chart-35y/minmax',
+             history_chart(budget=budget, method='Min-max', history=long_history), metrics=True),
+        Case('figure/district-map/cold', lambda: app.plot_district_map('Colombo'), figure_cache.clear),
+        Case('figure/district-map/warm', lambda: app.plot_district_map('Colombo')),
+        Case('figure/weather-gauges/cold', lambda: app.create_weather_gauges(prediction), figure_cache.clear),
+        Case('figure/weather-gauges/warm', lambda: app.create_weather_gauges(prediction)),
+        Case('figure/prediction-map/cold', lambda: app.create_interactive_prediction_map(
+            datetime.now(), 'Temperature'), figure_cache.clear),
+        Case('figure/prediction-map/warm', lambda: app.create_interactive_prediction_map(
+            datetime.now(), 'Temperature'))
+    ]
+
+def page_cases(stub):
+    import app
+    today = datetime.now().strftime("%Y-%m-%d")
+
+    def measured(fn, *args):
+        def call():
+            stub.sent_bytes = 0
+            fn(*args)
+            return {'sent_bytes': stub.sent_bytes}
+        return call
+
+    compared = ['Colombo', 'Kandy', 'Galle', 'Ampara']
+    cases = [
+        Case('builder/compare-districts-weather',
+             measured(app.compare_districts_weather, compared, today), metrics=True),
+        Case('builder/multi-day-forecast-analysis/cold',
+             measured(app.create_multi_day_forecast_analysis, compared), clear_caches, metrics=True),
+        Case('builder/multi-day-forecast-analysis/warm',
+             measured(app.create_multi_day_forecast_analysis, compared), metrics=True)
+    ]
+    pages = {
+        'dashboard': app.dashboard_page,
+        'predict': app.predict_page,
+        'compare': app.compare_page,
+        'historical': app.historical_page,
+        'rescue': app.rescue_page,
+        'about': app.about_page
+    }
+    for name, page in pages.items():
+        cases.append(Case(f'page/{name}/cold', measured(page), clear_caches, metrics=True))
+        cases.append(Case(f'page/{name}/warm', measured(page), metrics=True))
+    # A whole rerun: styling, sidebar and the default page (the dashboard)
+    cases.append(Case('rerun/main/warm', measured(app.main), metrics=True))
+    return cases
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """Cases whose best time is more than `tolerance` slower than the baseline's.
+
+    Baseline times are first scaled by the ratio of the two runs' calibrations.
+    """
+    scale = results['meta']['calibration_ms'] / baseline['meta'].get('calibration_ms', results['meta']['calibration_ms'])
+    regressions = []
+    for name, result in results['cases'].items():
+        before = baseline.get('cases', {}).get(name)
+        if before is None:
+            continue
+        expected = before['best_ms'] * scale
+        if result['best_ms'] - expected > NOISE_MS and result['best_ms'] > expected * (1 + tolerance):
+            regressions.append((name, expected, result['best_ms']))
+    return regressions
+
+def slower_than_full(results):
+    """Downsampled history charts slower than the chart of every point of the same history.
+
+    Only charts that dropped points count; a history too short to be worth
+    downsampling is charted whole. Returns (name, full chart's best, best)
+    in ms, like compare().
+    """
+    slower = []
+    for name, result in results['cases'].items():
+        group, _, method = name.rpartition('/')
+        full = results['cases'].get(f'{group}/full')
+        if method not in ('lttb', 'minmax') or full is None or result['points'] >= full['points']:
+            continue
+        if result['best_ms'] > full['best_ms'] + NOISE_MS:
+            slower.append((name, full['best_ms'], result['best_ms']))
+    return slower
+
+# Run in a fresh interpreter by startup_report(): imports Streamlit, then times
+# importing app.py and drawing one page with Streamlit in bare mode
+_STARTUP_SCRIPT = """
+import json, sys, time
+import streamlit.logger
+streamlit.logger.set_log_level('error')
+before = len(sys.modules)
+print('-- app --', file=sys.stderr, flush=True)
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+getattr(app, sys.argv[1] + '_page')()
+done = time.perf_counter()
+print(json.dumps({'import_ms': (imported - start) * 1000, 'page_ms': (done - imported) * 1000,
+                  'modules': len(sys.modules) - before}))
+"""
+
+STARTUP_PAGES = ['dashboard', 'predict', 'compare', 'historical', 'rescue', 'about']
+
+def _import_times(stderr, top=10):
+    """Slowest top-level imports after app.py started loading, module -> ms, from -X importtime"""
+    _, _, lines = stderr.partition('-- app --')
+    times = []
+    for line in lines.splitlines():
+        if not line.startswith('import time:') or line.endswith('| imported package'):
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Nested imports are indented under the one that caused them
+        if cumulative.strip().isdigit() and not name.startswith('  '):
+            times.append((name.strip(), round(int(cumulative) / 1000, 1)))
+    return dict(sorted(times, key=lambda t: t[1], reverse=True)[:top])
+
+def startup_report(pages=STARTUP_PAGES, repeat=3):
+    """Time to first paint of each page in a cold interpreter, best of `repeat`.
+
+    Each run is a new `python -X importtime` process, so module loading is
+    measured from scratch; the model state stays in its on-disk cache.
+    """
+    import subprocess
+    env = dict(os.environ, PYTHONPATH=APP_DIR, PYTHONWARNINGS='ignore')
+    report = {}
+    for page in pages:
+        best = None
+        for _ in range(max(repeat, 1)):
+            run = subprocess.run([sys.executable, '-X', 'importtime', '-c', _STARTUP_SCRIPT, page],
+                                 cwd=APP_DIR, env=env, capture_output=True, text=True, check=True)
+            result = json.loads(run.stdout.strip().splitlines()[-1])
+            result['first_paint_ms'] = result['import_ms'] + result['page_ms']
+            if best is None or result['first_paint_ms'] < best['first_paint_ms']:
+                result['slowest_imports'] = _import_times(run.stderr)
+                best = result
+        report[page] = {key: round(value, 1) if isinstance(value, float) else value
+                        for key, value in best.items()}
+        print(f"startup/{page:38s} {best['first_paint_ms']:10.2f} ms", file=sys.stderr)
+    return report
+
+def scaling_report(workers=None, days=365, members=200, repeat=3):
+    """Throughput of an island scenario run by worker count, best of `repeat`.
+
+    'in-process' is the same grid summarised chunk by chunk in this
+    process, as one Streamlit script thread would. Pools are started and
+    warmed up before timing, so process start-up isn't counted.
+    """
+    from forecast import install_model_engine, sri_lanka_districts
+    from ensemble import ensemble_forecast
+    from scenarios import MAX_SHARD_DAYS, run_scenario, scenario_pool
+    districts = list(sri_lanka_districts)
+    dates = pd.date_range(pd.Timestamp(datetime.now().date()), periods=days, freq='D')
+    cells = len(districts) * days * members
+    cpus = os.cpu_count() or 1
+    workers = workers or sorted({n for n in (1, 2, 4, 8, 16) if n <= cpus} | {cpus})
+
+    def in_process():
+        for start in range(0, days, MAX_SHARD_DAYS):
+            ensemble_forecast(districts, dates[start:start + MAX_SHARD_DAYS], members, cache=False).summary()
+
+    # In-process runs forecast with the engine the workers install
+    try:
+        install_model_engine(warm_up=True)
+    except OSError as e:
+        print(f"Model files could not be loaded ({e}); timing simulated forecasts", file=sys.stderr)
+    runs = {'in-process': in_process}
+    report = {'cpus': cpus, 'grid': f"{len(districts)}x{days}x{members}", 'workers': {}}
+    for label in ['in-process'] + list(workers):
+        pool = None if label == 'in-process' else scenario_pool(label)
+        if pool is not None:
+            run_scenario(districts, dates[:label], 10, executor=pool, workers=label).wait()
+            runs[label] = lambda pool=pool, n=label: run_scenario(districts, dates, members, executor=pool,
+                                                                  workers=n).result()
+        best = min(_timed_call(runs[label]) for _ in range(max(repeat, 1)))
+        if pool is not None:
+            pool.shutdown()
+        report['workers'][str(label)] = {'seconds': round(best, 3), 'cells_per_second': round(cells / best)}
+        print(f"scaling/{str(label):38s} {best * 1000:10.2f} ms", file=sys.stderr)
+    serial = report['workers']['in-process']['seconds']
+    for label, result in report['workers'].items():
+        result['speedup'] = round(serial / result['seconds'], 2)
+    return report
+
+def _timed_call(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the forecast engine, figure builders and pages")
+    parser.add_argument('--repeat', type=int, default=7, help="Timed runs per case; the best is compared")
+    parser.add_argument('--filter', default='', help="Only run cases whose name contains this text")
+    parser.add_argument('--history', choices=['store', 'synthetic'], default='synthetic',
+                        help="Chart the real history store or 25 synthetic districts over 2020-2024")
+    parser.add_argument('--mock', action='store_true', help="Benchmark the simulated forecasts")
+    parser.add_argument('-o', '--output', help="Write the results to this file as well as stdout")
+    parser.add_argument('--baseline', default=BASELINE_FILE, help="Baseline to compare against")
+    parser.add_argument('--save-baseline', action='store_true', help="Store these results as the baseline")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help="Allowed median slowdown before a case counts as a regression")
+    parser.add_argument('--startup', action='store_true',
+                        help="Report each page's cold-start time and slowest imports instead")
+    parser.add_argument('--scaling', nargs='?', const='', metavar='WORKERS',
+                        help="Report scenario throughput by worker count instead, e.g. --scaling 1,2,4 "
+                             "(default: powers of two up to the CPU count)")
+    args = parser.parse_args(argv)
+
+    if args.mock:
+        os.environ['WEATHER_FORECAST_MODE'] = 'mock'
+    if args.scaling is not None:
+        workers = [int(n) for n in args.scaling.split(',') if n.strip()]
+        text = json.dumps({'python': platform.python_version(),
+                           'scaling': scaling_report(workers, repeat=min(args.repeat, 3))}, indent=2)
+        print(text)
+        if args.output:
+            with open(args.output, 'w') as f:
+                f.write(text + '\n')
+        return 0
+    if args.startup:
+        pages = [page for page in STARTUP_PAGES if args.filter in page]
+        text = json.dumps({'python': platform.python_version(),
+                           'pages': startup_report(pages, min(args.repeat, 3))}, indent=2)
+        print(text)
+        if args.output:
+            with open(args.output, 'w') as f:
+                f.write(text + '\n')
+        return 0
+    # Outside `streamlit run`, Streamlit warns about the missing runtime on every cached call
+    import streamlit.logger
+    streamlit.logger.set_log_level('error')
+
+    from forecast import install_model_engine, model_version
+    load_start = time.perf_counter()
+    try:
+        install_model_engine(warm_up=True)
+    except OSError as e:
+        print(f"Model files could not be loaded ({e}); benchmarking simulated forecasts", file=sys.stderr)
+    load_ms = (time.perf_counter() - load_start) * 1000
+
+    import app
+    import jobs
+    stub = StreamlitStub()
+    app.st = stub
+    jobs.use_pool(InlineExecutor())
+    if args.history == 'store':
+        from history import load_history_store
+        history = load_history_store().frame('temperature')
+    else:
+        history = synthetic_history()
+
+    cases = forecast_cases() + rules_cases() + ensemble_cases() + figure_cases(history) + page_cases(stub)
+    calibration = calibrate()
+    results = {
+        'meta': {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'model_version': model_version(),
+            'model_load_ms': round(load_ms, 1),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'machine': platform.machine(),
+            'history': args.history,
+            'repeat': args.repeat
+        },
+        'cases': {}
+    }
+    for case in cases:
+        if args.filter in case.name:
+            results['cases'][case.name] = run_case(case, args.repeat)
+            print(f"{case.name:45s} {results['cases'][case.name]['median_ms']:10.2f} ms", file=sys.stderr)
+    # Calibrated before and after, in case the machine's speed drifts during the run
+    results['meta']['calibration_ms'] = round((calibration + calibrate()) / 2, 3)
+
+    regressions = []
+    baseline = None
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        # Measure suspects once more; a one-off stall shouldn't fail the run
+        suspects = {name for name, _, _ in compare(results, baseline, args.tolerance)}
+        for case in cases:
+            if case.name in suspects:
+                retry = run_case(case, args.repeat)
+                if retry['best_ms'] < results['cases'][case.name]['best_ms']:
+                    results['cases'][case.name] = retry
+        regressions = compare(results, baseline, args.tolerance)
+    slower = slower_than_full(results)
+
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            f.write(text + '\n')
+    elif baseline is not None:
+        for name, before, after in regressions:
+            print(f"REGRESSION {name}: expected {before:.2f} ms, took {after:.2f} ms", file=sys.stderr)
+        if baseline['meta'].get('model_version') != results['meta']['model_version']:
+            print("Note: the baseline was recorded with model "
+                  f"{baseline['meta'].get('model_version')}", file=sys.stderr)
+    for name, full, after in slower:
+        print(f"SLOWER THAN FULL {name}: took {after:.2f} ms, every point {full:.2f} ms", file=sys.stderr)
+    return 1 if regressions or slower else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,31 @@
+# districts.py
+# No heavy imports here: pages that only list districts load just this module.
+
+# District data for Sri Lanka
+sri_lanka_districts = {
+    'Ampara': {'lat': 7.2833, 'lon': 81.6667},
+    'Colombo': {'lat': 6.9271, 'lon': 79.8612},
+    'Kandy': {'lat': 7.2906, 'lon': 80.6337},
+    'Galle': {'lat': 6.0329, 'lon': 80.2168},
+    'Jaffna': {'lat': 9.6615, 'lon': 80.0255},
+    'Matara': {'lat': 5.9556, 'lon': 80.5483},
+    'Trincomalee': {'lat': 8.5874, 'lon': 81.2152},
+    'Anuradhapura': {'lat': 8.3114, 'lon': 80.4037},
+    'Badulla': {'lat': 6.9934, 'lon': 81.0550},
+    'Batticaloa': {'lat': 7.7167, 'lon': 81.7000},
+    'Gampaha': {'lat': 7.0917, 'lon': 79.9997},
+    'Hambantota': {'lat': 6.1245, 'lon': 81.1185},
+    'Kalutara': {'lat': 6.5894, 'lon': 79.9573},
+    'Kegalle': {'lat': 7.2533, 'lon': 80.3464},
+    'Kilinochchi': {'lat': 9.3961, 'lon': 80.3989},
+    'Kurunegala': {'lat': 7.4863, 'lon': 80.3623},
+    'Mannar': {'lat': 8.9816, 'lon': 79.9047},
+    'Matale': {'lat': 7.4675, 'lon': 80.6234},
+    'Moneragala': {'lat': 6.8724, 'lon': 81.3507},
+    'Mullaitivu': {'lat': 9.2673, 'lon': 80.8142},
+    'Nuwara Eliya': {'lat': 6.9497, 'lon': 80.7891},
+    'Polonnaruwa': {'lat': 7.9329, 'lon': 81.0081},
+    'Puttalam': {'lat': 8.0374, 'lon': 79.8283},
+    'Ratnapura': {'lat': 6.7057, 'lon': 80.3847},
+    'Vavuniya': {'lat': 8.7514, 'lon': 80.4971}
+}
@@ -0,0 +1,161 @@
+# ensemble.py
+# Probabilistic forecasts: N members per district x date, drawn around the
+# point forecast in one batched array operation.
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from alerts import RULES
+from forecast import NOISE_SLOTS, forecast_key, keyed_normal, predict_weather_batch
+from rules import classify
+from telemetry import telemetry, timed
+
+DEFAULT_MEMBERS = 100
+MAX_MEMBERS = 500
+
+# Standard deviation of the members around the point forecast, as (at day 0,
+# extra by day 30 and beyond); rainfall's first pair is of its logarithm, the
+# second in mm, so a dry point forecast can still turn wet
+ENSEMBLE_SPREAD = {
+    'temperature': (0.8, 2.2),
+    'rainfall': ((0.35, 0.6), (1.0, 5.0)),
+    'windspeed': (1.5, 3.0)
+}
+
+# Physical ranges, as _forecast_grid clips the point forecast
+VALUE_RANGES = {'temperature': (15, 40), 'rainfall': (0, None), 'windspeed': (5, 60)}
+
+# Width of the 10-90th percentile band at which a variable counts as no skill;
+# confidence runs from 100 (no spread) down to 50 (every variable that wide)
+CONFIDENCE_WIDTH = {'temperature': 8.0, 'rainfall': 40.0, 'windspeed': 20.0}
+
+# Exceedance thresholds: those of the 'severe' rule, e.g. P(rainfall > 50 mm)
+EXCEEDANCE = [(variable, threshold) for _, tests in RULES['severe']['rows']
+              for variable, op, threshold, *_ in tests]
+
+# Member draws use stream slots after the point forecast's NOISE_SLOTS
+_FIRST_SLOT = len(NOISE_SLOTS)
+_DRAWS = ('temperature', 'rainfall_log', 'rainfall', 'windspeed')
+
+def _spread(pair, growth):
+    low, extra = pair
+    return low + extra * growth
+
+class Ensemble:
+    """Members of a district x date grid, (districts, dates, members) arrays per variable"""
+
+    def __init__(self, point, districts, dates, members):
+        self.point = point
+        self.districts = districts
+        self.dates = dates
+        self.members = members
+        self.size = next(iter(members.values())).shape[-1]
+
+    def percentiles(self, variable, q):
+        """Percentiles `q` (0-100) over the members, shape (len(q), districts, dates)"""
+        return np.percentile(self.members[variable], q, axis=-1)
+
+    def exceedance(self, variable, threshold):
+        """Fraction of members above `threshold`, shape (districts, dates)"""
+        return (self.members[variable] > threshold).mean(axis=-1)
+
+    def severe_probability(self):
+        """Fraction of members alerts.RULES calls severe"""
+        return classify(self.members, ['severe'])['severe'].mean(axis=-1)
+
+    def confidence(self, bands=None):
+        """Confidence (50-100) from the 10-90th percentile spread of each variable.
+
+        `bands` maps variables to their {10: p10, 90: p90} arrays, when
+        already computed.
+        """
+        if bands is None:
+            bands = {v: dict(zip((10, 90), self.percentiles(v, [10, 90]))) for v in CONFIDENCE_WIDTH}
+        unskilled = [np.minimum((bands[v][90] - bands[v][10]) / width, 1.0)
+                     for v, width in CONFIDENCE_WIDTH.items()]
+        return np.round(100 - 50 * np.mean(unskilled, axis=0)).astype(int)
+
+    def summary(self, q=(10, 50, 90), thresholds=EXCEEDANCE):
+        """Field -> (districts, dates) array, for every field of summary_fields(q, thresholds)"""
+        # One pass over the members per variable for every percentile needed
+        needed = sorted(set(q) | {10, 90})
+        bands = {v: dict(zip(needed, self.percentiles(v, needed))) for v in VALUE_RANGES}
+        shape = (len(self.districts), len(self.dates))
+        fields = {}
+        for variable in VALUE_RANGES:
+            fields[variable] = self.point[variable].to_numpy(dtype=np.float64).reshape(shape)
+            for p in q:
+                fields[f'{variable}_p{p:g}'] = np.round(bands[variable][p], 1)
+        for variable, threshold in thresholds:
+            fields[f'p_{variable}_gt_{threshold:g}'] = self.exceedance(variable, threshold)
+        fields['p_severe'] = self.severe_probability()
+        fields['confidence'] = self.confidence(bands)
+        return fields
+
+    def frame(self, q=(10, 50, 90), thresholds=EXCEEDANCE):
+        """One row per (district, date), districts outermost, as predict_weather_batch orders them.
+
+        Holds the point forecast, percentile columns such as rainfall_p90,
+        exceedance probabilities such as p_rainfall_gt_50, p_severe and the
+        spread-based confidence.
+        """
+        columns = {'district': self.point['district'].to_numpy(), 'date': self.point['date'].to_numpy()}
+        columns.update((field, values.ravel()) for field, values in self.summary(q, thresholds).items())
+        columns['members'] = self.size
+        return pd.DataFrame(columns)
+
+def summary_fields(q=(10, 50, 90), thresholds=EXCEEDANCE):
+    """Names of the fields Ensemble.summary(q, thresholds) returns, in order"""
+    fields = []
+    for variable in VALUE_RANGES:
+        fields += [variable] + [f'{variable}_p{p:g}' for p in q]
+    fields += [f'p_{variable}_gt_{threshold:g}' for variable, threshold in thresholds]
+    return fields + ['p_severe', 'confidence']
+
+@timed
+def ensemble_forecast(districts, dates, members=DEFAULT_MEMBERS, cache=True):
+    """Ensemble of `members` forecasts for every district x date pair.
+
+    Members scatter around predict_weather_batch's point forecast, wider
+    the further ahead the date. Like the mock generator they are drawn
+    from streams keyed on district, date and member number, so an ensemble
+    is the same in every process. `cache` is passed on to
+    predict_weather_batch.
+
+    >>> e = ensemble_forecast(['Colombo', 'Badulla'], ['2024-06-01'], members=200)
+    >>> e.members['rainfall'].shape
+    (2, 1, 200)
+    >>> e.frame()[['district', 'rainfall', 'rainfall_p10', 'rainfall_p90', 'p_rainfall_gt_50']].values.tolist()
+    [['Colombo', 31.9, 19.4, 46.6, 0.07], ['Badulla', 36.0, 21.6, 50.2, 0.115]]
+    """
+    if not 1 <= members <= MAX_MEMBERS:
+        raise ValueError(f"members must be between 1 and {MAX_MEMBERS}")
+    districts = list(districts)
+    point = predict_weather_batch(districts, dates, cache=cache)
+    shape = (len(districts), len(point) // max(len(districts), 1))
+    date_strs = point['date'].to_numpy()[:shape[1]].tolist()
+    telemetry.count('ensemble_members', shape[0] * shape[1] * members)
+
+    # One draw per member and variable: (districts, dates, members, draws)
+    keys = np.array([forecast_key(d, t) for d in districts for t in date_strs], dtype=np.uint64).reshape(shape)
+    slots = _FIRST_SLOT + np.arange(members * len(_DRAWS)).reshape(members, len(_DRAWS))
+    z = keyed_normal(keys, slots)
+    draw = {name: z[..., i] for i, name in enumerate(_DRAWS)}
+
+    # Spread grows with the lead time, up to 30 days; (1, dates, 1)
+    today = datetime.now().date()
+    days_ahead = np.array([(pd.Timestamp(t).date() - today).days for t in date_strs])
+    growth = np.clip(days_ahead / 30, 0.0, 1.0)[None, :, None]
+
+    centre = {v: point[v].to_numpy(dtype=np.float64).reshape(shape)[..., None] for v in VALUE_RANGES}
+    log_spread = _spread(ENSEMBLE_SPREAD['rainfall'][0], growth)
+    values = {
+        'temperature': centre['temperature'] + _spread(ENSEMBLE_SPREAD['temperature'], growth) * draw['temperature'],
+        # Mean-preserving lognormal scaling, plus an additive term
+        'rainfall': centre['rainfall'] * np.exp(log_spread * draw['rainfall_log'] - log_spread ** 2 / 2)
+                    + _spread(ENSEMBLE_SPREAD['rainfall'][1], growth) * draw['rainfall'],
+        'windspeed': centre['windspeed'] + _spread(ENSEMBLE_SPREAD['windspeed'], growth) * draw['windspeed']
+    }
+    members_by_variable = {v: np.clip(values[v], *VALUE_RANGES[v]) for v in VALUE_RANGES}
+    return Ensemble(point, districts, date_strs, members_by_variable)
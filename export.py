@@ -0,0 +1,89 @@
+# export.py
+# Streaming forecast export: NDJSON or CSV chunks for any district x date range
+# in constant memory. `python export.py --help` shows the command line.
+import argparse
+import sys
+from datetime import datetime
+
+import pandas as pd
+
+from forecast import sri_lanka_districts, predict_weather_batch, install_model_engine
+
+# Export format -> MIME type
+EXPORT_FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+# Dates forecast per chunk; memory is bounded by districts x CHUNK_DAYS rows
+CHUNK_DAYS = 31
+
+def _chunks(districts, first, last, fmt, chunk_days):
+    header = True
+    chunk_start = first
+    while chunk_start <= last:
+        chunk_end = min(chunk_start + pd.Timedelta(days=chunk_days - 1), last)
+        # Bulk rows would only evict the interactive entries from forecast_cache
+        df = predict_weather_batch(districts, pd.date_range(chunk_start, chunk_end, freq='D'), cache=False)
+        df = df.sort_values('date', kind='stable')
+        if fmt == 'csv':
+            yield df.to_csv(index=False, header=header)
+            header = False
+        else:
+            yield df.to_json(orient='records', lines=True)
+        chunk_start = chunk_end + pd.Timedelta(days=1)
+
+def iter_forecast_export(districts, start, end, fmt='ndjson', chunk_days=CHUNK_DAYS):
+    """Generator of text chunks holding the forecasts for districts x [start, end].
+
+    Rows are ordered by date, then district, with the columns of
+    predict_weather. CSV output has one header line. Each chunk covers up
+    to `chunk_days` dates and nothing is kept between chunks. Arguments are
+    checked before the first chunk, so bad input raises ValueError here.
+    """
+    districts = list(districts)
+    unknown = [d for d in districts if d not in sri_lanka_districts]
+    if unknown:
+        raise ValueError(f"Unknown districts: {', '.join(unknown)}")
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}; use one of {', '.join(EXPORT_FORMATS)}")
+    if chunk_days < 1:
+        raise ValueError("chunk_days must be at least 1")
+    first = pd.Timestamp(start).normalize()
+    last = pd.Timestamp(end).normalize()
+    if last < first:
+        raise ValueError("The export range ends before it starts")
+    return _chunks(districts, first, last, fmt, chunk_days)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export forecasts for a district x date range")
+    parser.add_argument('--districts', default='',
+                        help="Comma-separated districts (default: all 25)")
+    parser.add_argument('--start', default=datetime.now().strftime("%Y-%m-%d"),
+                        help="First date, YYYY-MM-DD (default: today)")
+    parser.add_argument('--end', help="Last date, YYYY-MM-DD (default: start + days - 1)")
+    parser.add_argument('--days', type=int, default=365, help="Days to export when --end is not given")
+    parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='ndjson')
+    parser.add_argument('--chunk-days', type=int, default=CHUNK_DAYS)
+    parser.add_argument('-o', '--output', default='-', help="Output file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    districts = [d.strip() for d in args.districts.split(',') if d.strip()] or list(sri_lanka_districts)
+    try:
+        end = args.end or pd.Timestamp(args.start) + pd.Timedelta(days=args.days - 1)
+        chunks = iter_forecast_export(districts, args.start, end, args.format, args.chunk_days)
+    except ValueError as e:
+        parser.error(str(e))
+
+    try:
+        install_model_engine()
+    except OSError as e:
+        print(f"Model files could not be loaded ({e}); exporting simulated forecasts", file=sys.stderr)
+
+    out = sys.stdout if args.output == '-' else open(args.output, 'w', newline='', encoding='utf-8')
+    try:
+        for chunk in chunks:
+            out.write(chunk)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+if __name__ == '__main__':
+    main()
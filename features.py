@@ -0,0 +1,222 @@
+# features.py
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Daily observations the features are derived from
+OBSERVATION_COLUMNS = ['temp', 'humidity', 'precip', 'rainfall (mm)', 'windspeed']
+
+# Every feature the builder knows how to compute
+FEATURE_COLUMNS = [
+    'district_encoded', 'month_sin', 'month_cos', 'day_sin', 'day_cos',
+    'humidity', 'precip', 'temp_lag1', 'humidity_lag1', 'rainfall (mm)_lag1', 'temp_roll3'
+]
+
+def validate_feature_columns(feature_columns):
+    """Check a model's feature column list against the builder; returns it as a list"""
+    feature_columns = list(feature_columns)
+    unknown = [c for c in feature_columns if c not in FEATURE_COLUMNS]
+    missing = [c for c in FEATURE_COLUMNS if c not in feature_columns]
+    if unknown or missing or len(set(feature_columns)) != len(feature_columns):
+        raise ValueError(f"Feature columns do not match the feature builder "
+                         f"(unknown: {unknown}, missing: {missing})")
+    return feature_columns
+
+class DistrictCodes:
+    """The classes_ and transform() of a fitted LabelEncoder, without scikit-learn.
+
+    >>> DistrictCodes(['Colombo', 'Ampara']).transform(['Colombo', 'Ampara', 'Colombo']).tolist()
+    [1, 0, 1]
+    """
+
+    def __init__(self, classes):
+        # LabelEncoder keeps its classes sorted
+        self.classes_ = np.sort(np.asarray([str(c) for c in classes]))
+
+    def transform(self, y):
+        y = np.asarray(y, dtype=str)
+        codes = np.searchsorted(self.classes_, y).clip(max=max(len(self.classes_) - 1, 0))
+        unknown = self.classes_[codes] != y if len(self.classes_) else np.ones(len(y), dtype=bool)
+        if unknown.any():
+            raise ValueError(f"y contains previously unseen labels: {sorted(set(y[unknown]))}")
+        return codes
+
+def build_features(observations, district_encoder, feature_columns=FEATURE_COLUMNS):
+    """Model features for a long frame of daily observations.
+
+    `observations` has one row per district and day, with 'district' and
+    'date' columns plus OBSERVATION_COLUMNS. Rows of a district must be in
+    date order; districts may be interleaved. Lags and the 3-day rolling
+    mean are taken within each district, so the first rows of a district
+    have NaN there. The result is row-aligned with `observations` and its
+    columns follow `feature_columns`.
+    """
+    feature_columns = validate_feature_columns(feature_columns)
+    dates = pd.DatetimeIndex(observations['date'])
+    month = dates.month.to_numpy()
+    day = dates.dayofyear.to_numpy()
+
+    # Encode each distinct district once
+    codes, names = pd.factorize(observations['district'])
+    encoded = district_encoder.transform(np.asarray(names))[codes]
+
+    grouped = observations.groupby(codes, sort=False)
+    temp_lag1 = grouped['temp'].shift(1).to_numpy()
+    temp_lag2 = grouped['temp'].shift(2).to_numpy()
+    temp = observations['temp'].to_numpy()
+
+    features = pd.DataFrame({
+        'district_encoded': encoded,
+        'month_sin': np.sin(2 * np.pi * month / 12),
+        'month_cos': np.cos(2 * np.pi * month / 12),
+        'day_sin': np.sin(2 * np.pi * day / 365),
+        'day_cos': np.cos(2 * np.pi * day / 365),
+        'humidity': observations['humidity'].to_numpy(),
+        'precip': observations['precip'].to_numpy(),
+        'temp_lag1': temp_lag1,
+        'humidity_lag1': grouped['humidity'].shift(1).to_numpy(),
+        'rainfall (mm)_lag1': grouped['rainfall (mm)'].shift(1).to_numpy(),
+        # Same as a per-district rolling(3).mean(): NaN until three days are in
+        'temp_roll3': (temp + temp_lag1 + temp_lag2) / 3
+    }, index=observations.index)
+    return features[feature_columns]
+
+def feature_windows(block, ends, window):
+    """Stack the `window` rows before each end of a (districts, days, features) block.
+
+    Returns shape (districts * len(ends), window, features), districts outermost.
+    """
+    ends = np.asarray(ends)
+    # windows[d, s] covers days s .. s + window - 1
+    windows = sliding_window_view(block, window, axis=1).transpose(0, 1, 3, 2)
+    return windows[:, ends - window].reshape(-1, window, block.shape[-1])
+
+class FeatureStore:
+    """Ring buffer of each district's most recent observations and feature rows.
+
+    Row i belongs to district_encoder class i; any extra districts follow.
+    Every district keeps its last `capacity` days in a preallocated
+    (districts, capacity, ...) array. seed() fills the buffers in one go;
+    appending the next day's observation computes that day's feature row
+    in O(1) from the two days before it.
+    """
+
+    def __init__(self, district_encoder, districts=(), capacity=64, feature_columns=FEATURE_COLUMNS):
+        if capacity < 3:
+            raise ValueError("capacity must cover the 3-day rolling window")
+        self.district_encoder = district_encoder
+        self.feature_columns = validate_feature_columns(feature_columns)
+        names = [str(d) for d in district_encoder.classes_]
+        names += [d for d in districts if d not in names]
+        self.districts = names
+        self.rows = {district: i for i, district in enumerate(names)}
+        self.capacity = capacity
+
+        self.observations = np.full((len(names), capacity, len(OBSERVATION_COLUMNS)), np.nan)
+        self.features = np.full((len(names), capacity, len(self.feature_columns)), np.nan)
+        self.head = np.full(len(names), -1, dtype=np.int64)  # slot of the latest day
+        self.count = np.zeros(len(names), dtype=np.int64)  # days appended so far
+        self.last_date = np.full(len(names), np.datetime64('NaT'), dtype='datetime64[D]')
+        # Districts the encoder does not know get a NaN code
+        self.codes = np.full(len(names), np.nan)
+        self.codes[:len(district_encoder.classes_)] = np.arange(len(district_encoder.classes_))
+
+    def seed(self, last_day, observations, features):
+        """Replace every district's buffer with the days up to `last_day`.
+
+        `observations` and `features` are (districts, days, ...) arrays with
+        rows in store order and at most `capacity` days.
+        """
+        days = observations.shape[1]
+        if observations.shape[0] != len(self.districts) or not 0 < days <= self.capacity:
+            raise ValueError(f"Seed must hold 1-{self.capacity} days for all {len(self.districts)} districts")
+        self.observations[:, :days] = observations
+        self.features[:, :days] = features
+        self.head[:] = days - 1
+        self.count[:] = days
+        self.last_date[:] = np.datetime64(pd.Timestamp(last_day).date(), 'D')
+
+    def append(self, district, date, values):
+        """Add the observation for the day after the district's latest one.
+
+        `values` follows OBSERVATION_COLUMNS.
+        """
+        row = self.rows[district]
+        day = np.datetime64(pd.Timestamp(date).date(), 'D')
+        if self.count[row] and day != self.last_date[row] + 1:
+            raise ValueError(f"{district}: expected the observation for "
+                             f"{self.last_date[row] + 1}, got {day}")
+
+        head = self.head[row]
+        slot = (head + 1) % self.capacity
+        temp, humidity, precip, rainfall, windspeed = np.asarray(values, dtype=np.float64)
+        prev = self.observations[row, head] if self.count[row] >= 1 else np.full(5, np.nan)
+        prev_temp2 = self.observations[row, head - 1, 0] if self.count[row] >= 2 else np.nan
+
+        stamp = pd.Timestamp(day)
+        month_angle = 2 * np.pi * stamp.month / 12
+        day_angle = 2 * np.pi * stamp.dayofyear / 365
+        row_values = {
+            'district_encoded': self.codes[row],
+            'month_sin': np.sin(month_angle),
+            'month_cos': np.cos(month_angle),
+            'day_sin': np.sin(day_angle),
+            'day_cos': np.cos(day_angle),
+            'humidity': humidity,
+            'precip': precip,
+            'temp_lag1': prev[0],
+            'humidity_lag1': prev[1],
+            'rainfall (mm)_lag1': prev[3],
+            'temp_roll3': (temp + prev[0] + prev_temp2) / 3
+        }
+
+        self.observations[row, slot] = (temp, humidity, precip, rainfall, windspeed)
+        self.features[row, slot] = [row_values[c] for c in self.feature_columns]
+        self.head[row] = slot
+        self.count[row] += 1
+        self.last_date[row] = day
+
+    def extend(self, district, dates, values):
+        """Append consecutive days of observations, shape (days, observations)"""
+        for date, row_values in zip(dates, values):
+            self.append(district, date, row_values)
+
+    def covers(self, districts, last_day, length):
+        """Whether `length` days ending at `last_day` are buffered for every district"""
+        rows = np.array([self.rows.get(d, -1) for d in districts])
+        if (rows < 0).any():
+            return False
+        day = np.datetime64(pd.Timestamp(last_day).date(), 'D')
+        behind = (self.last_date[rows] - day).astype(np.int64)
+        held = np.minimum(self.count[rows], self.capacity)
+        return bool(np.all((self.count[rows] > 0) & (behind >= 0) & (behind + length <= held)))
+
+    def windows(self, districts, last_day, length):
+        """Feature rows for the `length` days ending at `last_day`, shape (districts, length, features)"""
+        if not self.covers(districts, last_day, length):
+            raise ValueError(f"Store does not hold {length} days up to {last_day} for every district")
+        rows = np.array([self.rows[d] for d in districts])
+        day = np.datetime64(pd.Timestamp(last_day).date(), 'D')
+        behind = (self.last_date[rows] - day).astype(np.int64)
+        slots = (self.head[rows, None] - behind[:, None] - (length - 1) + np.arange(length)) % self.capacity
+        return self.features[rows[:, None], slots]
+
+    def save(self, path):
+        """Write the store to an .npz snapshot (a path or a binary file)"""
+        np.savez(path, observations=self.observations, features=self.features, head=self.head,
+                 count=self.count, last_date=self.last_date, districts=np.array(self.districts),
+                 feature_columns=np.array(self.feature_columns))
+
+    @classmethod
+    def load(cls, path, district_encoder):
+        """Restore a store written by save()"""
+        with np.load(path, allow_pickle=False) as snapshot:
+            districts = [str(d) for d in snapshot['districts']]
+            store = cls(district_encoder, districts=districts,
+                        capacity=snapshot['observations'].shape[1],
+                        feature_columns=[str(c) for c in snapshot['feature_columns']])
+            if store.districts != districts:
+                raise ValueError("Snapshot rows do not follow the district encoder")
+            for name in ('observations', 'features', 'head', 'count', 'last_date'):
+                getattr(store, name)[...] = snapshot[name]
+        return store
@@ -0,0 +1,299 @@
+# figures.py
+import json
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import plotly.graph_objects as go
+from plotly.colors import qualitative
+
+from forecast import model_version
+from telemetry import telemetry
+
+# Points kept per horizontal pixel of the chart
+POINTS_PER_PIXEL = 1
+
+# Plot area of a full-width chart (wide layout, sidebar and legend open on a
+# 1440px screen); the server can't see the real width
+DEFAULT_CHART_WIDTH = 1000
+
+def point_budget(width=DEFAULT_CHART_WIDTH, points_per_pixel=POINTS_PER_PIXEL):
+    """Points per trace worth sending for a chart `width` pixels wide"""
+    return max(int(width * points_per_pixel), 3)
+
+# Cells of the (previous pick, candidate) area table lttb() builds at once
+LTTB_TABLE_CELLS = 2**18
+
+def _numeric(x):
+    x = np.asarray(x)
+    return x.astype('datetime64[ns]').astype(np.int64).astype(np.float64) if x.dtype.kind == 'M' \
+        else x.astype(np.float64)
+
+def lttb(x, y, budget):
+    """Indexes of the points Largest-Triangle-Three-Buckets keeps.
+
+    The first and last points are always kept. Each bucket in between keeps
+    the point forming the largest triangle with the previous pick and the
+    next bucket's mean, which preserves peaks and the overall shape. `y`
+    may also be a (points, series) array of series sharing `x`; the
+    indexes then have a column per series.
+
+    >>> lttb(np.arange(8), np.array([0., 1, 0, 5, 0, 1, 0, 0]), 4).tolist()
+    [0, 3, 4, 7]
+    >>> lttb(np.arange(8), np.array([[0., 1, 0, 5, 0, 1, 0, 0], [0, 0, 2, 0, 0, 0, 3, 0]]).T, 4).T.tolist()
+    [[0, 3, 4, 7], [0, 2, 6, 7]]
+    """
+    n = len(y)
+    single = np.ndim(y) == 1
+    if budget >= n or budget < 3:
+        return np.arange(n) if single else np.tile(np.arange(n)[:, None], (1, np.shape(y)[1]))
+
+    xs, ys = _numeric(x), np.asarray(y, dtype=np.float64)
+    if single:
+        ys = ys[:, None]
+    series = ys.shape[1]
+    # Rescale x so the triangle terms below don't lose precision to epoch nanoseconds
+    xs = (xs - xs[0]) / ((xs[-1] - xs[0]) or 1.0)
+    # Bucket edges over the points between the first and the last
+    edges = np.linspace(1, n - 1, budget - 1).astype(np.int64)
+    # Sizes of the buckets, the last point counting as a final bucket of one
+    sizes = np.diff(np.append(edges, n))
+    # Mean of the bucket after each bucket
+    mean_x = np.add.reduceat(xs, edges[1:]) / sizes[1:]
+    mean_y = np.add.reduceat(ys, edges[1:], axis=0) / sizes[1:, None]
+
+    # Candidates of each bucket as a row; short rows repeat their last point,
+    # which argmax never prefers over its first occurrence
+    starts, ends = edges[:-1], edges[1:]
+    width = int((ends - starts).max())
+    rows = np.minimum(starts[:, None] + np.arange(width), (ends - 1)[:, None])
+    bx, by = xs[rows], ys[rows]
+    mx, my = mean_x[:, None], mean_y[:, None, :]
+    # Twice the triangle area with the previous pick (px, py) is
+    # |px * (y - my) + py * (mx - x) + (x * my - mx * y)|; only px, py depend on earlier picks
+    a, b, c = by - my, mx - bx, bx[:, :, None] * my - mx[:, :, None] * by
+
+    if rows.size * width * series <= LTTB_TABLE_CELLS:
+        # Areas for every point of the previous bucket as the pick, so the
+        # picks follow from the argmaxes one bucket at a time
+        px = np.vstack([np.full((1, width), xs[0]), bx[:-1]])[:, :, None, None]
+        py = np.concatenate([np.broadcast_to(ys[0], (1, width, series)), by[:-1]])[:, :, None, :]
+        areas = np.abs(px * a[:, None] + py * b[:, None, :, None] + c[:, None])
+        best = areas.argmax(axis=2).transpose(2, 0, 1).reshape(series, -1).tolist()
+        picks = []
+        for choices in best:
+            pick = 0
+            column = []
+            for row in range(0, len(choices), width):
+                pick = choices[row + pick]
+                column.append(pick)
+            picks.append(column)
+        keep = np.take_along_axis(rows, np.array(picks, dtype=np.int64).T, axis=1)
+    else:
+        # Wide buckets: one argmax per bucket, for all series at once
+        keep = np.empty((len(rows), series), dtype=np.int64)
+        columns = np.arange(series)
+        picked = np.zeros(series, dtype=np.int64)
+        for k in range(len(rows)):
+            areas = np.abs(xs[picked] * a[k] + b[k][:, None] * ys[picked, columns] + c[k])
+            keep[k] = picked = rows[k, areas.argmax(axis=0)]
+    keep = np.concatenate([np.zeros((1, series), dtype=np.int64), keep, np.full((1, series), n - 1)])
+    return keep[:, 0] if single else keep
+
+def minmax(x, y, budget):
+    """Indexes of each bucket's minimum and maximum, in order; about `budget` points"""
+    n = len(y)
+    buckets = budget // 2
+    if budget >= n or buckets < 1:
+        return np.arange(n)
+
+    ys = np.asarray(y, dtype=np.float64)
+    size = -(-n // buckets)
+    padded = np.full(buckets * size, np.nan)
+    padded[:n] = ys
+    padded = padded.reshape(buckets, size)
+    filled = ~np.isnan(padded).all(axis=1)
+    offsets = np.arange(buckets)[filled] * size
+    low = offsets + np.nanargmin(padded[filled], axis=1)
+    high = offsets + np.nanargmax(padded[filled], axis=1)
+    return np.unique(np.concatenate([low, high, [0, n - 1]]))
+
+DOWNSAMPLERS = {'LTTB': lttb, 'Min-max': minmax}
+
+# Series are downsampled only when that at least halves them; closer to
+# the budget the downsampler costs more than the points it saves
+MIN_REDUCTION = 2
+
+def downsample(x, y, budget, method='LTTB'):
+    """Return (x, y) reduced to about `budget` points by `method` ('LTTB' or 'Min-max').
+
+    NaN points are dropped before downsampling; with method None, or when
+    downsampling wouldn't at least halve the series (MIN_REDUCTION), the
+    series is returned whole, gaps included.
+    """
+    x, y = np.asarray(x), np.asarray(y, dtype=np.float64)
+    if method is None or len(y) < MIN_REDUCTION * budget:
+        return x, y
+    seen = ~np.isnan(y)
+    x, y = x[seen], y[seen]
+    keep = DOWNSAMPLERS[method](x, y, budget)
+    return x[keep], y[keep]
+
+def downsample_frame(frame, budget, method='LTTB'):
+    """Yield (column, x, y) for each column of `frame`, downsampled as downsample() does.
+
+    LTTB runs once over all the columns without gaps, which costs little
+    more than running it over one.
+    """
+    x = frame.index.to_numpy()
+    values = frame.to_numpy(dtype=np.float64)
+    whole = np.zeros(values.shape[1], dtype=bool)
+    if method == 'LTTB' and len(frame) >= MIN_REDUCTION * budget:
+        whole = ~np.isnan(values).any(axis=0)
+        keep = iter(lttb(x, values[:, whole], budget).T) if whole.any() else None
+    for i, column in enumerate(frame.columns):
+        if whole[i]:
+            rows = next(keep)
+            yield column, x[rows], values[rows, i]
+        else:
+            yield (column, *downsample(x, values[:, i], budget, method))
+
+def trend_figure(frame, title, y_title, hover_label, unit, budget=None, method='LTTB', webgl=False):
+    """Line chart with one trace per column of `frame` (DatetimeIndex rows).
+
+    Each trace is downsampled to `budget` points with `method` ('LTTB',
+    'Min-max' or None for every point). `webgl` draws Scattergl traces,
+    which the browser renders on the GPU instead of as SVG paths.
+    """
+    traces = list(trend_traces(frame, hover_label, unit, budget, method, webgl))
+    return trend_layout(go.Figure(data=traces), title, y_title)
+
+def trend_traces(frame, hover_label, unit, budget=None, method='LTTB', webgl=False):
+    """trend_figure's traces, one per column, built as they are iterated"""
+    trace = go.Scattergl if webgl else go.Scatter
+    colors = qualitative.Set3
+    series = downsample_frame(frame, budget or len(frame), method if budget else None)
+    for i, (column, xs, ys) in enumerate(series):
+        yield trace(
+            # Epoch milliseconds pack as binary on a date axis, unlike timestamp strings
+            x=xs.astype('datetime64[ms]').astype(np.int64).astype(np.float64),
+            # float32 is exact enough for display and halves the packed y arrays
+            y=ys.astype(np.float32),
+            name=column,
+            line=dict(color=colors[i % len(colors)]),
+            mode='lines',
+            hovertemplate=f'<b>{column}</b><br>Date: %{{x}}<br>{hover_label}: %{{y:.1f}} {unit}<extra></extra>'
+        )
+
+def trend_layout(fig, title, y_title):
+    """Apply trend_figure's layout to `fig`; returns it"""
+    fig.update_layout(
+        title=title,
+        xaxis_title="Date",
+        xaxis_type="date",
+        yaxis_title=y_title,
+        hovermode="x unified",
+        height=600,
+        legend=dict(
+            orientation="v",
+            yanchor="top",
+            y=1,
+            xanchor="left",
+            x=1.02
+        )
+    )
+    return fig
+
+class FigureCache:
+    """Bounded, thread-safe LRU cache of figures stored as Plotly JSON.
+
+    Entries are evicted least recently used first once their JSON adds up
+    to more than `maxbytes`. A hit rebuilds the figure without validation,
+    which is most of what building it from scratch costs.
+    """
+
+    def __init__(self, maxbytes=32 * 2**20):
+        self.maxbytes = maxbytes
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return a fresh Figure for `key`, or None on a miss"""
+        with self._lock:
+            spec = self._entries.get(key)
+            if spec is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        # The JSON came from a validated figure
+        return go.Figure(json.loads(spec), _validate=False)
+
+    def put(self, key, fig):
+        """Store `fig`; figures larger than the whole cache are not kept"""
+        spec = fig.to_json()
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= len(old)
+            if len(spec) > self.maxbytes:
+                return
+            self._entries[key] = spec
+            self.nbytes += len(spec)
+            while self.nbytes > self.maxbytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.nbytes -= len(evicted)
+
+    def discard_version(self, version):
+        """Drop the figures of model `version`; returns how many"""
+        with self._lock:
+            stale = [key for key in self._entries if key[-1] == version]
+            for key in stale:
+                self.nbytes -= len(self._entries.pop(key))
+            return len(stale)
+
+    def clear(self):
+        """Drop every entry and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'size': len(self._entries),
+                'bytes': self.nbytes,
+                'maxbytes': self.maxbytes
+            }
+
+# Shared by every session of the process
+figure_cache = FigureCache()
+telemetry.gauge('figure_cache_bytes', lambda: figure_cache.nbytes)
+
+def cached_figure(build, *args, key=None):
+    """build(*args) through figure_cache.
+
+    The cache key is the builder, `key` (default: `args`) and the model
+    version, so figures of forecasts are rebuilt when the model changes.
+    Every call returns a figure of its own.
+    """
+    full_key = (build.__module__, build.__qualname__, args if key is None else key, model_version())
+    fig = figure_cache.get(full_key)
+    if fig is None:
+        telemetry.count('figure_cache_misses')
+        with telemetry.span(build.__name__):
+            fig = build(*args)
+        figure_cache.put(full_key, fig)
+    else:
+        telemetry.count('figure_cache_hits')
+    return fig
@@ -0,0 +1,544 @@
+# forecast.py
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+from districts import sri_lanka_districts
+from telemetry import telemetry, timed
+
+# District-specific base values (realistic for Sri Lankan geography)
+district_profiles = {
+    'Nuwara Eliya': {'base_temp': 20, 'temp_var': 3, 'rain_factor': 1.5, 'wind_base': 12},
+    'Kandy': {'base_temp': 24, 'temp_var': 2, 'rain_factor': 1.3, 'wind_base': 10},
+    'Colombo': {'base_temp': 28, 'temp_var': 2, 'rain_factor': 1.2, 'wind_base': 15},
+    'Galle': {'base_temp': 27, 'temp_var': 2, 'rain_factor': 1.4, 'wind_base': 18},
+    'Jaffna': {'base_temp': 30, 'temp_var': 3, 'rain_factor': 0.8, 'wind_base': 20},
+    'Trincomalee': {'base_temp': 29, 'temp_var': 2, 'rain_factor': 1.0, 'wind_base': 22},
+    'Ampara': {'base_temp': 31, 'temp_var': 3, 'rain_factor': 0.9, 'wind_base': 16},
+    'Hambantota': {'base_temp': 32, 'temp_var': 3, 'rain_factor': 0.7, 'wind_base': 25},
+    'Anuradhapura': {'base_temp': 30, 'temp_var': 3, 'rain_factor': 0.8, 'wind_base': 14},
+    'Badulla': {'base_temp': 22, 'temp_var': 2, 'rain_factor': 1.2, 'wind_base': 12},
+    'Batticaloa': {'base_temp': 29, 'temp_var': 2, 'rain_factor': 1.1, 'wind_base': 19},
+    'Gampaha': {'base_temp': 27, 'temp_var': 2, 'rain_factor': 1.3, 'wind_base': 13},
+    'Kalutara': {'base_temp': 28, 'temp_var': 2, 'rain_factor': 1.4, 'wind_base': 16},
+    'Kegalle': {'base_temp': 25, 'temp_var': 2, 'rain_factor': 1.3, 'wind_base': 11},
+    'Kurunegala': {'base_temp': 28, 'temp_var': 3, 'rain_factor': 1.0, 'wind_base': 13},
+    'Matale': {'base_temp': 26, 'temp_var': 2, 'rain_factor': 1.2, 'wind_base': 12},
+    'Matara': {'base_temp': 27, 'temp_var': 2, 'rain_factor': 1.5, 'wind_base': 17},
+    'Moneragala': {'base_temp': 26, 'temp_var': 3, 'rain_factor': 1.0, 'wind_base': 14},
+    'Polonnaruwa': {'base_temp': 29, 'temp_var': 3, 'rain_factor': 0.9, 'wind_base': 15},
+    'Puttalam': {'base_temp': 29, 'temp_var': 3, 'rain_factor': 0.8, 'wind_base': 21},
+    'Ratnapura': {'base_temp': 26, 'temp_var': 2, 'rain_factor': 1.6, 'wind_base': 10},
+    'Vavuniya': {'base_temp': 30, 'temp_var': 3, 'rain_factor': 0.8, 'wind_base': 16},
+    'Kilinochchi': {'base_temp': 30, 'temp_var': 3, 'rain_factor': 0.9, 'wind_base': 18},
+    'Mannar': {'base_temp': 29, 'temp_var': 3, 'rain_factor': 0.7, 'wind_base': 23},
+    'Mullaitivu': {'base_temp': 29, 'temp_var': 3, 'rain_factor': 0.8, 'wind_base': 20}
+}
+
+DEFAULT_PROFILE = {'base_temp': 27, 'temp_var': 2, 'rain_factor': 1.0, 'wind_base': 15}
+
+# Version of the mock generator; part of every cache key in mock mode
+MOCK_VERSION = 'mock-1'
+
+# Trained model engine; None runs the mock generator for every district
+_model_engine = None
+
+# Called with the new engine after every use_model_engine()
+_engine_listeners = []
+
+# Counter slots of the keyed random stream. Every random term owns a slot,
+# so a draw never depends on which other terms were drawn before it.
+NOISE_SLOTS = ('temp', 'rain', 'wind', 'temp_unc', 'rain_unc', 'wind_unc', 'confidence')
+
+_GOLDEN_GAMMA = 0x9E3779B97F4A7C15
+
+# Month lookups, indexed by month number
+_SW_MONSOON = np.isin(np.arange(13), [5, 6, 7, 8, 9])
+_NE_MONSOON = np.isin(np.arange(13), [10, 11, 12, 1, 2])
+_WINDY_MONTHS = np.isin(np.arange(13), [5, 6, 7, 8, 9, 10, 11, 12])
+
+def forecast_key(district, date):
+    """Stable 64-bit stream key for a district/date pair.
+    
+    Unlike hash(), the digest is the same in every process and worker.
+    
+    >>> forecast_key('Colombo', '2024-06-01')
+    3063694600844739721
+    """
+    digest = hashlib.blake2b(f"{district}_{date}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+def _mix64(x):
+    """SplitMix64 finalizer over a uint64 array"""
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+def keyed_uniform(keys, counters):
+    """Uniform draws in (0, 1) at stream positions `counters` of every key.
+    
+    The result has shape keys.shape + counters.shape.
+    """
+    keys = np.asarray(keys, dtype=np.uint64)
+    counters = np.asarray(counters, dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        state = keys.reshape(keys.shape + (1,) * counters.ndim) + (counters + np.uint64(1)) * np.uint64(_GOLDEN_GAMMA)
+        bits = _mix64(state)
+    return ((bits >> np.uint64(11)).astype(np.float64) + 0.5) / 2.0**53
+
+def keyed_normal(keys, slots):
+    """Standard normal draws for noise slots (Box-Muller over two positions)"""
+    slots = np.asarray(slots, dtype=np.uint64)
+    u = keyed_uniform(keys, np.stack([2 * slots, 2 * slots + 1], axis=-1))
+    return np.sqrt(-2.0 * np.log(u[..., 0])) * np.cos(2 * np.pi * u[..., 1])
+
+def keyed_exponential(keys, slots):
+    """Standard exponential draws for noise slots"""
+    return -np.log(keyed_uniform(keys, 2 * np.asarray(slots, dtype=np.uint64)))
+
+def _draw_noise(districts, date_strs):
+    """Draw every random term of the grid from the keyed stream"""
+    keys = np.array([[forecast_key(d, t) for t in date_strs] for d in districts],
+                    dtype=np.uint64).reshape(len(districts), len(date_strs))
+    normal = keyed_normal(keys, np.arange(len(NOISE_SLOTS)))
+    noise = {name: normal[..., slot] for slot, name in enumerate(NOISE_SLOTS)}
+    noise['rain'] = keyed_exponential(keys, NOISE_SLOTS.index('rain'))
+    return noise
+
+def use_model_engine(engine):
+    """Route the districts `engine` supports through it (None restores mock mode)"""
+    global _model_engine
+    _model_engine = engine
+    for listener in list(_engine_listeners):
+        listener(engine)
+
+def on_engine_change(listener):
+    """Call listener(engine) whenever use_model_engine() installs an engine"""
+    if listener not in _engine_listeners:
+        _engine_listeners.append(listener)
+
+def install_model_engine(warm_up=False):
+    """Install the trained model engine unless WEATHER_FORECAST_MODE=mock.
+    
+    Returns the engine, or None in mock mode. Raises OSError when the
+    model files are missing.
+    """
+    if os.environ.get("WEATHER_FORECAST_MODE", "model") == "mock":
+        return None
+    from inference import LazyModelEngine  # mock-only processes never import it
+    from registry import active_model
+    directory, version = active_model()
+    engine = LazyModelEngine(directory, version=version)
+    if warm_up:
+        engine.warm_up()
+    use_model_engine(engine)
+    return engine
+
+def current_model_engine():
+    """The installed engine, or None in mock mode"""
+    return _model_engine
+
+def _engine_version(engine):
+    if engine is None or not getattr(engine, 'available', True):
+        return MOCK_VERSION
+    return engine.version
+
+def model_version():
+    """Version of the engine currently producing forecasts"""
+    return _engine_version(_model_engine)
+
+def _profile_arrays(districts):
+    """Stack the district profiles into one array per profile field"""
+    profiles = [district_profiles.get(d, DEFAULT_PROFILE) for d in districts]
+    return {key: np.array([p[key] for p in profiles]) for key in DEFAULT_PROFILE}
+
+def _forecast_grid(districts, date_objs, now, engine):
+    """Compute the forecast arrays, shape (n_districts, n_dates), for a grid with `engine`"""
+    telemetry.count('forecast_cells_computed', len(districts) * len(date_objs))
+    date_strs = [d.strftime("%Y-%m-%d") for d in date_objs]
+    
+    # Per-date terms, shape (n_dates,)
+    month = np.array([d.month for d in date_objs], dtype=int)
+    day_of_year = np.array([d.timetuple().tm_yday for d in date_objs], dtype=int)
+    days_ahead = np.array([(d - now).days for d in date_objs], dtype=int)
+    uncertainty_factor = np.minimum(days_ahead / 30, 1.0)  # Max uncertainty at 30 days
+    future = days_ahead > 0
+    
+    # Per-district terms, shape (n_districts, 1)
+    profile = {key: values[:, None] for key, values in _profile_arrays(districts).items()}
+    noise = _draw_noise(districts, date_strs)
+    
+    # Temperature variations, peak in April, low in October
+    seasonal_temp_adj = 2 * np.sin((day_of_year - 80) * 2 * np.pi / 365)
+    base_temp = profile['base_temp'] + seasonal_temp_adj + profile['temp_var'] * noise['temp']
+    
+    # Monsoon patterns for rainfall (southwest, northeast, inter-monsoon)
+    rain_base = np.select(
+        [_SW_MONSOON[month], _NE_MONSOON[month]],
+        [25 + 15 * noise['rain'], 15 + 10 * noise['rain']],
+        5 + 8 * noise['rain']
+    )
+    base_rain = rain_base * profile['rain_factor']
+    
+    # Wind speed variations (higher during monsoons)
+    wind_seasonal = np.where(_WINDY_MONTHS[month], 1.3, 1.0)
+    base_wind = profile['wind_base'] * wind_seasonal + 3 * noise['wind']
+    
+    # Add some randomness for future dates (less predictable further out)
+    base_temp = base_temp + np.where(future, uncertainty_factor * 2 * noise['temp_unc'], 0.0)
+    base_rain = base_rain + np.where(future, uncertainty_factor * 5 * noise['rain_unc'], 0.0)
+    base_wind = base_wind + np.where(future, uncertainty_factor * 3 * noise['wind_unc'], 0.0)
+    confidence_reduction = np.where(future, uncertainty_factor * 20, 0.0)
+    
+    # Districts the trained model knows use its forecast instead
+    rows = [i for i, d in enumerate(districts) if engine is not None and engine.supports(d)]
+    if rows and date_objs:
+        with telemetry.span('model_predict'):
+            outputs = engine.predict([districts[i] for i in rows], date_objs)
+        base_temp[rows] = outputs[..., 0]
+        base_rain[rows] = outputs[..., 1]
+        base_wind[rows] = outputs[..., 2]
+    
+    # Ensure realistic ranges
+    base_temp = np.clip(base_temp, 15, 40)
+    base_rain = np.maximum(base_rain, 0)
+    base_wind = np.clip(base_wind, 5, 60)
+    confidence = np.clip(90 - confidence_reduction + 5 * noise['confidence'], 50, 100)
+    
+    return {
+        'date': date_strs,
+        'temperature': np.round(base_temp, 1),
+        'rainfall': np.round(base_rain, 1),
+        'windspeed': np.round(base_wind, 1),
+        'confidence': np.round(confidence).astype(int)
+    }
+
+class ForecastCache:
+    """Bounded, thread-safe LRU cache of forecast dicts.
+    
+    Entries expire `ttl` seconds after their forecast_time, and at midnight,
+    since the forecast horizon of every date shifts by a day. `clock`
+    returns the current datetime.
+    """
+    
+    def __init__(self, maxsize=4096, ttl=3600, clock=datetime.now):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def _lookup(self, key, now):
+        entry = self._entries.get(key)
+        if entry is not None:
+            made, prediction = entry
+            if made.date() == now.date() and (now - made).total_seconds() <= self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return dict(prediction)
+            del self._entries[key]
+        self.misses += 1
+        return None
+    
+    def _store(self, key, prediction, made):
+        self._entries[key] = (made, dict(prediction))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+    
+    def get(self, key):
+        """Return a copy of the cached forecast, or None on a miss"""
+        with self._lock:
+            return self._lookup(key, self.clock())
+    
+    def get_many(self, keys):
+        """Look up several keys under one lock; misses come back as None"""
+        now = self.clock()
+        with self._lock:
+            return [self._lookup(key, now) for key in keys]
+    
+    def put(self, key, prediction, made):
+        """Store a forecast computed at `made`"""
+        with self._lock:
+            self._store(key, prediction, made)
+    
+    def put_many(self, keys, predictions, made):
+        """Store several forecasts computed at `made`"""
+        with self._lock:
+            for key, prediction in zip(keys, predictions):
+                self._store(key, prediction, made)
+    
+    def discard_version(self, version):
+        """Drop the entries of model `version`; returns how many"""
+        with self._lock:
+            stale = [key for key in self._entries if key[-1] == version]
+            for key in stale:
+                del self._entries[key]
+            return len(stale)
+    
+    def clear(self):
+        """Drop every entry and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+    
+    def stats(self):
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'size': len(self._entries),
+                'maxsize': self.maxsize
+            }
+
+# Shared by every session of the process
+forecast_cache = ForecastCache()
+telemetry.gauge('forecast_cache_entries', lambda: len(forecast_cache._entries))
+
+@timed
+def predict_weather(district, date):
+    """Enhanced prediction function with realistic variations.
+    
+    Mock draws come from a stream keyed on the district and date, so the
+    result is identical across processes, threads and restarts:
+    
+    >>> p = predict_weather('Colombo', '2024-06-01')
+    >>> p['temperature'], p['rainfall'], p['windspeed'], p['confidence']
+    (30.5, 31.9, 19.8, 85)
+    """
+    telemetry.count('forecasts')
+    # One engine per call: a reload meanwhile doesn't mix models or mislabel the entry
+    engine = _model_engine
+    key = (district, date, _engine_version(engine))
+    cached = forecast_cache.get(key)
+    if cached is not None:
+        telemetry.count('forecast_cache_hits')
+        return cached
+    telemetry.count('forecast_cache_misses')
+    
+    now = datetime.now()
+    grid = _forecast_grid([district], [datetime.strptime(date, "%Y-%m-%d")], now, engine)
+    
+    prediction = {
+        'district': district,
+        'date': date,
+        'temperature': float(grid['temperature'][0, 0]),
+        'rainfall': float(grid['rainfall'][0, 0]),
+        'windspeed': float(grid['windspeed'][0, 0]),
+        'confidence': int(grid['confidence'][0, 0]),
+        'forecast_time': now.strftime("%Y-%m-%d %H:%M:%S")
+    }
+    # Unless a reload replaced the engine meanwhile and dropped its version
+    if engine is _model_engine:
+        forecast_cache.put(key, prediction, now)
+    
+    return dict(prediction)
+
+@timed
+def predict_weather_batch(districts, dates, cache=True, refresh=False):
+    """Predict the full district x date grid in one vectorized pass.
+    
+    Returns a DataFrame with one row per (district, date) pair, districts
+    outermost, holding the same columns and values as predict_weather.
+    cache=False bypasses forecast_cache, for bulk work that would only
+    evict the interactive entries. refresh=True recomputes the grid even
+    when it is cached and stores it, restarting the entries' expiry.
+    """
+    return _predict_batch(districts, dates, cache, refresh, _model_engine)
+
+def _predict_batch(districts, dates, cache, refresh, engine):
+    districts = list(districts)
+    date_objs = list(pd.DatetimeIndex(pd.to_datetime(list(dates))).normalize().to_pydatetime())
+    
+    # Serve repeat grids straight from the cache
+    version = _engine_version(engine)
+    keys = [(d, t.strftime("%Y-%m-%d"), version) for d in districts for t in date_objs]
+    telemetry.count('forecasts', len(keys))
+    if cache and not refresh:
+        cached = forecast_cache.get_many(keys)
+        if keys and all(prediction is not None for prediction in cached):
+            telemetry.count('forecast_cache_hits', len(keys))
+            return pd.DataFrame(cached)
+        telemetry.count('forecast_cache_misses', len(keys))
+    
+    now = datetime.now()
+    grid = _forecast_grid(districts, date_objs, now, engine)
+    
+    df = pd.DataFrame({
+        'district': np.repeat(districts, len(date_objs)),
+        'date': np.tile(grid['date'], len(districts)),
+        'temperature': grid['temperature'].ravel(),
+        'rainfall': grid['rainfall'].ravel(),
+        'windspeed': grid['windspeed'].ravel(),
+        'confidence': grid['confidence'].ravel(),
+        'forecast_time': now.strftime("%Y-%m-%d %H:%M:%S")
+    })
+    if cache and engine is _model_engine:
+        forecast_cache.put_many(keys, df.to_dict('records'), now)
+    
+    return df
+
+class IslandSnapshot:
+    """Every district's forecast for one date, held as read-only columns.
+    
+    Pages slice a shared snapshot instead of recomputing the island.
+    """
+    
+    columns = ('temperature', 'rainfall', 'windspeed', 'confidence', 'lat', 'lon')
+    
+    def __init__(self, date, frame, made):
+        self.date = date
+        self.made = made
+        self.districts = frame['district'].tolist()
+        self.forecast_time = frame['forecast_time'].to_numpy()
+        self.temperature = frame['temperature'].to_numpy()
+        self.rainfall = frame['rainfall'].to_numpy()
+        self.windspeed = frame['windspeed'].to_numpy()
+        self.confidence = frame['confidence'].to_numpy()
+        self.lat = np.array([sri_lanka_districts[d]['lat'] for d in self.districts])
+        self.lon = np.array([sri_lanka_districts[d]['lon'] for d in self.districts])
+        for name in self.columns:
+            getattr(self, name).setflags(write=False)
+        self._rows = {district: i for i, district in enumerate(self.districts)}
+    
+    def frame(self, districts=None):
+        """New DataFrame of the snapshot, optionally just `districts` in that order"""
+        rows = slice(None) if districts is None else [self._rows[d] for d in districts]
+        return pd.DataFrame({
+            'district': np.array(self.districts)[rows],
+            'date': self.date,
+            'temperature': self.temperature[rows],
+            'rainfall': self.rainfall[rows],
+            'windspeed': self.windspeed[rows],
+            'confidence': self.confidence[rows],
+            'forecast_time': self.forecast_time[rows],
+            'lat': self.lat[rows],
+            'lon': self.lon[rows]
+        })
+    
+    def prediction(self, district):
+        """Forecast dict for one district, as predict_weather returns it"""
+        i = self._rows[district]
+        return {
+            'district': district,
+            'date': self.date,
+            'temperature': float(self.temperature[i]),
+            'rainfall': float(self.rainfall[i]),
+            'windspeed': float(self.windspeed[i]),
+            'confidence': int(self.confidence[i]),
+            'forecast_time': str(self.forecast_time[i])
+        }
+
+# Island snapshots by (date, model version), shared by every session
+_snapshots = OrderedDict()
+_snapshot_lock = threading.Lock()
+SNAPSHOT_LIMIT = 32
+
+# One lock per snapshot being computed, held for the computation
+_computing = {}
+
+def _cached_snapshot(key):
+    """The snapshot stored under `key` while it is still valid, else None"""
+    with _snapshot_lock:
+        now = datetime.now()
+        snapshot = _snapshots.get(key)
+        if snapshot is None:
+            return None
+        if snapshot.made.date() == now.date() and \
+                (now - snapshot.made).total_seconds() <= forecast_cache.ttl:
+            _snapshots.move_to_end(key)
+            telemetry.count('snapshot_hits')
+            return snapshot
+        del _snapshots[key]
+        return None
+
+@timed
+def island_snapshot(date):
+    """Shared snapshot of every district's forecast for `date`.
+    
+    Snapshots expire like forecast_cache entries. Each (date, version) is
+    computed under its own lock, so a process computes it at most once
+    while other dates are computed alongside it.
+    """
+    date = pd.Timestamp(date).strftime("%Y-%m-%d")
+    engine = _model_engine
+    key = (date, _engine_version(engine))
+    snapshot = _cached_snapshot(key)
+    if snapshot is not None:
+        return snapshot
+
+    with _snapshot_lock:
+        computing = _computing.setdefault(key, threading.Lock())
+    with computing:
+        # Computed by another thread while this one waited
+        snapshot = _cached_snapshot(key)
+        if snapshot is not None:
+            return snapshot
+        try:
+            telemetry.count('snapshot_misses')
+            now = datetime.now()
+            df = _predict_batch(sri_lanka_districts.keys(), [date], True, False, engine)
+            snapshot = IslandSnapshot(date, df, now)
+            with _snapshot_lock:
+                # Not stored once a reload has replaced the engine
+                if engine is _model_engine:
+                    _snapshots[key] = snapshot
+                    while len(_snapshots) > SNAPSHOT_LIMIT:
+                        _snapshots.popitem(last=False)
+        finally:
+            with _snapshot_lock:
+                if _computing.get(key) is computing:
+                    del _computing[key]
+        return snapshot
+
+@timed
+def precompute_forecasts(dates):
+    """Recompute every district's forecasts for `dates` ahead of the pages.
+    
+    Stores them in forecast_cache and as island snapshots, replacing any
+    still valid so both expire no earlier than a fresh computation would.
+    Returns the number of forecasts computed.
+    """
+    engine = _model_engine
+    version = _engine_version(engine)
+    made = datetime.now()
+    df = _predict_batch(sri_lanka_districts.keys(), dates, True, True, engine)
+    date_strs = df['date'].iloc[:len(df) // len(sri_lanka_districts)].tolist()
+    # Rows of one date are every len(dates)-th, districts outermost
+    snapshots = [IslandSnapshot(date, df.iloc[i::len(date_strs)], made) for i, date in enumerate(date_strs)]
+    with _snapshot_lock:
+        if engine is not _model_engine:
+            snapshots = []  # replaced by a reload meanwhile
+        for snapshot in snapshots:
+            _snapshots[(snapshot.date, version)] = snapshot
+            _snapshots.move_to_end((snapshot.date, version))
+        while len(_snapshots) > SNAPSHOT_LIMIT:
+            _snapshots.popitem(last=False)
+    telemetry.count('forecasts_precomputed', len(df))
+    return len(df)
+
+def forget_model_version(version):
+    """Drop the forecasts and snapshots of model `version`, e.g. once it is replaced.
+    
+    Returns the number of entries dropped.
+    """
+    with _snapshot_lock:
+        stale = [key for key in _snapshots if key[1] == version]
+        for key in stale:
+            del _snapshots[key]
+    return len(stale) + forecast_cache.discard_version(version)
+
+def clear_snapshots():
+    """Drop every cached IslandSnapshot"""
+    with _snapshot_lock:
+        _snapshots.clear()
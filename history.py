@@ -0,0 +1,322 @@
+# history.py
+import json
+import logging
+import os
+import pickle
+import shutil
+import threading
+import numpy as np
+import pandas as pd
+
+from inference import APP_DIR, PREDICTOR_FILE, _file_digest, load_predictor
+
+logger = logging.getLogger(__name__)
+
+# Store variable -> column of the observations in predictor.pkl
+VARIABLES = {
+    'temperature': 'temp',
+    'rainfall': 'rainfall (mm)',
+    'windspeed': 'windspeed',
+    'humidity': 'humidity',
+    'precip': 'precip'
+}
+
+# Calendar months of each season, as the history pages group them
+SEASONS = {
+    'Spring': [3, 4, 5],
+    'Summer': [6, 7, 8],
+    'Autumn': [9, 10, 11],
+    'Winter': [12, 1, 2]
+}
+
+# Histogram range and bin width per variable; percentiles resolve to one bin
+ROLLUP_BINS = {
+    'temperature': (0.0, 50.0, 0.1),
+    'rainfall': (0.0, 500.0, 0.1),
+    'windspeed': (0.0, 150.0, 0.1),
+    'humidity': (0.0, 100.0, 0.1),
+    'precip': (0.0, 200.0, 0.1)
+}
+
+# Average length of each calendar month, for monthly totals
+_MONTH_DAYS = np.array([31, 28.25, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+class RollupCube:
+    """District x period aggregates of daily observations, updated as days arrive.
+
+    `period_of_month` maps calendar months 1-12 to period indexes. For each
+    variable the cube keeps counts, sums, maxima and a fixed-bin histogram,
+    so every query is answered from (districts, periods) arrays without
+    touching the daily series.
+    """
+
+    def __init__(self, districts, period_of_month, periods, bins=ROLLUP_BINS):
+        self.districts = list(districts)
+        self.rows = {district: i for i, district in enumerate(self.districts)}
+        self.periods = list(periods)
+        self.period_of_month = np.asarray(period_of_month)
+        self.bins = dict(bins)
+        shape = (len(self.districts), len(self.periods))
+        self.count = {v: np.zeros(shape, dtype=np.int64) for v in self.bins}
+        self.total = {v: np.zeros(shape) for v in self.bins}
+        self.maximum = {v: np.full(shape, -np.inf) for v in self.bins}
+        self.histogram = {
+            v: np.zeros(shape + (int(round((high - low) / width)),), dtype=np.int32)
+            for v, (low, high, width) in self.bins.items()
+        }
+        # Days per period, weighted by month length, for period totals
+        self._period_days = np.bincount(self.period_of_month[1:], weights=_MONTH_DAYS,
+                                        minlength=len(self.periods))
+        self._period_months = np.bincount(self.period_of_month[1:], minlength=len(self.periods))
+
+    def add_days(self, district_rows, months, values):
+        """Fold in a batch of days.
+
+        `district_rows` and `months` (1-12) are per-day arrays; `values`
+        maps variables to per-day arrays. NaN values are skipped.
+        """
+        district_rows = np.asarray(district_rows)
+        periods = self.period_of_month[np.asarray(months)]
+        for variable, data in values.items():
+            data = np.asarray(data, dtype=np.float64)
+            seen = ~np.isnan(data)
+            rows, cols, data = district_rows[seen], periods[seen], data[seen]
+            low, high, width = self.bins[variable]
+            slots = np.clip(((data - low) / width).astype(np.int64), 0, self.histogram[variable].shape[-1] - 1)
+            np.add.at(self.count[variable], (rows, cols), 1)
+            np.add.at(self.total[variable], (rows, cols), data)
+            np.maximum.at(self.maximum[variable], (rows, cols), data)
+            np.add.at(self.histogram[variable], (rows, cols, slots), 1)
+
+    def mean(self, variable):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.total[variable] / self.count[variable]
+
+    def max(self, variable):
+        return np.where(self.count[variable] > 0, self.maximum[variable], np.nan)
+
+    def sum(self, variable):
+        return np.where(self.count[variable] > 0, self.total[variable], np.nan)
+
+    def period_total(self, variable):
+        """Average total per calendar month in each period, e.g. mean monthly rainfall"""
+        return self.mean(variable) * self._period_days / self._period_months
+
+    def percentile(self, variable, q):
+        """Nearest-rank q-th percentile (0-100), as the centre of the bin holding it"""
+        low, high, width = self.bins[variable]
+        cumulative = np.cumsum(self.histogram[variable], axis=-1)
+        target = np.ceil(self.count[variable] * q / 100.0).clip(min=1)[..., None]
+        slots = (cumulative < target).sum(axis=-1)
+        return np.where(self.count[variable] > 0, low + (slots + 0.5) * width, np.nan)
+
+    def count_above(self, variable, threshold):
+        """Days with a value above `threshold`, to one bin's precision"""
+        low, high, width = self.bins[variable]
+        first = int(np.clip(np.floor((threshold - low) / width) + 1, 0, self.histogram[variable].shape[-1]))
+        return self.histogram[variable][..., first:].sum(axis=-1)
+
+def monthly_cube(districts):
+    """RollupCube over calendar months, periods 'Jan' .. 'Dec'"""
+    months = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+    return RollupCube(districts, np.arange(-1, 12), months)
+
+def seasonal_cube(districts):
+    """RollupCube over SEASONS"""
+    period_of_month = np.zeros(13, dtype=np.int64)
+    for i, months in enumerate(SEASONS.values()):
+        period_of_month[months] = i
+    return RollupCube(districts, period_of_month, SEASONS)
+
+def _calendar_months(dates):
+    """Calendar month (1-12) of each datetime64 day"""
+    return dates.astype('datetime64[M]').astype(np.int64) % 12 + 1
+
+def _replace_array(path, array):
+    # Readers map the old file or the new one, never part of either
+    partial = f'{path}.{os.getpid()}.tmp'
+    with open(partial, 'wb') as f:
+        np.save(f, array)
+    os.replace(partial, path)
+
+class HistoryStore:
+    """Daily observations per district as memory-mapped columns.
+
+    Each variable is one (districts, days) float64 .npy file with NaN for
+    days without an observation. Rows follow district_encoder.pkl's classes
+    (districts.json) and columns follow dates.npy, one entry per day.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, 'districts.json')) as f:
+            self.districts = json.load(f)
+        self.dates = np.load(os.path.join(directory, 'dates.npy'))
+        self.rows = {district: i for i, district in enumerate(self.districts)}
+        self._columns = {}
+        self._rollups = None
+        self._lock = threading.Lock()
+
+    def column(self, variable):
+        """The (districts, days) array of a variable, memory-mapped read-only"""
+        if variable not in VARIABLES:
+            raise KeyError(f"Unknown variable {variable!r}; use one of {', '.join(VARIABLES)}")
+        array = self._columns.get(variable)
+        if array is None:
+            array = np.load(os.path.join(self.directory, f'{variable}.npy'), mmap_mode='r')
+            # Another process may have appended days dates.npy doesn't list yet
+            array = array[:, :len(self.dates)]
+            self._columns[variable] = array
+        return array
+
+    @property
+    def years(self):
+        """Calendar years the store covers"""
+        return list(range(self.dates[0].astype(object).year, self.dates[-1].astype(object).year + 1))
+
+    def rollups(self):
+        """Monthly and seasonal RollupCubes of the whole store, built on first use"""
+        with self._lock:
+            if self._rollups is None:
+                rollups = {'monthly': monthly_cube(self.districts), 'seasonal': seasonal_cube(self.districts)}
+                self._fold(rollups, {v: self.column(v) for v in ROLLUP_BINS}, self.dates)
+                self._rollups = rollups
+            return self._rollups
+
+    def _fold(self, rollups, columns, dates):
+        # Add (districts, days) arrays over `dates` to each cube
+        rows = np.repeat(np.arange(len(self.districts)), len(dates))
+        months = np.tile(_calendar_months(dates), len(self.districts))
+        values = {v: np.asarray(columns[v]).ravel() for v in ROLLUP_BINS}
+        for cube in rollups.values():
+            cube.add_days(rows, months, values)
+
+    def append(self, observations):
+        """Add the days after the store's last one; returns how many days were added.
+
+        `observations` is a long frame as build_history_store() takes; rows
+        of other districts are ignored and days without an observation are
+        NaN. Raises ValueError for days the store already covers. The files
+        are rewritten with dates.npy last, and rollups already built take
+        in just the new days.
+        """
+        observations = observations[observations['district'].isin(self.rows)]
+        if observations.empty:
+            return 0
+        stamps = pd.DatetimeIndex(observations['date']).normalize()
+        with self._lock:
+            last = pd.Timestamp(self.dates[-1])
+            if stamps.min() <= last:
+                raise ValueError(f"Observations must start after the store's last day, {last:%Y-%m-%d}")
+            dates = pd.date_range(last + pd.Timedelta(days=1), stamps.max(), freq='D')
+            rows = pd.Index(self.districts).get_indexer(observations['district'])
+            days = dates.get_indexer(stamps)
+
+            added = {}
+            for variable, source in VARIABLES.items():
+                values = np.full((len(self.districts), len(dates)), np.nan)
+                values[rows, days] = observations[source].to_numpy(dtype=np.float64)
+                added[variable] = values
+                _replace_array(os.path.join(self.directory, f'{variable}.npy'),
+                               np.concatenate([self.column(variable), values], axis=1))
+            dates = dates.to_numpy().astype('datetime64[D]')
+            _replace_array(os.path.join(self.directory, 'dates.npy'), np.concatenate([self.dates, dates]))
+
+            self.dates = np.concatenate([self.dates, dates])
+            self._columns = {}
+            if self._rollups is not None:
+                self._fold(self._rollups, added, dates)
+        return len(dates)
+
+    def has_data(self, district):
+        return district in self.rows
+
+    def _day_slice(self, start_year=None, end_year=None):
+        start = 0 if start_year is None else np.searchsorted(self.dates, np.datetime64(f'{start_year}-01-01'))
+        end = len(self.dates) if end_year is None else \
+            np.searchsorted(self.dates, np.datetime64(f'{end_year + 1}-01-01'))
+        return slice(int(start), int(end))
+
+    def frame(self, variable, districts=None, start_year=None, end_year=None):
+        """Daily values for a year range, one column per district (unknown districts are left out)"""
+        districts = self.districts if districts is None else [d for d in districts if d in self.rows]
+        days = self._day_slice(start_year, end_year)
+        values = self.column(variable)[[self.rows[d] for d in districts], days]
+        return pd.DataFrame(values.T, index=pd.DatetimeIndex(self.dates[days]), columns=districts)
+
+def build_history_store(directory, observations, districts):
+    """Write a HistoryStore for a long frame of daily observations.
+
+    `observations` needs 'district' and 'date' columns plus the columns
+    named in VARIABLES. The store is written next to `directory` and moved
+    into place, so readers never see a half-written store.
+    """
+    observations = observations[observations['district'].isin(districts)]
+    dates = pd.date_range(observations['date'].min(), observations['date'].max(), freq='D')
+    rows = pd.Index(districts).get_indexer(observations['district'])
+    days = dates.get_indexer(pd.DatetimeIndex(observations['date']).normalize())
+
+    partial = f'{directory}.{os.getpid()}.tmp'
+    os.makedirs(partial, exist_ok=True)
+    for variable, source in VARIABLES.items():
+        values = np.full((len(districts), len(dates)), np.nan)
+        values[rows, days] = observations[source].to_numpy(dtype=np.float64)
+        np.save(os.path.join(partial, f'{variable}.npy'), values)
+    np.save(os.path.join(partial, 'dates.npy'), dates.to_numpy().astype('datetime64[D]'))
+    with open(os.path.join(partial, 'districts.json'), 'w') as f:
+        json.dump(list(districts), f)
+
+    try:
+        os.replace(partial, directory)
+    except OSError:
+        # Another process got there first
+        shutil.rmtree(partial, ignore_errors=True)
+        if not os.path.isdir(directory):
+            raise
+    return HistoryStore(directory)
+
+def load_history_store(directory=None, cache_dir=None):
+    """Open the history store for predictor.pkl, building it on first use.
+
+    `directory` defaults to the model registry's active version, or the
+    app directory without a registry.
+    """
+    if directory is None:
+        from registry import active_model
+        directory = active_model()[0]
+    # Shared by every version, like the engine state; stores are named by predictor digest
+    cache_dir = cache_dir or os.environ.get('WEATHER_MODEL_CACHE_DIR', os.path.join(APP_DIR, '.model_cache'))
+    predictor_path = os.path.join(directory, PREDICTOR_FILE)
+    store_dir = os.path.join(cache_dir, 'history-' + _file_digest(predictor_path)[:12])
+    if os.path.isdir(store_dir):
+        return HistoryStore(store_dir)
+
+    predictor = load_predictor(predictor_path)
+    os.makedirs(cache_dir, exist_ok=True)
+    districts = [str(d) for d in predictor.district_encoder.classes_]
+    return build_history_store(store_dir, predictor.df_features, districts)
+
+_store = None
+_store_lock = threading.Lock()
+
+def history_store():
+    """The process's history store, opened once; None when predictor.pkl can't be read.
+
+    forget_history_store() makes the next call open the store of the
+    model then active.
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            try:
+                _store = (load_history_store(),)
+            except (OSError, ImportError, ValueError, pickle.UnpicklingError) as e:
+                logger.warning("Historical observations are unavailable: %s", e)
+                _store = (None,)
+        return _store[0]
+
+def forget_history_store():
+    """Drop the open history store, e.g. once another model version is active"""
+    global _store
+    with _store_lock:
+        _store = None
@@ -0,0 +1,756 @@
+# inference.py
+import hashlib
+import io
+import json
+import logging
+import os
+import pickle
+import shutil
+import threading
+import time
+import zipfile
+import numpy as np
+import pandas as pd
+import joblib
+from features import (OBSERVATION_COLUMNS, DistrictCodes, FeatureStore, build_features, feature_windows,
+                      validate_feature_columns)
+
+# Shipped model artifacts, relative to the app directory
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+PREDICTOR_FILE = 'predictor.pkl'
+SCALER_FILE = 'feature_scaler.pkl'
+ENCODER_FILE = 'district_encoder.pkl'
+COLUMNS_FILE = 'feature_columns.pkl'
+
+# The artifacts the engine loads; together they determine its forecasts
+ENGINE_FILES = (PREDICTOR_FILE, SCALER_FILE, ENCODER_FILE, COLUMNS_FILE)
+
+# Days of recent history kept in the engine's feature store
+FEATURE_STORE_DAYS = 64
+
+# Bump when the layout of the cached engine state changes
+STATE_FORMAT = 4
+
+logger = logging.getLogger(__name__)
+
+class WeatherPredictor:
+    """Attribute shell for the WeatherPredictor object pickled in predictor.pkl"""
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+_ACTIVATIONS = {
+    'linear': lambda x: x,
+    'relu': lambda x: np.maximum(x, 0),
+    'tanh': np.tanh,
+    'sigmoid': _sigmoid
+}
+
+class LSTMNetwork:
+    """NumPy forward pass of the Keras Sequential network in predictor.pkl.
+
+    Runs without TensorFlow; weights come straight from the .keras archive.
+    """
+
+    def __init__(self, layers, sequence_length):
+        self.layers = layers  # list of (class_name, config, weights)
+        self.sequence_length = sequence_length
+
+    @classmethod
+    def from_keras_archive(cls, data):
+        """Build the network from the bytes of a .keras zip archive"""
+        import h5py  # only needed when a model is loaded
+
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            config = json.loads(archive.read('config.json'))
+            weights_file = h5py.File(io.BytesIO(archive.read('model.weights.h5')), 'r')
+
+        layers = []
+        seen = {}
+        sequence_length = None
+        for layer in config['config']['layers']:
+            class_name, layer_config = layer['class_name'], layer['config']
+            if class_name == 'InputLayer':
+                sequence_length = layer_config['batch_shape'][1]
+                continue
+
+            # Keras names saved weight groups by layer type: lstm, lstm_1, ...
+            base = {'LSTM': 'lstm', 'BatchNormalization': 'batch_normalization',
+                    'Dense': 'dense', 'Dropout': 'dropout'}[class_name]
+            count = seen.get(base, 0)
+            seen[base] = count + 1
+            group = base if count == 0 else f'{base}_{count}'
+
+            if class_name == 'LSTM':
+                vars_group = weights_file[f'layers/{group}/cell/vars']
+            elif class_name == 'Dropout':
+                vars_group = {}
+            else:
+                vars_group = weights_file[f'layers/{group}/vars']
+            weights = [np.array(vars_group[str(i)]) for i in range(len(vars_group))]
+            layers.append((class_name, layer_config, weights))
+
+        weights_file.close()
+        return cls(layers, sequence_length)
+
+    def predict(self, x):
+        """Run a batch of sequences, shape (batch, timesteps, features)"""
+        x = np.asarray(x, dtype=np.float32)
+
+        for class_name, layer_config, weights in self.layers:
+            if class_name == 'LSTM':
+                kernel, recurrent_kernel, bias = weights
+                units = layer_config['units']
+                h = np.zeros((x.shape[0], units), dtype=np.float32)
+                c = np.zeros((x.shape[0], units), dtype=np.float32)
+                outputs = []
+                for t in range(x.shape[1]):
+                    z = x[:, t] @ kernel + h @ recurrent_kernel + bias
+                    i, f, g, o = np.split(z, 4, axis=-1)
+                    c = _sigmoid(f) * c + _sigmoid(i) * np.tanh(g)
+                    h = _sigmoid(o) * np.tanh(c)
+                    outputs.append(h)
+                x = np.stack(outputs, axis=1) if layer_config['return_sequences'] else h
+            elif class_name == 'BatchNormalization':
+                gamma, beta, moving_mean, moving_variance = weights
+                x = (x - moving_mean) / np.sqrt(moving_variance + layer_config['epsilon']) * gamma + beta
+            elif class_name == 'Dense':
+                kernel, bias = weights
+                x = _ACTIVATIONS[layer_config['activation']](x @ kernel + bias)
+            # Dropout is a no-op at inference time
+
+        return x
+
+# Keras LSTM gates come as i, f, c, o; the compiled form keeps i, f, o, c
+# so the three sigmoid gates are one contiguous block
+def _gate_order(units):
+    return np.concatenate([np.arange(0, 2 * units), np.arange(3 * units, 4 * units),
+                           np.arange(2 * units, 3 * units)])
+
+def _fold_affine(kernel, bias, scale, shift):
+    """Fold an elementwise input transform x * scale + shift into a kernel"""
+    if scale is None:
+        return kernel, bias
+    return scale[:, None] * kernel, bias + shift @ kernel
+
+def _input_affine(feature_scaler):
+    """A fitted StandardScaler's transform as (scale, shift): x * scale + shift"""
+    mean = feature_scaler.mean_ if feature_scaler.with_mean else 0.0
+    std = feature_scaler.scale_ if feature_scaler.with_std else 1.0
+    scale = np.ones(feature_scaler.n_features_in_) / std
+    return scale, -mean * scale
+
+def _output_affine(target_scaler):
+    """A fitted MinMaxScaler's inverse_transform as (scale, shift)"""
+    scale = 1.0 / target_scaler.scale_
+    return scale, -target_scaler.min_ * scale
+
+def compile_network(network, feature_scaler=None, target_scaler=None):
+    """Flatten an LSTMNetwork into a CompiledNetwork.
+
+    BatchNormalization layers, and optionally the StandardScaler on the
+    inputs and the MinMaxScaler on the outputs, are folded into the
+    neighbouring weights so the evaluator only runs matmuls and gates.
+    """
+    steps = []
+    # Pending affine transform x * scale + shift, folded into the next kernel
+    scale = shift = None
+    if feature_scaler is not None:
+        scale, shift = _input_affine(feature_scaler)
+
+    for class_name, layer_config, weights in network.layers:
+        weights = [np.asarray(w, dtype=np.float64) for w in weights]
+        if class_name == 'BatchNormalization':
+            gamma, beta, moving_mean, moving_variance = weights
+            bn_scale = gamma / np.sqrt(moving_variance + layer_config['epsilon'])
+            bn_shift = beta - moving_mean * bn_scale
+            if scale is None:
+                scale, shift = bn_scale, bn_shift
+            else:
+                scale, shift = scale * bn_scale, shift * bn_scale + bn_shift
+        elif class_name == 'LSTM':
+            if layer_config.get('activation', 'tanh') != 'tanh' or \
+                    layer_config.get('recurrent_activation', 'sigmoid') != 'sigmoid':
+                raise ValueError("Only tanh/sigmoid LSTM layers can be compiled")
+            kernel, recurrent_kernel, bias = weights
+            kernel, bias = _fold_affine(kernel, bias, scale, shift)
+            units = layer_config['units']
+            order = _gate_order(units)
+            # Halve the sigmoid gates so the evaluator needs a single tanh
+            half = np.where(np.arange(4 * units) < 3 * units, 0.5, 1.0)
+            stacked = np.vstack([kernel, recurrent_kernel])
+            steps.append(('lstm', {'kernel': stacked[:, order] * half,
+                                   'bias': bias[order] * half},
+                          {'units': layer_config['units'],
+                           'return_sequences': layer_config['return_sequences']}))
+            scale = shift = None
+        elif class_name == 'Dense':
+            kernel, bias = _fold_affine(*weights, scale, shift)
+            steps.append(('dense', {'kernel': kernel, 'bias': bias},
+                          {'activation': layer_config['activation']}))
+            scale = shift = None
+        # Dropout is a no-op at inference time
+
+    if target_scaler is not None:
+        out_scale, out_shift = _output_affine(target_scaler)
+        if scale is None:
+            scale, shift = out_scale, out_shift
+        else:
+            scale, shift = scale * out_scale, shift * out_scale + out_shift
+
+    if scale is not None:
+        kind, arrays, options = steps[-1] if steps else (None, None, None)
+        if kind == 'dense' and options['activation'] == 'linear':
+            arrays['kernel'] = arrays['kernel'] * scale
+            arrays['bias'] = arrays['bias'] * scale + shift
+        else:
+            steps.append(('affine', {'scale': scale, 'shift': shift}, {}))
+
+    # Pack every array into one buffer, each start aligned to 64 bytes
+    layout = []
+    offset = 0
+    for kind, arrays, options in steps:
+        slots = {}
+        for name, array in arrays.items():
+            slots[name] = (offset, array.shape)
+            offset += -(-array.size // 16) * 16
+        layout.append((kind, slots, options))
+    buffer = np.zeros(offset, dtype=np.float32)
+    for (kind, arrays, options), (_, slots, _) in zip(steps, layout):
+        for name, array in arrays.items():
+            start, shape = slots[name]
+            buffer[start:start + array.size] = array.ravel()
+
+    return CompiledNetwork(buffer, layout, network.sequence_length)
+
+class CompiledNetwork:
+    """LSTMNetwork flattened into one contiguous float32 buffer.
+
+    Built by compile_network. Each LSTM step is a single matmul of the
+    stacked [input, hidden] row against the stacked kernels, and all four
+    gates go through one in-place tanh on a preallocated array.
+    """
+
+    def __init__(self, buffer, layout, sequence_length):
+        self.buffer = buffer
+        self.layout = layout  # list of (kind, {name: (offset, shape)}, options)
+        self.sequence_length = sequence_length
+        self._steps = [
+            (kind, {name: buffer[start:start + int(np.prod(shape))].reshape(shape)
+                    for name, (start, shape) in slots.items()}, options)
+            for kind, slots, options in layout
+        ]
+
+    def __getstate__(self):
+        # The step arrays are views into buffer; only store the buffer once
+        return {'buffer': self.buffer, 'layout': self.layout,
+                'sequence_length': self.sequence_length}
+
+    def __setstate__(self, state):
+        self.__init__(state['buffer'], state['layout'], state['sequence_length'])
+
+    @staticmethod
+    def _lstm(x, weights, units, return_sequences):
+        """One LSTM layer over a time-major batch, shape (timesteps, batch, features)"""
+        timesteps, batch, features = x.shape
+        kernel = weights['kernel']  # input and recurrent kernels stacked
+        bias = weights['bias']
+
+        # [x_t, h] side by side so each step is a single matmul
+        xh = np.zeros((batch, features + units), dtype=np.float32)
+        h = xh[:, features:]
+        c = np.zeros((batch, units), dtype=np.float32)
+        tanh_c = np.empty_like(c)
+        gates = np.empty((batch, 4 * units), dtype=np.float32)
+        sigmoid_gates = gates[:, :3 * units]
+        outputs = np.empty((timesteps, batch, units), dtype=np.float32) if return_sequences else None
+
+        for t in range(timesteps):
+            xh[:, :features] = x[t]
+            np.matmul(xh, kernel, out=gates)
+            gates += bias
+            # i, f and o were prescaled by 1/2, so sigmoid(z) = (tanh(z / 2) + 1) / 2
+            np.tanh(gates, out=gates)
+            sigmoid_gates *= 0.5
+            sigmoid_gates += 0.5
+
+            c *= gates[:, units:2 * units]
+            c += gates[:, :units] * gates[:, 3 * units:]
+            np.tanh(c, out=tanh_c)
+            np.multiply(gates[:, 2 * units:3 * units], tanh_c, out=h)
+            if outputs is not None:
+                outputs[t] = h
+
+        return outputs if return_sequences else h.copy()
+
+    def predict(self, x):
+        """Run a batch of raw sequences, shape (batch, timesteps, features)"""
+        # Time-major inside the LSTM stack keeps each timestep contiguous
+        x = np.ascontiguousarray(np.asarray(x, dtype=np.float32).transpose(1, 0, 2))
+        for kind, weights, options in self._steps:
+            if kind == 'lstm':
+                x = self._lstm(x, weights, options['units'], options['return_sequences'])
+            elif kind == 'dense':
+                x = _ACTIVATIONS[options['activation']](x @ weights['kernel'] + weights['bias'])
+            else:
+                x = x * weights['scale'] + weights['shift']
+        return x
+
+class _KerasModel:
+    """Stands in for keras Sequential while unpickling"""
+
+    @staticmethod
+    def _unpickle_model(buffer):
+        return LSTMNetwork.from_keras_archive(buffer.getvalue())
+
+def _keras_getattr(obj, name):
+    # Keras pickles a model as getattr(Sequential, '_unpickle_model')(buffer)
+    if obj is _KerasModel and name == '_unpickle_model':
+        return _KerasModel._unpickle_model
+    raise pickle.UnpicklingError(f"predictor.pkl may not look up {name!r}")
+
+# Everything else predictor.pkl references: NumPy arrays, the pandas frame
+# of training history and the fitted scikit-learn preprocessors
+_PREDICTOR_GLOBALS = {
+    ('_io', 'BytesIO'),
+    ('builtins', 'slice'),
+    ('numpy', 'dtype'),
+    ('numpy', 'ndarray'),
+    ('numpy._core.multiarray', '_reconstruct'),
+    ('numpy._core.multiarray', 'scalar'),
+    # Where NumPy 1.x pickles put them
+    ('numpy.core.multiarray', '_reconstruct'),
+    ('numpy.core.multiarray', 'scalar'),
+    ('pandas._libs.arrays', '__pyx_unpickle_NDArrayBacked'),
+    ('pandas._libs.internals', '_unpickle_block'),
+    ('pandas.core.arrays.datetimes', 'DatetimeArray'),
+    ('pandas.core.frame', 'DataFrame'),
+    ('pandas.core.indexes.base', 'Index'),
+    ('pandas.core.indexes.base', '_new_Index'),
+    ('pandas.core.internals.managers', 'BlockManager'),
+    ('sklearn.preprocessing._data', 'MinMaxScaler'),
+    ('sklearn.preprocessing._data', 'StandardScaler'),
+    ('sklearn.preprocessing._label', 'LabelEncoder')
+}
+
+class _PredictorUnpickler(pickle.Unpickler):
+    """Unpickle predictor.pkl without the training script or Keras installed.
+
+    Only the globals the predictor is made of resolve; any other raises
+    UnpicklingError instead of importing and calling it.
+    """
+
+    def find_class(self, module, name):
+        if module == '__main__' and name == 'WeatherPredictor':
+            return WeatherPredictor
+        if module.startswith('keras') and name == 'Sequential':
+            return _KerasModel
+        if (module, name) == ('builtins', 'getattr'):
+            return _keras_getattr
+        if (module, name) in _PREDICTOR_GLOBALS:
+            return super().find_class(module, name)
+        raise pickle.UnpicklingError(f"predictor.pkl may not reference {module}.{name}")
+
+def load_predictor(path):
+    """Load the pickled WeatherPredictor with a NumPy network attached"""
+    with open(path, 'rb') as f:
+        return _PredictorUnpickler(f).load()
+
+def _file_digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def artifacts_version(directory=APP_DIR, digests=None):
+    """Model version of the ENGINE_FILES in `directory`: 'lstm-' and 12 hex digits.
+
+    `digests` maps file names to their SHA-256, when already known (as
+    in a registry manifest). Raises OSError when a file is missing.
+    """
+    digests = digests or {name: _file_digest(os.path.join(directory, name)) for name in ENGINE_FILES}
+    combined = hashlib.sha256()
+    for name in ENGINE_FILES:
+        combined.update(f'{name}:{digests[name]}\n'.encode())
+    return 'lstm-' + combined.hexdigest()[:12]
+
+def _history_arrays(df_features):
+    """Split the training history into per-district date and value arrays"""
+    history = {}
+    climatology = {}
+    for district, frame in df_features.sort_values(['district', 'date']).groupby('district'):
+        dates = pd.DatetimeIndex(frame['date'])
+        values = frame[OBSERVATION_COLUMNS].to_numpy(dtype=np.float64)
+        history[district] = {'dates': dates.asi8.copy(), 'values': values}
+        # Day-of-year normals, indexed directly by day of year (row 0 unused)
+        normals = np.full((367, len(OBSERVATION_COLUMNS)), np.nan)
+        by_day = frame[OBSERVATION_COLUMNS].groupby(dates.dayofyear).mean()
+        normals[by_day.index.to_numpy()] = by_day.to_numpy()
+        climatology[district] = normals
+    return history, climatology
+
+def build_engine_state(directory=APP_DIR):
+    """Load predictor.pkl and the shipped scaler, encoder and column list.
+
+    Returns the engine state: plain objects plus NumPy arrays, which
+    save_engine_state can store and load_engine_state memory-map. The
+    scalers and the encoder are kept as arrays, so loading the state never
+    imports scikit-learn.
+    """
+    predictor_path = os.path.join(directory, PREDICTOR_FILE)
+    predictor = load_predictor(predictor_path)
+    feature_scaler = joblib.load(os.path.join(directory, SCALER_FILE))
+    district_encoder = joblib.load(os.path.join(directory, ENCODER_FILE))
+    feature_columns = validate_feature_columns(joblib.load(os.path.join(directory, COLUMNS_FILE)))
+
+    if list(feature_columns) != list(predictor.feature_cols):
+        raise ValueError("feature_columns.pkl does not match the predictor's feature columns")
+
+    history, climatology = _history_arrays(predictor.df_features)
+    return {
+        'version': artifacts_version(directory),
+        'network': predictor.model,
+        'compiled': compile_network(predictor.model, feature_scaler, predictor.target_scaler),
+        'input_affine': _input_affine(feature_scaler),
+        'output_affine': _output_affine(predictor.target_scaler),
+        'district_classes': np.array([str(c) for c in district_encoder.classes_]),
+        'feature_columns': list(feature_columns),
+        'history': history,
+        'climatology': climatology
+    }
+
+def save_engine_state(state, directory):
+    """Write an engine state as one .npy per array plus state.json.
+
+    Nothing is pickled: the networks are stored as their layer configs
+    and array names. The state is written next to `directory` and moved
+    into place, so readers never see a half-written state.
+    """
+    partial = f'{directory}.{os.getpid()}.tmp'
+    os.makedirs(partial, exist_ok=True)
+
+    def array(name, value):
+        np.save(os.path.join(partial, f'{name}.npy'), np.asarray(value), allow_pickle=False)
+        return name
+
+    network, compiled = state['network'], state['compiled']
+    districts = list(state['history'])
+    spec = {
+        'version': state['version'],
+        'feature_columns': list(state['feature_columns']),
+        'network': {
+            'sequence_length': network.sequence_length,
+            'layers': [[class_name, config, [array(f'network-{i}-{j}', w) for j, w in enumerate(weights)]]
+                       for i, (class_name, config, weights) in enumerate(network.layers)]
+        },
+        'compiled': {
+            'sequence_length': compiled.sequence_length,
+            'layout': compiled.layout,
+            'buffer': array('compiled', compiled.buffer)
+        },
+        'input_affine': [array('input-scale', state['input_affine'][0]),
+                         array('input-shift', state['input_affine'][1])],
+        'output_affine': [array('output-scale', state['output_affine'][0]),
+                          array('output-shift', state['output_affine'][1])],
+        'district_classes': array('district-classes', state['district_classes']),
+        # District names are not safe file names; files go by position
+        'districts': districts,
+        'history': [{'dates': array(f'history-{i}-dates', state['history'][d]['dates']),
+                     'values': array(f'history-{i}-values', state['history'][d]['values'])}
+                    for i, d in enumerate(districts)],
+        'climatology': [array(f'climatology-{i}', state['climatology'][d]) for i, d in enumerate(districts)]
+    }
+    with open(os.path.join(partial, 'state.json'), 'w') as f:
+        json.dump(spec, f)
+
+    try:
+        os.replace(partial, directory)
+    except OSError:
+        # Another process got there first
+        shutil.rmtree(partial, ignore_errors=True)
+        if not os.path.isdir(directory):
+            raise
+
+def load_engine_state(directory, mmap_mode='r'):
+    """Read a state written by save_engine_state, memory-mapping its arrays.
+
+    Arrays are loaded with allow_pickle=False, so a tampered cache raises
+    ValueError instead of running code.
+    """
+    with open(os.path.join(directory, 'state.json')) as f:
+        spec = json.load(f)
+
+    def array(name):
+        return np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode, allow_pickle=False)
+
+    network = LSTMNetwork([(class_name, config, [array(w) for w in weights])
+                           for class_name, config, weights in spec['network']['layers']],
+                          spec['network']['sequence_length'])
+    compiled = spec['compiled']
+    districts = spec['districts']
+    return {
+        'version': spec['version'],
+        'network': network,
+        'compiled': CompiledNetwork(array(compiled['buffer']), compiled['layout'], compiled['sequence_length']),
+        'input_affine': tuple(array(name) for name in spec['input_affine']),
+        'output_affine': tuple(array(name) for name in spec['output_affine']),
+        'district_classes': array(spec['district_classes']),
+        'feature_columns': spec['feature_columns'],
+        'history': {d: {key: array(name) for key, name in arrays.items()}
+                    for d, arrays in zip(districts, spec['history'])},
+        'climatology': {d: array(name) for d, name in zip(districts, spec['climatology'])}
+    }
+
+class ModelEngine:
+    """Batch inference over the trained LSTM for the districts it knows.
+
+    A forecast for date D runs the network on the 30 days of features
+    ending at D - 1. Days covered by the training history use observed
+    values; other days use that district's day-of-year climatology.
+
+    The feature store holds every district's latest FEATURE_STORE_DAYS
+    days up to yesterday, appending each new day as it passes, so the
+    windows of today's forecasts are row reads. With `store_path` it is
+    restored from and saved to an .npz snapshot there.
+    """
+
+    def __init__(self, state, store_path=None):
+        self.network = state['network']
+        self.compiled = state['compiled']
+        self.input_affine = state['input_affine']
+        self.output_affine = state['output_affine']
+        self.district_encoder = DistrictCodes(state['district_classes'])
+        self.feature_columns = list(state['feature_columns'])
+        self.version = state['version']
+        self.districts = list(self.district_encoder.classes_)
+
+        # DataFrame views over the (possibly memory-mapped) arrays
+        self.history = {
+            district: pd.DataFrame(arrays['values'], index=pd.DatetimeIndex(arrays['dates']),
+                                   columns=OBSERVATION_COLUMNS, copy=False)
+            for district, arrays in state['history'].items()
+        }
+        self.climatology = {
+            district: pd.DataFrame(normals, columns=OBSERVATION_COLUMNS, copy=False)
+            for district, normals in state['climatology'].items()
+        }
+
+        # Filled on the first forecast
+        self.store_path = store_path
+        self.feature_store = None
+        self._store_lock = threading.Lock()
+
+    @classmethod
+    def from_artifacts(cls, directory=APP_DIR):
+        """Load the engine straight from the pickled artifacts"""
+        return cls(build_engine_state(directory))
+
+    def supports(self, district):
+        return district in self.districts
+
+    def _restore_store(self):
+        """The snapshot at store_path, or None when missing or not this engine's"""
+        try:
+            store = FeatureStore.load(self.store_path, self.district_encoder)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Ignoring feature store snapshot %s: %s", self.store_path, e)
+            return None
+        if store.capacity != FEATURE_STORE_DAYS or store.feature_columns != self.feature_columns \
+                or store.districts != self.districts:
+            return None
+        return store
+
+    def _save_store(self, store):
+        partial = f'{self.store_path}.{os.getpid()}.tmp'
+        try:
+            with open(partial, 'wb') as f:
+                store.save(f)
+            os.replace(partial, self.store_path)
+        except OSError as e:
+            logger.warning("Could not write feature store snapshot %s: %s", self.store_path, e)
+
+    def _current_store(self):
+        """The feature store, brought up to yesterday; call with _store_lock held"""
+        yesterday = pd.Timestamp.today().normalize() - pd.Timedelta(days=1)
+        store = self.feature_store
+        if store is None and self.store_path:
+            store = self._restore_store()
+        days = store.last_date if store is not None else None
+        if store is None or np.isnat(days).any() or (days != days[0]).any() or \
+                (yesterday - pd.Timestamp(days[0])).days > store.capacity:
+            # Too far behind to append: seed it in one pass; two extra leading days feed the first lags
+            span = pd.date_range(yesterday - pd.Timedelta(days=FEATURE_STORE_DAYS + 1), yesterday, freq='D')
+            observations = self._observations(self.districts, span)
+            features = build_features(observations, self.district_encoder, self.feature_columns)
+            shape = (len(self.districts), len(span), -1)
+            store = FeatureStore(self.district_encoder, capacity=FEATURE_STORE_DAYS,
+                                 feature_columns=self.feature_columns)
+            store.seed(yesterday, observations[OBSERVATION_COLUMNS].to_numpy().reshape(shape)[:, 2:],
+                       features.to_numpy().reshape(shape)[:, 2:])
+        elif pd.Timestamp(days[0]) < yesterday:
+            # Each day that passed is one O(1) append per district
+            span = pd.date_range(pd.Timestamp(days[0]) + pd.Timedelta(days=1), yesterday, freq='D')
+            values = self._observations(self.districts, span)[OBSERVATION_COLUMNS].to_numpy()
+            for district, rows in zip(self.districts, values.reshape(len(self.districts), len(span), -1)):
+                store.extend(district, span, rows)
+        else:
+            # Up to date, e.g. just restored from a snapshot
+            self.feature_store = store
+            return store
+        self.feature_store = store
+        if self.store_path:
+            self._save_store(store)
+        return store
+
+    def _observations(self, districts, span):
+        """Long frame of daily observations over `span`, filled from climatology.
+
+        Districts are outermost and each district's days are in order.
+        """
+        blocks = []
+        for district in districts:
+            observed = self.history[district].reindex(span).to_numpy()
+            normals = self.climatology[district].to_numpy()[span.dayofyear]
+            blocks.append(np.where(np.isnan(observed), normals, observed))
+
+        frame = pd.DataFrame(np.concatenate(blocks), columns=OBSERVATION_COLUMNS)
+        frame.insert(0, 'district', np.repeat(districts, len(span)))
+        frame.insert(1, 'date', np.tile(span.to_numpy(), len(districts)))
+        return frame
+
+    def _sequences(self, districts, dates):
+        """Raw feature windows for every district x date, districts outermost"""
+        window = self.network.sequence_length
+        # Windows that lie inside the feature store are plain row reads
+        last_days = dates - pd.Timedelta(days=1)
+        with self._store_lock:
+            store = self._current_store()
+            if all(store.covers(districts, day, window) for day in last_days):
+                blocks = [store.windows(districts, day, window) for day in last_days]
+                return np.stack(blocks, axis=1).reshape(-1, window, len(self.feature_columns))
+
+        # Two extra leading days feed the lag and 3-day rolling features
+        span = pd.date_range(dates.min() - pd.Timedelta(days=window + 2),
+                             dates.max() - pd.Timedelta(days=1), freq='D')
+        ends = span.get_indexer(dates - pd.Timedelta(days=1)) + 1
+
+        features = build_features(self._observations(districts, span), self.district_encoder,
+                                  self.feature_columns)
+        block = features.to_numpy(dtype=np.float32).reshape(len(districts), len(span), -1)
+        return feature_windows(block, ends, window)
+
+    def predict(self, districts, dates):
+        """Forecast (temperature, rainfall, windspeed) for a district x date grid.
+
+        Every district must be supported. Returns shape (n_districts, n_dates, 3).
+        """
+        dates = pd.DatetimeIndex(dates).normalize()
+        # The compiled network has both scalers folded into its weights
+        outputs = self.compiled.predict(self._sequences(districts, dates))
+        return outputs.reshape(len(districts), len(dates), outputs.shape[-1])
+
+    def parity_error(self, districts, dates):
+        """Largest absolute gap between the compiled network and the reference path
+
+        >>> engine = load_model_engine()
+        >>> engine.parity_error(engine.districts, pd.date_range('2023-12-15', '2024-01-15')) < 1e-3
+        True
+        """
+        x = self._sequences(districts, pd.DatetimeIndex(dates).normalize())
+        in_scale, in_shift = self.input_affine
+        out_scale, out_shift = self.output_affine
+        reference = self.network.predict(x * in_scale + in_shift) * out_scale + out_shift
+        return float(np.abs(self.compiled.predict(x) - reference).max())
+
+def load_model_engine(directory=APP_DIR):
+    """Load the model engine from the shipped artifacts"""
+    return ModelEngine.from_artifacts(directory)
+
+def resident_memory():
+    """Resident set size of this process in bytes, or None where unsupported"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+class LazyModelEngine:
+    """Model engine that loads its artifacts on the first forecast.
+
+    The first load in any process unpickles predictor.pkl and saves the
+    engine state to the cache directory with save_engine_state. Later
+    loads memory-map its arrays read-only, so worker processes share the
+    weight and history pages instead of each holding a private copy. The
+    cache is never unpickled.
+    """
+
+    def __init__(self, directory=APP_DIR, cache_dir=None, version=None):
+        self.directory = directory
+        # One cache for every version; the state file names carry the version
+        self.cache_dir = cache_dir or os.environ.get('WEATHER_MODEL_CACHE_DIR',
+                                                     os.path.join(APP_DIR, '.model_cache'))
+        # Cheap to compute and raises OSError right away if the model is missing
+        self.version = version or artifacts_version(directory)
+        self.available = True
+        self.load_report = None
+        self._engine = None
+        self._lock = threading.Lock()
+
+    def _cache_path(self):
+        return os.path.join(self.cache_dir, f'{self.version}-state{STATE_FORMAT}')
+
+    def _load_state(self):
+        """Return (state, source), filling the memory-map cache if needed"""
+        cache_path = self._cache_path()
+        if os.path.isdir(cache_path):
+            return load_engine_state(cache_path), 'mmap'
+
+        state = build_engine_state(self.directory)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            save_engine_state(state, cache_path)
+        except OSError as e:
+            logger.warning("Could not write model cache %s: %s", cache_path, e)
+            return state, 'pickle'
+        return load_engine_state(cache_path), 'pickle'
+
+    def load(self):
+        """Load the engine once; returns None if the artifacts are unusable"""
+        if self._engine is not None or not self.available:
+            return self._engine
+
+        with self._lock:
+            if self._engine is None and self.available:
+                rss_before = resident_memory()
+                start = time.perf_counter()
+                try:
+                    state, source = self._load_state()
+                    store_path = os.path.join(self.cache_dir, f'{self.version}-features.npz')
+                    self._engine = ModelEngine(state, store_path)
+                except (OSError, ImportError, ValueError, KeyError, pickle.UnpicklingError) as e:
+                    logger.warning("Model artifacts could not be loaded, using mock forecasts: %s", e)
+                    self.available = False
+                    return None
+                rss_after = resident_memory()
+                self.load_report = {
+                    'source': source,
+                    'seconds': time.perf_counter() - start,
+                    'rss_delta_bytes': rss_after - rss_before if rss_before is not None else None
+                }
+                logger.info("Loaded model %s from %s in %.3fs (RSS delta %s bytes)", self.version,
+                            source, self.load_report['seconds'], self.load_report['rss_delta_bytes'])
+        return self._engine
+
+    def warm_up(self):
+        """Load the engine and run one forecast so the first user does not wait"""
+        engine = self.load()
+        if engine is not None:
+            engine.predict(engine.districts[:1], [pd.Timestamp.today()])
+        return self.load_report
+
+    def supports(self, district):
+        engine = self.load()
+        return engine is not None and engine.supports(district)
+
+    def predict(self, districts, dates):
+        return self.load().predict(districts, dates)
@@ -0,0 +1,129 @@
+# jobs.py
+# Background jobs for the expensive tabs. A job is a generator function run in
+# a shared thread pool; every value it yields is a partial result the page can
+# draw while the rest is computed, and the session's widgets stay responsive.
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from telemetry import telemetry
+
+# Threads of the shared job pool; WEATHER_JOB_WORKERS overrides
+JOB_WORKERS = int(os.environ.get("WEATHER_JOB_WORKERS", 4))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def use_pool(executor):
+    """Run later jobs on `executor` (None: the shared thread pool)"""
+    global _pool
+    with _pool_lock:
+        _pool = executor
+
+def _executor():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(JOB_WORKERS, thread_name_prefix='weather-job')
+        return _pool
+
+class Job:
+    """fn(*args) run in the job pool, its yielded values collected as they arrive.
+
+    `total` is the number of parts fn yields, when known, for progress().
+    """
+
+    def __init__(self, fn, args, total=None):
+        self.fn = fn
+        self.args = args
+        self.total = total
+        self.status = 'queued'
+        self.error = None
+        self.started = time.perf_counter()
+        self.finished = None
+        self._parts = []
+        self._cancelled = False
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self._future = None
+
+    def _run(self):
+        parts = None
+        try:
+            if not self._cancelled:
+                self.status = 'running'
+                parts = self.fn(*self.args)
+                with telemetry.span(f'job:{self.fn.__name__}'):
+                    for part in parts:
+                        if self._cancelled:
+                            break
+                        with self._lock:
+                            self._parts.append(part)
+            self.status = 'cancelled' if self._cancelled else 'done'
+        except Exception as e:
+            self.error = e
+            self.status = 'failed'
+        finally:
+            if parts is not None:
+                parts.close()
+            self.finished = time.perf_counter()
+            self._done.set()
+
+    def results(self):
+        """The parts yielded so far, in order"""
+        with self._lock:
+            return list(self._parts)
+
+    def progress(self):
+        """Fraction of `total` parts received, 0-1 (0 while total is unknown)"""
+        if self.done():
+            return 1.0
+        return min(len(self._parts) / self.total, 1.0) if self.total else 0.0
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.perf_counter()) - self.started
+
+    def done(self):
+        return self.status in ('done', 'failed', 'cancelled')
+
+    def wait(self, timeout=None):
+        """Block until the job ends or `timeout` seconds pass; returns done()"""
+        self._done.wait(timeout)
+        return self.done()
+
+    def cancel(self):
+        """Stop at the next part; a job still queued never starts"""
+        self._cancelled = True
+        if self._future is not None and self._future.cancel():
+            self.status = 'cancelled'
+            self.finished = time.perf_counter()
+            self._done.set()
+
+def submit(fn, *args, total=None):
+    """Start fn(*args), a generator function, in the job pool; returns its Job"""
+    job = Job(fn, args, total)
+    telemetry.count('jobs_submitted')
+    job._future = _executor().submit(job._run)
+    return job
+
+def session_job(jobs, key, fn, *args, start=False, total=None):
+    """The job under `key` in the dict `jobs` (e.g. a session's state) that runs fn(*args).
+
+    start=True submits a new one, as when its button is clicked. A job
+    under `key` for other arguments is superseded: it is cancelled and
+    dropped, so a rerun with new settings stops work nobody will see.
+    Returns None when there is no job for these arguments.
+    """
+    job = jobs.get(key)
+    # By name: a script rerun defines its functions anew
+    if job is not None and (start or job.fn.__qualname__ != fn.__qualname__ or job.args != args):
+        if not job.done():
+            job.cancel()
+            telemetry.count('jobs_superseded')
+        del jobs[key]
+        job = None
+    if start:
+        job = jobs[key] = submit(fn, *args, total=total)
+    return job
@@ -0,0 +1,52 @@
+# lazy.py
+# Stand-ins for heavy modules that import them on first attribute access,
+# so pages that never touch pandas or plotly don't pay for loading them.
+import importlib
+import threading
+import types
+
+class LazyModule(types.ModuleType):
+    """Module proxy that imports `name` the first time one of its attributes is read.
+
+    `on_load(module)` runs once, right after the import. Attributes are
+    copied onto the proxy as they are read, so later lookups cost no more
+    than on the real module.
+
+    >>> json = LazyModule('json')
+    >>> json.loaded
+    False
+    >>> json.dumps([1])
+    '[1]'
+    >>> json.loaded
+    True
+    """
+
+    def __init__(self, name, on_load=None):
+        super().__init__(name)
+        self._on_load = on_load
+        self._module = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._module is not None
+
+    def _load(self):
+        with self._lock:
+            if self._module is None:
+                module = importlib.import_module(self.__name__)
+                if self._on_load is not None:
+                    self._on_load(module)
+                self._module = module
+        return self._module
+
+    def __getattr__(self, attr):
+        # Only reached for attributes not already copied onto the proxy
+        if attr.startswith('__') and attr.endswith('__'):
+            raise AttributeError(attr)
+        value = getattr(self._load(), attr)
+        setattr(self, attr, value)
+        return value
+
+    def __dir__(self):
+        return dir(self._load())
@@ -0,0 +1,282 @@
+# registry.py
+# Local model registry: one directory of artifacts per model version, and a
+# manifest with their checksums and the active version. Activating another
+# version swaps it into running processes without a restart; forecasts and
+# figures of the replaced version are dropped, those of the new one stay.
+# `python registry.py --help` shows the command line.
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import threading
+from datetime import datetime
+
+import forecast
+from inference import APP_DIR, ENGINE_FILES, LazyModelEngine, _file_digest, artifacts_version
+from telemetry import telemetry
+
+logger = logging.getLogger(__name__)
+
+# Registry directory; WEATHER_MODEL_REGISTRY overrides. Without a manifest
+# there the model files next to the app are used.
+REGISTRY_DIR = os.environ.get("WEATHER_MODEL_REGISTRY", os.path.join(APP_DIR, 'models'))
+MANIFEST_FILE = 'manifest.json'
+
+# Registered and checksummed along with ENGINE_FILES, though not part of the
+# version since inference doesn't read them
+EXTRA_FILES = ('weather_model.h5',)
+
+# Seconds between checks of the manifest for a new active version;
+# WEATHER_MODEL_WATCH_SECONDS=0 turns watching off
+WATCH_SECONDS = float(os.environ.get("WEATHER_MODEL_WATCH_SECONDS", 10))
+
+class RegistryError(ValueError):
+    """Unknown version, or artifacts that don't match the manifest"""
+
+class ModelRegistry:
+    """Versioned model artifacts under `root`, described by root/manifest.json.
+
+    The manifest maps every version to its files' SHA-256 and names the
+    active one. Versions are the engine's own (inference.artifacts_version),
+    so forecast caches and the engine state cache key on the same string.
+    """
+
+    def __init__(self, root=REGISTRY_DIR):
+        self.root = root
+        self.manifest_path = os.path.join(root, MANIFEST_FILE)
+
+    def manifest(self):
+        """The manifest, or an empty one when nothing is registered"""
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'active': None, 'versions': {}}
+
+    def _write_manifest(self, manifest):
+        # Readers see the old manifest or the new one, never part of either
+        os.makedirs(self.root, exist_ok=True)
+        partial = f'{self.manifest_path}.{os.getpid()}.tmp'
+        with open(partial, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(partial, self.manifest_path)
+
+    def path(self, version):
+        return os.path.join(self.root, version)
+
+    def versions(self):
+        """Version -> manifest entry, oldest first"""
+        return self.manifest()['versions']
+
+    def active(self):
+        """The active version, or None"""
+        return self.manifest()['active']
+
+    def register(self, source_dir, note='', activate=False):
+        """Copy the model files in `source_dir` into the registry; returns their version.
+
+        The first version registered becomes the active one. Registering
+        the same artifacts again is a no-op.
+        """
+        names = ENGINE_FILES + tuple(name for name in EXTRA_FILES
+                                     if os.path.exists(os.path.join(source_dir, name)))
+        os.makedirs(self.root, exist_ok=True)
+        partial = os.path.join(self.root, f'.incoming.{os.getpid()}.tmp')
+        shutil.rmtree(partial, ignore_errors=True)
+        os.makedirs(partial)
+        try:
+            # Checksums of the copies, so a file changing meanwhile can't slip past them
+            for name in names:
+                shutil.copy2(os.path.join(source_dir, name), os.path.join(partial, name))
+            files = {name: _file_digest(os.path.join(partial, name)) for name in names}
+            version = artifacts_version(digests=files)
+            if os.path.isdir(self.path(version)):
+                shutil.rmtree(partial)
+            else:
+                os.replace(partial, self.path(version))
+        except BaseException:
+            shutil.rmtree(partial, ignore_errors=True)
+            raise
+
+        manifest = self.manifest()
+        if version not in manifest['versions']:
+            manifest['versions'][version] = {
+                'registered': datetime.now().isoformat(timespec='seconds'),
+                'note': note,
+                'files': files
+            }
+        if activate or manifest['active'] is None:
+            manifest['active'] = version
+        self._write_manifest(manifest)
+        telemetry.count('models_registered')
+        return version
+
+    def verify(self, version):
+        """Check `version`'s files against the manifest; raises RegistryError on a mismatch"""
+        entry = self.versions().get(version)
+        if entry is None:
+            raise RegistryError(f"Unknown model version {version!r}")
+        for name, digest in entry['files'].items():
+            path = os.path.join(self.path(version), name)
+            try:
+                actual = _file_digest(path)
+            except OSError as e:
+                raise RegistryError(f"{version}: {name} is unreadable ({e})") from None
+            if actual != digest:
+                raise RegistryError(f"{version}: checksum of {name} does not match the manifest")
+
+    def activate(self, version):
+        """Make `version` the active model, after verifying it"""
+        self.verify(version)
+        manifest = self.manifest()
+        manifest['active'] = version
+        self._write_manifest(manifest)
+
+def active_model(registry=None):
+    """(directory, version) of the model to serve; (APP_DIR, None) without a registry"""
+    registry = registry or ModelRegistry()
+    version = registry.active()
+    if version is None:
+        return APP_DIR, None
+    return registry.path(version), version
+
+_reload_lock = threading.Lock()
+
+def reload_model(version=None, registry=None):
+    """Swap the registry's active model (or `version`) into this process.
+
+    The new engine is loaded and warmed up before the swap, so forecasts
+    never wait for it; a forecast already running finishes on the engine
+    it started with. Then the cached forecasts, snapshots and figures of
+    the replaced version are dropped, and the history store is reopened
+    from the new version's artifacts on next use. Returns the version
+    now serving, or None when there was nothing to do: mock mode, or the
+    version is already serving. Raises RegistryError if the artifacts
+    fail their checksums or can't be loaded.
+    """
+    if os.environ.get("WEATHER_FORECAST_MODE", "model") == "mock":
+        return None
+    registry = registry or ModelRegistry()
+    with _reload_lock:
+        version = version or registry.active()
+        old = forecast.model_version()
+        if version is None or version == old:
+            return None
+        registry.verify(version)
+        engine = LazyModelEngine(registry.path(version), version=version)
+        engine.warm_up()
+        if not engine.available:
+            raise RegistryError(f"{version}: the model could not be loaded")
+        forecast.use_model_engine(engine)
+        dropped = forecast.forget_model_version(old)
+        # Only if loaded: processes without pages have no figures to drop
+        figures = sys.modules.get('figures')
+        if figures is not None:
+            dropped += figures.figure_cache.discard_version(old)
+        # The history pages read the observations shipped with the model
+        history = sys.modules.get('history')
+        if history is not None:
+            history.forget_history_store()
+        telemetry.count('model_reloads')
+        logger.info("Model %s replaced %s (%d cache entries dropped)", version, old, dropped)
+        return version
+
+class ModelWatcher:
+    """Daemon thread calling reload_model() whenever the manifest changes"""
+
+    def __init__(self, registry=None, interval=WATCH_SECONDS):
+        self.registry = registry or ModelRegistry()
+        self.interval = interval
+        self.last_error = None
+        self._stamp = None
+        self._thread = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start watching; no-op when already running or interval is 0"""
+        with self._lock:
+            if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+                return self
+            self._stamp = self._manifest_stamp()
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._loop, name='model-watcher', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _manifest_stamp(self):
+        try:
+            stat = os.stat(self.registry.manifest_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def check(self):
+        """Reload if the manifest changed since the last check; returns reload_model()'s result"""
+        stamp = self._manifest_stamp()
+        if stamp == self._stamp:
+            return None
+        try:
+            version = reload_model(registry=self.registry)
+            self.last_error = None
+        except (OSError, ValueError) as e:
+            # Keep serving the current model; retried when the manifest changes again
+            logger.error("Model reload failed: %s", e)
+            self.last_error = f"{type(e).__name__}: {e}"
+            version = None
+        self._stamp = stamp
+        return version
+
+    def _loop(self):
+        while not self._stopping.wait(self.interval):
+            self.check()
+
+# One per process, started by the app and the API
+model_watcher = ModelWatcher()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the local model registry")
+    parser.add_argument('--root', default=REGISTRY_DIR, help=f"Registry directory (default: {REGISTRY_DIR})")
+    commands = parser.add_subparsers(dest='command', required=True)
+    register = commands.add_parser('register', help="Copy a directory's model files in as a new version")
+    register.add_argument('source', nargs='?', default=APP_DIR, help="Directory of the model files (default: the app's)")
+    register.add_argument('--note', default='')
+    register.add_argument('--activate', action='store_true', help="Also make it the active version")
+    activate = commands.add_parser('activate', help="Verify a version and make it the active one")
+    activate.add_argument('version')
+    verify = commands.add_parser('verify', help="Check a version's files against the manifest")
+    verify.add_argument('version', nargs='?', help="(default: the active version)")
+    commands.add_parser('list', help="List the registered versions")
+    args = parser.parse_args(argv)
+
+    registry = ModelRegistry(args.root)
+    try:
+        if args.command == 'register':
+            print(registry.register(args.source, args.note, args.activate))
+        elif args.command == 'activate':
+            registry.activate(args.version)
+        elif args.command == 'verify':
+            version = args.version or registry.active()
+            if version is None:
+                parser.error("no version is registered")
+            registry.verify(version)
+            print(f"{version}: OK")
+        else:
+            manifest = registry.manifest()
+            for version, entry in manifest['versions'].items():
+                marker = '*' if version == manifest['active'] else ' '
+                print(f"{marker} {version}  {entry['registered']}  {entry['note']}")
+    except (OSError, RegistryError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+# rules.py
+# alerts.RULES evaluated over whole arrays: one call classifies every district
+# and date of a forecast grid, with the same results as the scalar helpers.
+import numpy as np
+
+from alerts import RULES
+
+OPERATORS = {'>': np.greater, '>=': np.greater_equal, '<': np.less, '<=': np.less_equal}
+
+# Forecast values the rules read
+INPUTS = ('temperature', 'rainfall', 'windspeed')
+
+def _mask(tests, values):
+    mask = True
+    for variable, op, threshold, *step in tests:
+        if step:
+            threshold = threshold + step[0] * values['position']
+        mask = mask & OPERATORS[op](values[variable], threshold)
+    return mask
+
+def _evaluate(rule, values):
+    if rule in values:
+        return values[rule]
+    spec = RULES[rule]
+    for _, tests in spec.get('rows') or spec['points']:
+        for variable, *_ in tests:
+            if variable in RULES:
+                _evaluate(variable, values)
+    if 'points' in spec:
+        result = sum(points * _mask(tests, values) for points, tests in spec['points'])
+    else:
+        # Row index of the first match; the default sits one past the last row
+        labels = [label for label, _ in spec['rows']] + [spec['default']]
+        first = np.select([_mask(tests, values) for _, tests in spec['rows']],
+                          np.arange(len(spec['rows'])), default=len(spec['rows']))
+        result = np.asarray(labels)[first]
+    values[rule] = result
+    return result
+
+def classify(forecasts, rules=None, position=0):
+    """Evaluate `rules` (default: every rule in alerts.RULES) over arrays of forecasts.
+
+    `forecasts` maps temperature, rainfall and windspeed to arrays of one
+    shape, e.g. a predict_weather_batch frame or the (districts, dates)
+    arrays of a forecast grid. `position` (places in the alerts panel)
+    broadcasts against them. Returns rule -> array of that shape; labels
+    are str arrays, 'severe' is bool and 'risk_score' is int.
+
+    >>> out = classify({'temperature': [36.0, 25.0], 'rainfall': [0.0, 60.0], 'windspeed': [5.0, 45.0]})
+    >>> out['weather_type'].tolist(), out['risk_level'].tolist(), out['severe'].tolist()
+    (['hot', 'storm'], ['Medium', 'High'], [True, True])
+    """
+    arrays = [np.asarray(forecasts[name], dtype=np.float64) for name in INPUTS] + [np.asarray(position)]
+    values = dict(zip(INPUTS + ('position',), np.broadcast_arrays(*arrays)))
+    return {rule: _evaluate(rule, values) for rule in (rules or RULES)}
@@ -0,0 +1,266 @@
+# scenarios.py
+# Island-wide ensemble scenarios, e.g. 25 districts x 365 days x 200 members,
+# sharded over a pool of worker processes. Workers write their summaries
+# straight into one shared-memory block; only cell counts come back through
+# the pool's pipes. `python scenarios.py --help` shows the command line.
+import argparse
+import math
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import weakref
+from concurrent.futures import CancelledError, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from districts import sri_lanka_districts
+from ensemble import DEFAULT_MEMBERS, MAX_MEMBERS, EXCEEDANCE, ensemble_forecast, summary_fields
+from forecast import install_model_engine, model_version
+from telemetry import telemetry
+
+# Worker processes of the shared pool; WEATHER_SCENARIO_WORKERS overrides
+DEFAULT_WORKERS = int(os.environ.get("WEATHER_SCENARIO_WORKERS", 0)) or os.cpu_count() or 1
+
+# Shards queued per worker, so progress moves steadily and a slow shard
+# doesn't leave the other workers idle at the end
+SHARDS_PER_WORKER = 4
+
+# Dates per shard at most; bounds a worker's member arrays to
+# districts x MAX_SHARD_DAYS x members cells
+MAX_SHARD_DAYS = 31
+
+def _init_worker():
+    # Each worker forecasts with the engine the parent would use
+    try:
+        install_model_engine(warm_up=True)
+    except OSError:
+        pass
+
+def scenario_pool(workers=DEFAULT_WORKERS):
+    """A process pool for run_scenario; spawned, so it is safe from Streamlit's threads"""
+    return ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'),
+                               initializer=_init_worker)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _shared_pool(renew=False):
+    # One pool per process, shared by every session and started on first use
+    global _pool
+    with _pool_lock:
+        if _pool is None or renew:
+            if _pool is not None:
+                _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = scenario_pool()
+        return _pool
+
+def _plan_shards(n_districts, n_dates, workers):
+    """(district slice, date slice) pairs covering the grid, about SHARDS_PER_WORKER per worker"""
+    wanted = workers * SHARDS_PER_WORKER
+    days = max(1, min(MAX_SHARD_DAYS, math.ceil(n_dates / wanted)))
+    date_slices = [slice(t, min(t + days, n_dates)) for t in range(0, n_dates, days)]
+    # Short horizons split the districts too
+    groups = max(1, min(n_districts, math.ceil(wanted / len(date_slices))))
+    size = math.ceil(n_districts / groups)
+    district_slices = [slice(d, min(d + size, n_districts)) for d in range(0, n_districts, size)]
+    return [(rows, cols) for cols in date_slices for rows in district_slices]
+
+def _run_shard(name, shape, fields, q, districts, dates, members, rows, cols, version):
+    """Summarise one shard's ensemble, with model `version`, into rows x cols of the shared block"""
+    if model_version() != version:
+        # The registry's active model changed since the pool started
+        from registry import reload_model
+        reload_model(version)
+    summary = ensemble_forecast(districts, dates, members, cache=False).summary(q)
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        out = np.ndarray(shape, dtype=np.float64, buffer=block.buf)
+        for i, field in enumerate(fields):
+            out[i, rows, cols] = summary[field]
+        del out  # the buffer can't close while a view of it exists
+    finally:
+        block.close()
+    return len(districts) * len(dates) * members
+
+def _release(block):
+    block.close()
+    try:
+        block.unlink()
+    except FileNotFoundError:
+        pass
+
+class ScenarioRun:
+    """A scenario in progress; poll progress(), cancel() it or wait for result()"""
+
+    def __init__(self, districts, dates, members, q, fields, block):
+        self.districts = districts
+        self.dates = dates
+        self.members = members
+        self.q = q
+        self.fields = fields
+        self.shape = (len(fields), len(districts), len(dates))
+        self.total_cells = len(districts) * len(dates) * members
+        self.started = time.perf_counter()
+        self.finished = None
+        self.error = None
+        self._block = block
+        self._futures = []
+        self._done_cells = 0
+        self._cancelled = False
+        self._result = None
+        self._lock = threading.Lock()
+        # Unlinked by result(), cancel() or, failing those, garbage collection
+        self._finalizer = weakref.finalize(self, _release, block)
+
+    def _shard_done(self, future):
+        with self._lock:
+            if not future.cancelled():
+                if future.exception() is not None:
+                    self.error = self.error or future.exception()
+                else:
+                    self._done_cells += future.result()
+            if self.finished is None and all(f.done() for f in self._futures):
+                self.finished = time.perf_counter()
+
+    def progress(self):
+        """Fraction of the member cells computed, 0-1"""
+        return self._done_cells / self.total_cells if self.total_cells else 1.0
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def cells_per_second(self):
+        return self._done_cells / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def status(self):
+        if self._cancelled:
+            return 'cancelled'
+        if self.error is not None:
+            return 'failed'
+        return 'done' if self.done() else 'running'
+
+    def done(self):
+        return all(f.done() for f in self._futures)
+
+    def wait(self, timeout=None):
+        """Block until every shard has finished or `timeout` seconds pass; returns done()"""
+        wait(self._futures, timeout)
+        return self.done()
+
+    def cancel(self):
+        """Drop the shards not yet started and free the block; running shards finish unused"""
+        self._cancelled = True
+        for future in self._futures:
+            future.cancel()
+        self._finalizer()
+
+    def result(self):
+        """Field -> (districts, dates) array, once every shard is in"""
+        if self._result is None:
+            self.wait()
+            if self._cancelled:
+                raise CancelledError("The scenario run was cancelled")
+            if self.error is not None:
+                self._finalizer()
+                raise self.error
+            view = np.ndarray(self.shape, dtype=np.float64, buffer=self._block.buf)
+            values = np.array(view)
+            del view
+            self._finalizer()
+            self._result = dict(zip(self.fields, values))
+        return self._result
+
+    def frame(self):
+        """One row per (district, date), districts outermost, with the columns of Ensemble.frame()"""
+        columns = {'district': np.repeat(self.districts, len(self.dates)),
+                   'date': np.tile(self.dates, len(self.districts))}
+        columns.update((field, values.ravel()) for field, values in self.result().items())
+        columns['confidence'] = columns['confidence'].astype(int)
+        columns['members'] = self.members
+        return pd.DataFrame(columns)
+
+def run_scenario(districts, dates, members=DEFAULT_MEMBERS, q=(10, 50, 90), executor=None, workers=None):
+    """Start an ensemble scenario over districts x dates; returns a ScenarioRun at once.
+
+    The grid is split into shards of whole district groups x date chunks,
+    each summarised by a worker of `executor` (default: the process-wide
+    pool of DEFAULT_WORKERS) into a shared-memory block; `workers` is the
+    size of `executor`, for planning the shards. Results match
+    ensemble_forecast(districts, dates, members).summary(q) exactly,
+    whatever the sharding, since members are drawn from keyed streams.
+    Every shard uses the model version serving here when the run starts.
+    """
+    districts = list(districts)
+    unknown = [d for d in districts if d not in sri_lanka_districts]
+    if unknown:
+        raise ValueError(f"Unknown districts: {', '.join(unknown)}")
+    if not 1 <= members <= MAX_MEMBERS:
+        raise ValueError(f"members must be between 1 and {MAX_MEMBERS}")
+    dates = [t.strftime("%Y-%m-%d") for t in pd.DatetimeIndex(pd.to_datetime(list(dates))).normalize()]
+    q = tuple(q)
+    fields = summary_fields(q, EXCEEDANCE)
+    shape = (len(fields), len(districts), len(dates))
+    version = model_version()
+    block = shared_memory.SharedMemory(create=True, size=max(1, math.prod(shape) * 8))
+    run = ScenarioRun(districts, dates, members, q, fields, block)
+    telemetry.count('scenario_cells', run.total_cells)
+
+    pool = executor or _shared_pool()
+    shards = _plan_shards(len(districts), len(dates), workers or DEFAULT_WORKERS)
+    for rows, cols in shards:
+        args = (block.name, shape, fields, q, districts[rows], dates[cols], members, rows, cols, version)
+        try:
+            future = pool.submit(_run_shard, *args)
+        except BrokenProcessPool:
+            # A worker died in an earlier run; start a fresh shared pool
+            if executor is not None:
+                raise
+            pool = _shared_pool(renew=True)
+            future = pool.submit(_run_shard, *args)
+        run._futures.append(future)
+    for future in run._futures:
+        future.add_done_callback(run._shard_done)
+    return run
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run an island ensemble scenario across worker processes")
+    parser.add_argument('--districts', default='', help="Comma-separated districts (default: all 25)")
+    parser.add_argument('--start', default=datetime.now().strftime("%Y-%m-%d"),
+                        help="First date, YYYY-MM-DD (default: today)")
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--members', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('-o', '--output', help="CSV file for the summary (default: none)")
+    args = parser.parse_args(argv)
+
+    districts = [d.strip() for d in args.districts.split(',') if d.strip()] or list(sri_lanka_districts)
+    dates = pd.date_range(args.start, periods=args.days, freq='D')
+    try:
+        # Sets the run's model version; only the workers load the model
+        install_model_engine()
+    except OSError:
+        pass
+    with scenario_pool(args.workers) as pool:
+        try:
+            run = run_scenario(districts, dates, args.members, executor=pool, workers=args.workers)
+        except ValueError as e:
+            parser.error(str(e))
+        while not run.wait(timeout=1.0):
+            print(f"\r{run.progress():6.1%}", end='', file=sys.stderr, flush=True)
+        frame = run.frame()
+    print(f"\r{len(districts)} districts x {args.days} days x {args.members} members in {run.elapsed:.1f} s "
+          f"({run.cells_per_second:,.0f} member cells/s, {args.workers} workers)", file=sys.stderr)
+    if args.output:
+        frame.to_csv(args.output, index=False)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+# scheduler.py
+# Background forecast precomputation. A daemon thread keeps the next days of
+# every district's forecasts in forecast_cache and the island snapshots, so
+# page reruns read them instead of computing on the critical path.
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from forecast import forecast_cache, on_engine_change, precompute_forecasts
+from telemetry import telemetry
+
+logger = logging.getLogger(__name__)
+
+# Days precomputed from today: the dashboard's today, the 7-day tab, the
+# 14-day timeline and single predictions up to 30 days ahead.
+# WEATHER_PRECOMPUTE_DAYS=0 turns it off.
+PRECOMPUTE_DAYS = int(os.environ.get("WEATHER_PRECOMPUTE_DAYS", 31))
+
+# Daily full run, local time
+PRECOMPUTE_AT = os.environ.get("WEATHER_PRECOMPUTE_AT", "05:00")
+
+# Seconds before forecast_cache's ttl runs out that the entries are renewed
+REFRESH_MARGIN = 300
+
+# Seconds after midnight for the run of the new day; every entry of the
+# previous day expires at midnight
+MIDNIGHT_DELAY = 1
+
+# Seconds before a failed run is tried again
+RETRY_DELAY = 60
+
+def _parse_time(text):
+    try:
+        return datetime.strptime(text, "%H:%M").time()
+    except ValueError:
+        raise ValueError(f"Precompute time must be HH:MM, not {text!r}") from None
+
+class PrecomputeScheduler:
+    """Daemon thread precomputing the next `days` days of every district's forecasts.
+
+    It runs when started, daily at `at` (HH:MM), just after midnight,
+    shortly before the precomputed entries would expire from
+    forecast_cache and whenever a model engine is installed. Tasks added
+    with add_task() run after the forecasts. status() reports the job's
+    state and its last run.
+    """
+
+    def __init__(self, days=PRECOMPUTE_DAYS, at=PRECOMPUTE_AT):
+        self.days = days
+        self.at = _parse_time(at)
+        self.state = 'stopped'
+        self.runs = 0
+        self.last_run = None
+        self.last_reason = None
+        self.last_duration_ms = None
+        self.last_forecasts = 0
+        self.last_error = None
+        self.next_run = None
+        self.next_reason = None
+        self.tasks = []
+        self._made = None
+        self._pending = None
+        self._stopping = False
+        self._thread = None
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the thread, which runs at once; no-op when already running or days is 0"""
+        with self._lock:
+            if self.days < 1 or (self._thread is not None and self._thread.is_alive()):
+                return self
+            self._stopping = False
+            self._pending = 'startup'
+            self.state = 'idle'
+            self._thread = threading.Thread(target=self._loop, name='forecast-precompute', daemon=True)
+            self._thread.start()
+        on_engine_change(self._engine_changed)
+        return self
+
+    def add_task(self, task):
+        """Also call task(dates) in every run, after the forecasts for `dates` are in"""
+        if task not in self.tasks:
+            self.tasks.append(task)
+        return self
+
+    def stop(self, timeout=None):
+        """Stop the thread after the run in progress, if any"""
+        self._stopping = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.state = 'stopped'
+
+    def trigger(self, reason='manual'):
+        """Run as soon as the thread is free"""
+        with self._lock:
+            self._pending = reason
+        self._wake.set()
+
+    def _engine_changed(self, engine):
+        # New engine, new model_version(): none of the cached keys match any more
+        self.trigger('model reload')
+
+    def schedule(self, now):
+        """(when, reason) of the next scheduled run after `now`"""
+        daily = datetime.combine(now.date(), self.at)
+        if daily <= now:
+            daily += timedelta(days=1)
+        midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+        candidates = [(daily, 'daily'), (midnight + timedelta(seconds=MIDNIGHT_DELAY), 'midnight')]
+        if self.last_error is not None:
+            candidates.append((self.last_run + timedelta(seconds=RETRY_DELAY), 'retry'))
+        elif self._made is not None:
+            candidates.append((self._made + timedelta(seconds=forecast_cache.ttl - REFRESH_MARGIN), 'expiry'))
+        return min(candidates)
+
+    def _loop(self):
+        while not self._stopping:
+            with self._lock:
+                reason, self._pending = self._pending, None
+            if reason is None:
+                now = datetime.now()
+                self.next_run, self.next_reason = self.schedule(now)
+                if self._wake.wait(max((self.next_run - now).total_seconds(), 0)):
+                    # Triggered or stopping
+                    self._wake.clear()
+                    continue
+                reason = self.next_reason
+            self.run_once(reason)
+
+    def run_once(self, reason='manual'):
+        """Precompute the next `days` days now, in the calling thread"""
+        self.state = 'running'
+        self.last_reason = reason
+        self.last_run = datetime.now()
+        start = time.perf_counter()
+        try:
+            with telemetry.span('precompute'):
+                dates = pd.date_range(self.last_run.date(), periods=self.days, freq='D')
+                self.last_forecasts = precompute_forecasts(dates)
+                for task in list(self.tasks):
+                    task(dates)
+            self._made = self.last_run
+            self.last_error = None
+        except Exception as e:
+            logger.exception("Forecast precompute (%s) failed", reason)
+            self.last_error = f"{type(e).__name__}: {e}"
+        finally:
+            self.last_duration_ms = (time.perf_counter() - start) * 1000
+            self.runs += 1
+            self.state = 'stopped' if self._stopping else 'idle'
+
+    def status(self):
+        """State, last run and next run of the job, JSON-friendly"""
+        iso = lambda t: t.isoformat(timespec='seconds') if t is not None else None
+        return {
+            'state': self.state,
+            'days': self.days,
+            'at': self.at.strftime("%H:%M"),
+            'runs': self.runs,
+            'last_run': iso(self.last_run),
+            'last_reason': self.last_reason,
+            'last_duration_ms': round(self.last_duration_ms, 1) if self.last_duration_ms is not None else None,
+            'last_forecasts': self.last_forecasts,
+            'last_error': self.last_error,
+            'next_run': iso(self.next_run) if self.state == 'idle' else None,
+            'next_reason': self.next_reason if self.state == 'idle' else None
+        }
+
+# One per process, started by the app and the API
+precompute_scheduler = PrecomputeScheduler()
+telemetry.gauge('precompute_last_duration_ms', lambda: precompute_scheduler.last_duration_ms or 0)
@@ -0,0 +1,162 @@
+# telemetry.py
+# Timing spans and counters for the hot paths, per rerun and per process.
+# Exposed in Prometheus text format (api.py's /metrics, WEATHER_METRICS_FILE)
+# and in the app's debug panel.
+import contextvars
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+class RerunReport:
+    """Spans and counters recorded while one script run (or request) was active"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.seconds = None
+        # name -> [calls, total seconds, max seconds]
+        self.spans = {}
+        self.counters = {}
+
+    def rows(self):
+        """Spans as dicts, slowest total first"""
+        rows = [{'span': name, 'calls': calls, 'total_ms': total * 1000, 'max_ms': longest * 1000}
+                for name, (calls, total, longest) in self.spans.items()]
+        return sorted(rows, key=lambda row: row['total_ms'], reverse=True)
+
+def _add(spans, name, seconds):
+    entry = spans.get(name)
+    if entry is None:
+        spans[name] = [1, seconds, seconds]
+    else:
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] = max(entry[2], seconds)
+
+class Telemetry:
+    """Thread-safe registry of span timings, counters and gauges.
+
+    Spans and counters go into the process totals and, while rerun() is
+    active in the calling thread, into that rerun's RerunReport. Gauges
+    are callables read when the metrics are exported.
+    """
+
+    def __init__(self, prefix='weather'):
+        self.prefix = prefix
+        self.spans = {}
+        self.counters = {}
+        self.last_rerun = None
+        self._gauges = {}
+        self._lock = threading.Lock()
+        self._current = contextvars.ContextVar('telemetry_rerun', default=None)
+
+    def record(self, name, seconds):
+        """Add one call of `seconds` to span `name`"""
+        with self._lock:
+            _add(self.spans, name, seconds)
+        report = self._current.get()
+        if report is not None:
+            _add(report.spans, name, seconds)
+
+    def count(self, name, n=1):
+        """Add `n` to counter `name`"""
+        if not n:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+        report = self._current.get()
+        if report is not None:
+            report.counters[name] = report.counters.get(name, 0) + n
+
+    def gauge(self, name, read):
+        """Export read() as gauge `name`"""
+        self._gauges[name] = read
+
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def timed(self, fn=None, name=None):
+        """Decorator recording each call of a function as a span (default: its name)"""
+        if fn is None:
+            return lambda f: self.timed(f, name)
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.record(label, time.perf_counter() - start)
+        return wrapper
+
+    @contextmanager
+    def rerun(self):
+        """Collect a RerunReport for the code run inside; it becomes last_rerun"""
+        report = RerunReport()
+        token = self._current.set(report)
+        try:
+            yield report
+        finally:
+            self._current.reset(token)
+            report.seconds = time.perf_counter() - report.started
+            self.record('rerun', report.seconds)
+            with self._lock:
+                self.last_rerun = report
+
+    def prometheus_text(self):
+        """Every span, counter and gauge in the Prometheus text exposition format"""
+        p = self.prefix
+        with self._lock:
+            spans = {name: list(entry) for name, entry in self.spans.items()}
+            counters = dict(self.counters)
+        lines = [
+            f'# HELP {p}_span_seconds Time spent in instrumented code',
+            f'# TYPE {p}_span_seconds summary'
+        ]
+        for name, (calls, total, _) in sorted(spans.items()):
+            lines.append(f'{p}_span_seconds_count{{span="{name}"}} {calls}')
+            lines.append(f'{p}_span_seconds_sum{{span="{name}"}} {total:.6f}')
+        lines += [
+            f'# HELP {p}_span_max_seconds Slowest single call of each span',
+            f'# TYPE {p}_span_max_seconds gauge'
+        ]
+        for name, (_, _, longest) in sorted(spans.items()):
+            lines.append(f'{p}_span_max_seconds{{span="{name}"}} {longest:.6f}')
+        for name, value in sorted(counters.items()):
+            lines.append(f'# TYPE {p}_{name}_total counter')
+            lines.append(f'{p}_{name}_total {value}')
+        for name, read in sorted(self._gauges.items()):
+            try:
+                value = float(read())
+            except Exception:
+                continue
+            lines.append(f'# TYPE {p}_{name} gauge')
+            lines.append(f'{p}_{name} {value:g}')
+        return '\n'.join(lines) + '\n'
+
+    def dump(self, path):
+        """Write prometheus_text() to `path`, replacing it atomically"""
+        partial = f'{path}.{os.getpid()}.tmp'
+        with open(partial, 'w') as f:
+            f.write(self.prometheus_text())
+        os.replace(partial, path)
+
+    def reset(self):
+        """Forget all spans and counters; gauges stay registered"""
+        with self._lock:
+            self.spans.clear()
+            self.counters.clear()
+            self.last_rerun = None
+
+# Shared by every session of the process
+telemetry = Telemetry()
+span = telemetry.span
+timed = telemetry.timed
+count = telemetry.count
@@ -0,0 +1,101 @@
+# tests/test_api.py
+# Request validation of the WSGI app: malformed input must come back as a
+# 400 with a message, never as a 500.
+import io
+import json
+from urllib.parse import urlencode
+
+import pytest
+
+import api
+import forecast
+
+@pytest.fixture(autouse=True)
+def mock_mode():
+    previous = forecast.current_model_engine()
+    forecast.use_model_engine(None)
+    forecast.forecast_cache.clear()
+    yield
+    forecast.use_model_engine(previous)
+    forecast.forecast_cache.clear()
+
+def request(method, path, params=None, body=None, content_length=None):
+    """(status code, decoded body) of one call to api.app"""
+    data = b'' if body is None else json.dumps(body).encode('utf-8')
+    environ = {
+        'REQUEST_METHOD': method,
+        'PATH_INFO': path,
+        'QUERY_STRING': urlencode(params or {}, doseq=True),
+        'CONTENT_LENGTH': str(len(data)) if content_length is None else content_length,
+        'wsgi.input': io.BytesIO(data)
+    }
+    status = []
+    chunks = api.app(environ, lambda code, headers: status.append(code))
+    payload = b''.join(chunks).decode('utf-8')
+    code = int(status[0].split()[0])
+    return code, json.loads(payload) if payload.startswith('{') else payload
+
+def test_forecast():
+    code, payload = request('GET', '/forecast', {'district': 'Colombo', 'date': '2024-06-01'})
+    assert code == 200
+    assert (payload['district'], payload['date']) == ('Colombo', '2024-06-01')
+
+@pytest.mark.parametrize('date', ['0001-01-01', '0999-12-31', '1677-09-22', '2262-04-11', '9999-12-31',
+                                  'not-a-date', 'NaT'])
+def test_forecast_rejects_dates_out_of_range(date):
+    code, payload = request('GET', '/forecast', {'district': 'Colombo', 'date': date})
+    assert code == 400, payload
+    assert 'error' in payload
+
+def test_range_running_past_the_last_date_is_rejected():
+    code, _ = request('GET', '/forecast/batch', {'districts': 'Colombo', 'start': '2200-12-01', 'days': '60'})
+    assert code == 400
+
+def test_post_accepts_strings_as_one_value():
+    code, payload = request('POST', '/forecast/batch',
+                            body={'districts': 'Colombo', 'dates': '2024-06-01'})
+    assert code == 200
+    assert [(r['district'], r['date']) for r in payload['forecasts']] == [('Colombo', '2024-06-01')]
+
+def test_post_strings_split_on_commas_like_the_query():
+    _, posted = request('POST', '/forecast/batch', body={'districts': 'Colombo,Jaffna', 'dates': ['2024-06-01']})
+    _, queried = request('GET', '/forecast/batch', {'districts': 'Colombo,Jaffna', 'dates': '2024-06-01'})
+    assert posted == queried
+    assert len(posted['forecasts']) == 2
+
+@pytest.mark.parametrize('body', [{'districts': 5}, {'districts': {'Colombo': 1}}, {'dates': 20240601},
+                                  {'dates': None}])
+def test_post_rejects_fields_that_are_not_lists(body):
+    code, payload = request('POST', '/forecast/batch', body=body)
+    assert code == 400, payload
+
+@pytest.mark.parametrize('days', [2.7, True, '2.7', 'two', 0, -1, api.MAX_BATCH_CELLS + 1, None, [2]])
+def test_post_rejects_bad_days(days):
+    code, payload = request('POST', '/forecast/batch',
+                            body={'districts': ['Colombo'], 'start': '2024-06-01', 'days': days})
+    # None means the field was left out, which is one day
+    assert code == (200 if days is None else 400), payload
+
+@pytest.mark.parametrize('days', [2, 2.0, '2'])
+def test_post_accepts_whole_days(days):
+    code, payload = request('POST', '/forecast/batch',
+                            body={'districts': ['Colombo'], 'start': '2024-06-01', 'days': days})
+    assert code == 200
+    assert [r['date'] for r in payload['forecasts']] == ['2024-06-01', '2024-06-02']
+
+@pytest.mark.parametrize('params', [{'start': '2024-06-01', 'end': '0001-01-01'},
+                                    {'start': '0001-01-01', 'days': '2'},
+                                    {'start': '2024-06-01', 'days': '2.7'}])
+def test_export_rejects_bad_ranges(params):
+    code, payload = request('GET', '/forecast/export', dict(params, districts='Colombo'))
+    assert code == 400, payload
+
+@pytest.mark.parametrize('length', ['-1', 'abc'])
+def test_bad_content_length(length):
+    code, _ = request('POST', '/forecast/batch', body={'districts': ['Colombo']}, content_length=length)
+    assert code == 400
+
+def test_body_must_be_an_object():
+    code, payload = request('POST', '/forecast/batch', body=['Colombo'])
+    assert code == 400
+    assert payload['error'] == 'Request body must be a JSON object'
@@ -0,0 +1,209 @@
+# tests/test_cache.py
+# ForecastCache on a fake clock: LRU order, the TTL, the midnight rollover,
+# and forecasts of a replaced model never being served. Also island
+# snapshots computed from several threads at once.
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+import forecast
+from forecast import ForecastCache
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, **delta):
+        self.now += timedelta(**delta)
+
+class FakeEngine:
+    """Model engine forecasting the same values everywhere"""
+
+    def __init__(self, version, temperature):
+        self.version = version
+        self.temperature = temperature
+        self.available = True
+        self.calls = 0
+
+    def during_predict(self):
+        pass
+
+    def supports(self, district):
+        return True
+
+    def predict(self, districts, dates):
+        self.calls += 1
+        self.during_predict()
+        outputs = np.empty((len(districts), len(dates), 3))
+        outputs[...] = (self.temperature, 12.0, 18.0)
+        return outputs
+
+NOON = datetime(2024, 6, 1, 12, 0)
+
+@pytest.fixture
+def clock():
+    return FakeClock(NOON)
+
+def prediction(value):
+    return {'district': 'Colombo', 'date': '2024-06-02', 'temperature': value}
+
+def test_hit_returns_a_copy(clock):
+    cache = ForecastCache(clock=clock)
+    cache.put('a', prediction(30.0), clock())
+    hit = cache.get('a')
+    hit['temperature'] = 0.0
+    assert cache.get('a')['temperature'] == 30.0
+    assert cache.stats()['hits'] == 2
+
+def test_least_recently_used_is_evicted_first(clock):
+    cache = ForecastCache(maxsize=3, clock=clock)
+    for key in 'abc':
+        cache.put(key, prediction(1.0), clock())
+    cache.get('a')  # b is now the least recently used
+    cache.put('d', prediction(1.0), clock())
+    assert cache.get('b') is None
+    assert all(cache.get(key) is not None for key in 'acd')
+
+def test_storing_again_counts_as_use(clock):
+    cache = ForecastCache(maxsize=3, clock=clock)
+    for key in 'abc':
+        cache.put(key, prediction(1.0), clock())
+    cache.put_many(['a'], [prediction(2.0)], clock())
+    cache.put('d', prediction(1.0), clock())
+    assert [key for key in 'abcd' if cache.get(key) is not None] == ['a', 'c', 'd']
+    assert cache.get('a')['temperature'] == 2.0
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = ForecastCache(ttl=600, clock=clock)
+    cache.put('a', prediction(1.0), clock())
+    clock.advance(seconds=600)
+    assert cache.get('a') is not None
+    clock.advance(microseconds=1)
+    assert cache.get('a') is None
+    assert cache.stats()['size'] == 0
+
+def test_ttl_runs_from_when_the_forecast_was_made(clock):
+    cache = ForecastCache(ttl=600, clock=clock)
+    cache.put('a', prediction(1.0), clock() - timedelta(seconds=601))
+    assert cache.get('a') is None
+
+def test_entries_expire_at_midnight(clock):
+    clock.now = datetime(2024, 6, 1, 23, 59, 30)
+    cache = ForecastCache(ttl=3600, clock=clock)
+    cache.put('a', prediction(1.0), clock())
+    cache.put('b', prediction(1.0), clock())
+    assert cache.get_many(['a', 'b']) == [prediction(1.0)] * 2
+    clock.advance(seconds=31)
+    assert cache.get_many(['a', 'b']) == [None, None]
+
+def test_get_many_reads_the_clock_once(clock):
+    calls = []
+    cache = ForecastCache(clock=lambda: calls.append(1) or clock())
+    cache.put_many('ab', [prediction(1.0), prediction(2.0)], clock())
+    assert [p['temperature'] for p in cache.get_many('ab')] == [1.0, 2.0]
+    assert len(calls) == 1
+
+def test_discard_version_keeps_other_versions(clock):
+    cache = ForecastCache(clock=clock)
+    cache.put(('Colombo', '2024-06-02', 'v1'), prediction(1.0), clock())
+    cache.put(('Colombo', '2024-06-03', 'v1'), prediction(1.0), clock())
+    cache.put(('Colombo', '2024-06-02', 'v2'), prediction(2.0), clock())
+    assert cache.discard_version('v1') == 2
+    assert cache.get(('Colombo', '2024-06-02', 'v1')) is None
+    assert cache.get(('Colombo', '2024-06-02', 'v2'))['temperature'] == 2.0
+
+@pytest.fixture
+def engines():
+    previous = forecast.current_model_engine()
+    forecast.forecast_cache.clear()
+    forecast.clear_snapshots()
+    yield FakeEngine('fake-1', 31.0), FakeEngine('fake-2', 24.0)
+    forecast.use_model_engine(previous)
+    forecast.forecast_cache.clear()
+    forecast.clear_snapshots()
+
+def test_a_new_model_version_misses(engines):
+    old, new = engines
+    forecast.use_model_engine(old)
+    assert forecast.predict_weather('Colombo', '2024-06-02')['temperature'] == 31.0
+    assert forecast.predict_weather('Colombo', '2024-06-02')['temperature'] == 31.0
+    assert old.calls == 1
+
+    forecast.use_model_engine(new)
+    misses = forecast.forecast_cache.stats()['misses']
+    assert forecast.predict_weather('Colombo', '2024-06-02')['temperature'] == 24.0
+    assert forecast.forecast_cache.stats()['misses'] == misses + 1
+    assert new.calls == 1
+
+def test_batches_miss_after_a_version_change(engines):
+    old, new = engines
+    forecast.use_model_engine(old)
+    forecast.predict_weather_batch(['Colombo', 'Jaffna'], ['2024-06-02'])
+    forecast.use_model_engine(new)
+    df = forecast.predict_weather_batch(['Colombo', 'Jaffna'], ['2024-06-02'])
+    assert df['temperature'].tolist() == [24.0, 24.0]
+    assert new.calls == 1
+
+def test_forget_model_version_drops_the_old_entries(engines):
+    old, new = engines
+    forecast.use_model_engine(old)
+    forecast.predict_weather('Colombo', '2024-06-02')
+    forecast.use_model_engine(new)
+    forecast.predict_weather('Colombo', '2024-06-02')
+    assert forecast.forget_model_version('fake-1') == 1
+    keys = list(forecast.forecast_cache._entries)
+    assert keys == [('Colombo', '2024-06-02', 'fake-2')]
+
+def run_together(*calls):
+    """Run each call on its own thread; returns their results in order"""
+    results = [None] * len(calls)
+
+    def run(i):
+        results[i] = calls[i]()
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(calls))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+def test_a_snapshot_is_computed_once(engines):
+    engine, _ = engines
+    started = threading.Event()
+    release = threading.Event()
+    engine.during_predict = lambda: started.set() or release.wait(5)
+    forecast.use_model_engine(engine)
+
+    def late_release():
+        started.wait(5)
+        release.set()
+
+    snapshots = run_together(*[lambda: forecast.island_snapshot('2024-06-02')] * 4, late_release)[:4]
+    assert engine.calls == 1
+    assert all(snapshot is snapshots[0] for snapshot in snapshots)
+    assert forecast._computing == {}
+
+def test_snapshots_of_other_dates_compute_alongside(engines):
+    engine, _ = engines
+    # Only passes once both dates are being forecast at the same time
+    both = threading.Barrier(2, timeout=5)
+    engine.during_predict = both.wait
+    forecast.use_model_engine(engine)
+    snapshots = run_together(lambda: forecast.island_snapshot('2024-06-02'),
+                             lambda: forecast.island_snapshot('2024-06-03'))
+    assert [snapshot.date for snapshot in snapshots] == ['2024-06-02', '2024-06-03']
+    assert engine.calls == 2
+
+def test_a_snapshot_finished_after_a_reload_is_not_stored(engines):
+    old, new = engines
+    old.during_predict = lambda: forecast.use_model_engine(new)
+    forecast.use_model_engine(old)
+    assert forecast.island_snapshot('2024-06-02').frame(['Colombo'])['temperature'].tolist() == [31.0]
+    assert list(forecast._snapshots) == []
+    assert forecast.island_snapshot('2024-06-02').frame(['Colombo'])['temperature'].tolist() == [24.0]
@@ -0,0 +1,139 @@
+# tests/test_features.py
+# FeatureStore against building the features of the whole history at once:
+# seeded, then appended to day by day past its capacity.
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from features import OBSERVATION_COLUMNS, DistrictCodes, FeatureStore, build_features, feature_windows
+
+DISTRICTS = ['Ampara', 'Colombo', 'Jaffna']
+# Across a year end, so the day-of-year terms wrap too
+DATES = pd.date_range('2023-12-10', periods=50, freq='D')
+SEED_DAYS = 10
+CAPACITY = 32
+WINDOW = 7
+
+@pytest.fixture(scope='module')
+def encoder():
+    return DistrictCodes(DISTRICTS)
+
+@pytest.fixture(scope='module')
+def observations():
+    """Long frame, one row per district and day"""
+    rng = np.random.default_rng(0)
+    frames = []
+    for district in DISTRICTS:
+        frame = pd.DataFrame(rng.uniform(0, 40, (len(DATES), len(OBSERVATION_COLUMNS))),
+                             columns=OBSERVATION_COLUMNS)
+        frame.insert(0, 'date', DATES)
+        frame.insert(0, 'district', district)
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+def blocks(observations, encoder):
+    """(districts, days, ...) observations and features, rows in encoder order"""
+    features = build_features(observations, encoder)
+    shape = (len(DISTRICTS), len(DATES), -1)
+    return observations[OBSERVATION_COLUMNS].to_numpy().reshape(shape), features.to_numpy().reshape(shape)
+
+@pytest.fixture
+def store(observations, encoder):
+    """Seeded with SEED_DAYS, then every later day appended"""
+    obs, feats = blocks(observations, encoder)
+    store = FeatureStore(encoder, capacity=CAPACITY)
+    store.seed(DATES[SEED_DAYS - 1], obs[:, :SEED_DAYS], feats[:, :SEED_DAYS])
+    for row, district in enumerate(DISTRICTS):
+        store.extend(district, DATES[SEED_DAYS:], obs[row, SEED_DAYS:])
+    return store
+
+# The last is the oldest window still held, which spans the year end
+@pytest.mark.parametrize('last', [len(DATES) - 1, len(DATES) - 2, 30, len(DATES) - CAPACITY + WINDOW - 1])
+def test_windows_match_the_batch_features(store, observations, encoder, last):
+    _, feats = blocks(observations, encoder)
+    expected = feature_windows(feats, [last + 1], WINDOW)
+    np.testing.assert_allclose(store.windows(DISTRICTS, DATES[last], WINDOW), expected, rtol=1e-12)
+
+def test_windows_follow_the_requested_district_order(store, observations, encoder):
+    _, feats = blocks(observations, encoder)
+    order = [2, 0]
+    expected = feature_windows(feats[order], [len(DATES)], WINDOW)
+    np.testing.assert_allclose(store.windows(['Jaffna', 'Ampara'], DATES[-1], WINDOW), expected, rtol=1e-12)
+
+def test_appending_from_empty_matches_the_batch_features(observations, encoder):
+    # No seed: the first rows' lags and rolling mean are NaN, as in build_features
+    obs, feats = blocks(observations, encoder)
+    store = FeatureStore(encoder, capacity=CAPACITY)
+    for row, district in enumerate(DISTRICTS):
+        store.extend(district, DATES[:WINDOW], obs[row, :WINDOW])
+    np.testing.assert_allclose(store.windows(DISTRICTS, DATES[WINDOW - 1], WINDOW), feats[:, :WINDOW], rtol=1e-12)
+
+def test_covers(store):
+    last = DATES[-1]
+    assert store.covers(DISTRICTS, last, CAPACITY)
+    assert store.covers(DISTRICTS, DATES[-CAPACITY], 1)
+    assert not store.covers(DISTRICTS, last, CAPACITY + 1)
+    # Evicted from the ring, and not observed yet
+    assert not store.covers(DISTRICTS, DATES[-CAPACITY - 1], 1)
+    assert not store.covers(DISTRICTS, last + pd.Timedelta(days=1), 1)
+    assert not store.covers(['Colombo', 'Kandy'], last, 1)
+
+def test_covers_needs_every_district(observations, encoder):
+    obs, _ = blocks(observations, encoder)
+    store = FeatureStore(encoder, capacity=CAPACITY)
+    store.extend('Colombo', DATES[:5], obs[1, :5])
+    assert store.covers(['Colombo'], DATES[4], 5)
+    assert not store.covers(['Colombo', 'Jaffna'], DATES[4], 1)
+    with pytest.raises(ValueError):
+        store.windows(['Colombo', 'Jaffna'], DATES[4], 1)
+
+def test_append_rejects_gaps(store):
+    with pytest.raises(ValueError, match='expected the observation'):
+        store.append('Colombo', DATES[-1] + pd.Timedelta(days=2), np.zeros(len(OBSERVATION_COLUMNS)))
+    with pytest.raises(ValueError):
+        store.append('Colombo', DATES[-1], np.zeros(len(OBSERVATION_COLUMNS)))
+
+def test_seed_checks_its_shape(encoder):
+    store = FeatureStore(encoder, capacity=CAPACITY)
+    with pytest.raises(ValueError):
+        store.seed(DATES[0], np.zeros((2, 5, 5)), np.zeros((2, 5, 11)))
+    with pytest.raises(ValueError):
+        store.seed(DATES[0], np.zeros((3, CAPACITY + 1, 5)), np.zeros((3, CAPACITY + 1, 11)))
+
+@pytest.mark.parametrize('to_file', [False, True])
+def test_save_load_round_trip(store, encoder, tmp_path, to_file):
+    if to_file:
+        target = tmp_path / 'features.npz'
+        store.save(target)
+    else:
+        target = io.BytesIO()
+        store.save(target)
+        target.seek(0)
+    restored = FeatureStore.load(target, encoder)
+    assert restored.districts == store.districts
+    assert restored.feature_columns == store.feature_columns
+    assert restored.capacity == store.capacity
+    for name in ('observations', 'features', 'head', 'count', 'last_date'):
+        np.testing.assert_array_equal(getattr(restored, name), getattr(store, name))
+    np.testing.assert_array_equal(restored.windows(DISTRICTS, DATES[-1], WINDOW),
+                                  store.windows(DISTRICTS, DATES[-1], WINDOW))
+
+def test_restored_store_keeps_appending(store, observations, encoder):
+    snapshot = io.BytesIO()
+    store.save(snapshot)
+    snapshot.seek(0)
+    restored = FeatureStore.load(snapshot, encoder)
+    day = DATES[-1] + pd.Timedelta(days=1)
+    values = np.array([30.0, 80.0, 1.0, 2.0, 15.0])
+    for s in (store, restored):
+        s.append('Colombo', day, values)
+    np.testing.assert_array_equal(restored.windows(['Colombo'], day, WINDOW), store.windows(['Colombo'], day, WINDOW))
+
+def test_load_rejects_another_encoder(store):
+    snapshot = io.BytesIO()
+    store.save(snapshot)
+    snapshot.seek(0)
+    with pytest.raises(ValueError):
+        FeatureStore.load(snapshot, DistrictCodes(['Colombo', 'Galle', 'Jaffna']))
@@ -0,0 +1,65 @@
+# tests/test_forecast.py
+# Pinned outputs of the keyed random stream and the mock generator, which
+# must be the same in every process, thread and restart.
+import os
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+import forecast
+from forecast import forecast_key, keyed_normal, keyed_uniform, predict_weather, predict_weather_batch
+
+# (district, date) -> (temperature, rainfall, windspeed, confidence) of the mock generator
+PINNED = {
+    ('Colombo', '2024-06-01'): (30.5, 31.9, 19.8, 85),
+    ('Jaffna', '2024-01-15'): (30.6, 18.3, 17.7, 81),
+    ('Nuwara Eliya', '2023-11-30'): (15.5, 41.7, 15.6, 86)
+}
+
+@pytest.fixture(autouse=True)
+def mock_mode():
+    previous = forecast.current_model_engine()
+    forecast.use_model_engine(None)
+    forecast.forecast_cache.clear()
+    yield
+    forecast.use_model_engine(previous)
+    forecast.forecast_cache.clear()
+
+def _values(prediction):
+    return prediction['temperature'], prediction['rainfall'], prediction['windspeed'], prediction['confidence']
+
+def test_stream_is_pinned():
+    key = np.array([forecast_key('Colombo', '2024-06-01')], dtype=np.uint64)
+    assert forecast_key('Colombo', '2024-06-01') == 3063694600844739721
+    assert keyed_uniform(key, np.arange(3)).tolist() == [[0.884511903302881, 0.14988438544978339, 0.8985404041621063]]
+    assert keyed_normal(key, np.arange(2)).tolist() == [[0.291490245492542, -0.4142259016220964]]
+
+@pytest.mark.parametrize('district, date', list(PINNED))
+def test_mock_forecast_is_pinned(district, date):
+    assert _values(predict_weather(district, date)) == PINNED[(district, date)]
+
+def test_batch_matches_the_scalar_path():
+    df = predict_weather_batch(['Colombo', 'Jaffna', 'Nuwara Eliya'], ['2023-11-30', '2024-01-15', '2024-06-01'],
+                               cache=False)
+    rows = {(r['district'], r['date']): _values(r) for r in df.to_dict('records')}
+    for pair, values in PINNED.items():
+        assert rows[pair] == values
+
+def test_threads_draw_the_same_forecasts():
+    pairs = list(PINNED) * 20
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(lambda pair: _values(predict_weather(*pair)), pairs))
+    assert results == [PINNED[pair] for pair in pairs]
+
+@pytest.mark.parametrize('hash_seed', ['0', '12345'])
+def test_other_processes_draw_the_same_forecasts(hash_seed):
+    # A salted str hash was what made the old seeding differ per process
+    code = ("import forecast; p = forecast.predict_weather('Colombo', '2024-06-01'); "
+            "print(p['temperature'], p['rainfall'], p['windspeed'], p['confidence'])")
+    env = dict(os.environ, PYTHONHASHSEED=hash_seed, WEATHER_FORECAST_MODE='mock')
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out = subprocess.run([sys.executable, '-c', code], cwd=root, env=env, capture_output=True, text=True, check=True)
+    assert out.stdout.split() == ['30.5', '31.9', '19.8', '85']
@@ -0,0 +1,119 @@
+# tests/test_history.py
+# HistoryStore.append() against a store built from the whole history at
+# once, and the lazy rollup build under concurrent first use.
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import history
+from history import ROLLUP_BINS, VARIABLES, HistoryStore, build_history_store
+
+DISTRICTS = ['Colombo', 'Jaffna', 'Kandy']
+FIRST = pd.date_range('2023-01-01', '2023-12-31', freq='D')
+LATER = pd.date_range('2024-01-01', '2024-03-15', freq='D')
+
+def observations(dates, seed):
+    """Long frame as predictor.pkl holds it, with some days missing"""
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({
+        'district': np.repeat(DISTRICTS, len(dates)),
+        'date': np.tile(dates, len(DISTRICTS))
+    })
+    for variable, source in VARIABLES.items():
+        low, high, _ = ROLLUP_BINS[variable]
+        frame[source] = rng.uniform(low, high / 4, len(frame)).round(1)
+    return frame.drop(index=rng.choice(len(frame), len(frame) // 20, replace=False))
+
+@pytest.fixture
+def first():
+    return observations(FIRST, 0)
+
+@pytest.fixture
+def later():
+    return observations(LATER, 1)
+
+@pytest.fixture
+def store(tmp_path, first):
+    return build_history_store(str(tmp_path / 'store'), first, DISTRICTS)
+
+@pytest.fixture
+def whole(tmp_path, first, later):
+    return build_history_store(str(tmp_path / 'whole'), pd.concat([first, later]), DISTRICTS)
+
+def assert_same_rollups(actual, expected):
+    for name in ('monthly', 'seasonal'):
+        a, e = actual[name], expected[name]
+        for variable in ROLLUP_BINS:
+            np.testing.assert_array_equal(a.count[variable], e.count[variable])
+            np.testing.assert_array_equal(a.maximum[variable], e.maximum[variable])
+            np.testing.assert_array_equal(a.histogram[variable], e.histogram[variable])
+            np.testing.assert_allclose(a.total[variable], e.total[variable], rtol=1e-12)
+
+def test_append_updates_built_rollups(store, whole, later):
+    before = store.rollups()
+    assert store.append(later) == len(LATER)
+    # Updated in place, not rebuilt
+    assert store.rollups() is before
+    assert_same_rollups(before, whole.rollups())
+
+def test_rollups_built_after_an_append_cover_it(store, whole, later):
+    store.append(later)
+    assert_same_rollups(store.rollups(), whole.rollups())
+
+def test_append_extends_the_columns(store, whole, later):
+    store.append(later)
+    np.testing.assert_array_equal(store.dates, whole.dates)
+    for variable in VARIABLES:
+        np.testing.assert_array_equal(store.column(variable), whole.column(variable))
+    pd.testing.assert_frame_equal(store.frame('rainfall', start_year=2024), whole.frame('rainfall', start_year=2024))
+    assert store.years == [2023, 2024]
+
+def test_reopened_store_sees_the_appended_days(store, whole, later):
+    store.append(later)
+    reopened = HistoryStore(store.directory)
+    np.testing.assert_array_equal(reopened.dates, whole.dates)
+    pd.testing.assert_frame_equal(reopened.frame('temperature'), whole.frame('temperature'))
+
+def test_gaps_before_the_appended_days_are_nan(store):
+    day = LATER[9]
+    frame = pd.DataFrame({'district': ['Kandy'], 'date': [day],
+                          **{source: [20.0] for source in VARIABLES.values()}})
+    assert store.append(frame) == 10
+    values = store.frame('temperature', start_year=2024)
+    assert values.index[-1] == day
+    assert values['Kandy'].iloc[-1] == 20.0
+    assert values.isna().sum().sum() == 10 * len(DISTRICTS) - 1
+
+def test_append_rejects_days_already_covered(store, later):
+    store.rollups()
+    overlapping = pd.concat([observations(FIRST[-3:], 2), later])
+    with pytest.raises(ValueError, match='after the store'):
+        store.append(overlapping)
+    assert store.dates[-1] == np.datetime64(FIRST[-1].date())
+    assert store.rollups()['monthly'].count['temperature'].sum() == np.isfinite(store.column('temperature')).sum()
+
+def test_append_ignores_unknown_districts(store, later):
+    frame = later.assign(district='Atlantis')
+    assert store.append(frame) == 0
+    assert len(store.dates) == len(FIRST)
+
+def test_rollups_are_built_once_under_concurrent_use(store, monkeypatch):
+    built = []
+    monthly_cube = history.monthly_cube
+    monkeypatch.setattr(history, 'monthly_cube', lambda districts: built.append(1) or monthly_cube(districts))
+    barrier = threading.Barrier(8)
+    results = []
+
+    def first_use():
+        barrier.wait()
+        results.append(store.rollups())
+
+    threads = [threading.Thread(target=first_use) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(built) == 1
+    assert all(result is results[0] for result in results)
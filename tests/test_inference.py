@@ -0,0 +1,167 @@
+# tests/test_inference.py
+# CompiledNetwork against the reference LSTMNetwork on a small synthetic
+# network, so the check needs neither the shipped artifacts nor Keras, and
+# the engine state cache written from it.
+import os
+import pickle
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import inference
+from inference import (LazyModelEngine, LSTMNetwork, _input_affine, _output_affine, compile_network,
+                       load_engine_state, save_engine_state)
+
+FEATURES = 11
+SEQUENCE_LENGTH = 7
+
+def _lstm(rng, inputs, units, return_sequences):
+    weights = [rng.normal(0, 0.4, (inputs, 4 * units)), rng.normal(0, 0.4, (units, 4 * units)),
+               rng.normal(0, 0.2, 4 * units)]
+    return ('LSTM', {'units': units, 'return_sequences': return_sequences}, weights)
+
+def _dense(rng, inputs, units, activation):
+    return ('Dense', {'activation': activation}, [rng.normal(0, 0.5, (inputs, units)), rng.normal(0, 0.1, units)])
+
+def _batch_norm(rng, units):
+    weights = [rng.uniform(0.5, 1.5, units), rng.normal(0, 0.1, units),
+               rng.normal(0, 0.2, units), rng.uniform(0.5, 2.0, units)]
+    return ('BatchNormalization', {'epsilon': 1e-3}, weights)
+
+def synthetic_network(seed=0):
+    """Every layer kind the engine's network uses, with random weights"""
+    rng = np.random.default_rng(seed)
+    layers = [
+        _lstm(rng, FEATURES, 6, True),
+        _batch_norm(rng, 6),
+        ('Dropout', {}, []),
+        _lstm(rng, 6, 5, False),
+        _batch_norm(rng, 5),
+        _dense(rng, 5, 8, 'relu'),
+        _dense(rng, 8, 3, 'linear')
+    ]
+    return LSTMNetwork([(kind, config, [w.astype(np.float32) for w in weights])
+                        for kind, config, weights in layers], SEQUENCE_LENGTH)
+
+def synthetic_scalers(seed=1):
+    """Stand-ins for the fitted StandardScaler on the inputs and MinMaxScaler on the outputs"""
+    rng = np.random.default_rng(seed)
+    feature_scaler = SimpleNamespace(with_mean=True, with_std=True, n_features_in_=FEATURES,
+                                     mean_=rng.normal(20, 5, FEATURES), scale_=rng.uniform(1, 10, FEATURES))
+    target_scaler = SimpleNamespace(scale_=rng.uniform(0.01, 0.1, 3), min_=rng.normal(0, 0.5, 3))
+    return feature_scaler, target_scaler
+
+def sequences(batch, seed=2, loc=0.0, scale=1.0):
+    return np.random.default_rng(seed).normal(loc, scale, (batch, SEQUENCE_LENGTH, FEATURES)).astype(np.float32)
+
+@pytest.mark.parametrize('batch', [1, 25, 300])
+def test_compiled_matches_reference(batch):
+    network = synthetic_network()
+    x = sequences(batch)
+    np.testing.assert_allclose(compile_network(network).predict(x), network.predict(x), atol=1e-5)
+
+@pytest.mark.parametrize('batch', [1, 25, 300])
+def test_compiled_folds_scalers(batch):
+    network = synthetic_network()
+    feature_scaler, target_scaler = synthetic_scalers()
+    x = sequences(batch, loc=20.0, scale=5.0)
+    scaled = (x - feature_scaler.mean_) / feature_scaler.scale_
+    reference = (network.predict(scaled) - target_scaler.min_) / target_scaler.scale_
+    compiled = compile_network(network, feature_scaler, target_scaler)
+    np.testing.assert_allclose(compiled.predict(x), reference, rtol=1e-4, atol=1e-3)
+
+def test_single_rows_match_the_batch():
+    compiled = compile_network(synthetic_network())
+    x = sequences(16)
+    rows = np.concatenate([compiled.predict(x[i:i + 1]) for i in range(len(x))])
+    np.testing.assert_allclose(rows, compiled.predict(x), atol=1e-6)
+
+def test_compiled_network_pickles_its_buffer_once():
+    compiled = compile_network(synthetic_network())
+    restored = pickle.loads(pickle.dumps(compiled))
+    assert set(compiled.__getstate__()) == {'buffer', 'layout', 'sequence_length'}
+    x = sequences(4)
+    np.testing.assert_array_equal(restored.predict(x), compiled.predict(x))
+
+def test_rejects_other_lstm_activations():
+    network = synthetic_network()
+    kind, config, weights = network.layers[0]
+    network.layers[0] = (kind, dict(config, activation='relu'), weights)
+    with pytest.raises(ValueError):
+        compile_network(network)
+
+# ---- Engine state cache ----
+
+DISTRICTS = ['Colombo', 'Nuwara Eliya']
+
+def synthetic_state():
+    """An engine state as build_engine_state returns it, on the synthetic network"""
+    rng = np.random.default_rng(3)
+    network = synthetic_network()
+    feature_scaler, target_scaler = synthetic_scalers()
+    dates = np.arange(np.datetime64('2023-01-01'), np.datetime64('2023-03-01')).astype('datetime64[ns]')
+    return {
+        'version': 'lstm-test',
+        'network': network,
+        'compiled': compile_network(network, feature_scaler, target_scaler),
+        'input_affine': _input_affine(feature_scaler),
+        'output_affine': _output_affine(target_scaler),
+        'district_classes': np.array(DISTRICTS),
+        'feature_columns': [f'feature_{i}' for i in range(FEATURES)],
+        'history': {d: {'dates': dates.view(np.int64).copy(), 'values': rng.normal(25, 5, (len(dates), 5))}
+                    for d in DISTRICTS},
+        'climatology': {d: rng.normal(25, 5, (367, 5)) for d in DISTRICTS}
+    }
+
+def test_engine_state_round_trip(tmp_path):
+    state = synthetic_state()
+    save_engine_state(state, str(tmp_path / 'state'))
+    loaded = load_engine_state(str(tmp_path / 'state'))
+    assert isinstance(loaded['compiled'].buffer, np.memmap)
+    assert loaded['version'] == state['version']
+    assert loaded['feature_columns'] == state['feature_columns']
+    assert loaded['district_classes'].tolist() == DISTRICTS
+    for side in ('input_affine', 'output_affine'):
+        for actual, expected in zip(loaded[side], state[side]):
+            np.testing.assert_array_equal(actual, expected)
+    for d in DISTRICTS:
+        for key in ('dates', 'values'):
+            np.testing.assert_array_equal(loaded['history'][d][key], state['history'][d][key])
+        np.testing.assert_array_equal(loaded['climatology'][d], state['climatology'][d])
+    x = sequences(8, loc=20.0, scale=5.0)
+    np.testing.assert_array_equal(loaded['compiled'].predict(x), state['compiled'].predict(x))
+    np.testing.assert_array_equal(loaded['network'].predict(x), state['network'].predict(x))
+
+def test_lazy_engine_fills_then_maps_the_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(inference, 'build_engine_state', lambda directory: synthetic_state())
+    first = LazyModelEngine(str(tmp_path), cache_dir=str(tmp_path / 'cache'), version='lstm-test')
+    assert first.load() is not None
+    assert first.load_report['source'] == 'pickle'
+    second = LazyModelEngine(str(tmp_path), cache_dir=str(tmp_path / 'cache'), version='lstm-test')
+    assert second.load().districts == DISTRICTS
+    assert second.load_report['source'] == 'mmap'
+
+detonations = []
+
+def _detonate():
+    detonations.append(1)
+    return 0
+
+class Payload:
+    def __reduce__(self):
+        return _detonate, ()
+
+def test_pickled_arrays_in_the_cache_are_refused(tmp_path):
+    cache_dir = tmp_path / 'cache'
+    engine = LazyModelEngine(str(tmp_path), cache_dir=str(cache_dir), version='lstm-test')
+    save_engine_state(synthetic_state(), engine._cache_path())
+    np.save(os.path.join(engine._cache_path(), 'compiled.npy'), np.array([Payload()], dtype=object),
+            allow_pickle=True)
+    # Read into memory too, where memory-mapping would not refuse it first
+    for mmap_mode in ('r', None):
+        with pytest.raises(ValueError):
+            load_engine_state(engine._cache_path(), mmap_mode)
+    assert engine.load() is None
+    assert not engine.available
+    assert detonations == []
@@ -0,0 +1,148 @@
+# tests/test_registry.py
+# reload_model() against a registry in a temporary directory. The engine is
+# a stub, so neither the shipped artifacts nor their load time are needed;
+# the manifest, checksums and cache handling are the real ones.
+import json
+
+import numpy as np
+import plotly.graph_objects as go
+import pytest
+
+import figures
+import forecast
+import history
+import registry
+from inference import ENGINE_FILES
+from registry import ModelRegistry, RegistryError, reload_model
+
+class StubEngine:
+    """Stands in for LazyModelEngine: forecasts one temperature per version"""
+
+    temperatures = {}
+
+    def __init__(self, directory, cache_dir=None, version=None):
+        self.directory = directory
+        self.version = version
+        self.available = True
+
+    def warm_up(self):
+        self.available = self.version in self.temperatures
+
+    def supports(self, district):
+        return True
+
+    def predict(self, districts, dates):
+        outputs = np.empty((len(districts), len(dates), 3))
+        outputs[...] = (self.temperatures[self.version], 10.0, 15.0)
+        return outputs
+
+def _artifacts(directory, marker):
+    directory.mkdir()
+    for name in ENGINE_FILES:
+        (directory / name).write_bytes(f'{name} {marker}'.encode())
+    return directory
+
+@pytest.fixture
+def models(tmp_path, monkeypatch):
+    """A registry holding versions 'old' and 'new' of stub artifacts, 'old' active"""
+    monkeypatch.delenv('WEATHER_FORECAST_MODE', raising=False)
+    monkeypatch.setattr(registry, 'LazyModelEngine', StubEngine)
+    # Each history store opened is a new object
+    monkeypatch.setattr(history, 'load_history_store', lambda: object())
+    previous = forecast.current_model_engine()
+    models = ModelRegistry(str(tmp_path / 'registry'))
+    old = models.register(str(_artifacts(tmp_path / 'old', 1)), note='old')
+    new = models.register(str(_artifacts(tmp_path / 'new', 2)), note='new')
+    monkeypatch.setattr(StubEngine, 'temperatures', {old: 31.0, new: 24.0})
+    forecast.use_model_engine(None)
+    yield models, old, new
+    forecast.use_model_engine(previous)
+    forecast.forecast_cache.clear()
+    forecast.clear_snapshots()
+    figures.figure_cache.clear()
+    history.forget_history_store()
+
+def chart(value):
+    return go.Figure(go.Bar(y=[value]))
+
+def cached_versions():
+    """Model versions with entries in each cache"""
+    return {
+        'forecasts': {key[-1] for key in forecast.forecast_cache._entries},
+        'snapshots': {key[-1] for key in forecast._snapshots},
+        'figures': {key[-1] for key in figures.figure_cache._entries}
+    }
+
+def test_registered_versions(models):
+    models, old, new = models
+    assert models.active() == old
+    assert list(models.versions()) == [old, new]
+    assert old != new
+    with open(models.manifest_path) as f:
+        assert json.load(f)['versions'][new]['note'] == 'new'
+
+def test_reload_drops_the_replaced_versions_caches(models):
+    models, old, new = models
+    assert reload_model(registry=models) == old
+    assert forecast.model_version() == old
+
+    # Fill every cache while the old version serves
+    assert forecast.predict_weather('Colombo', '2024-06-02')['temperature'] == 31.0
+    forecast.island_snapshot('2024-06-02')
+    figures.cached_figure(chart, 1)
+    old_store = history.history_store()
+    # Entries of other versions are left alone
+    figures.figure_cache.put(('tests', 'chart', (), 'other'), chart(2))
+    assert cached_versions() == {'forecasts': {old}, 'snapshots': {old}, 'figures': {old, 'other'}}
+
+    models.activate(new)
+    assert reload_model(registry=models) == new
+    assert forecast.model_version() == new
+    assert cached_versions() == {'forecasts': set(), 'snapshots': set(), 'figures': {'other'}}
+    assert history.history_store() is not old_store
+
+    # The new version computes and caches its own forecasts
+    assert forecast.predict_weather('Colombo', '2024-06-02')['temperature'] == 24.0
+    assert forecast.island_snapshot('2024-06-02').frame(['Colombo'])['temperature'].tolist() == [24.0]
+    assert cached_versions()['forecasts'] == {new}
+
+def test_reload_is_a_noop_for_the_serving_version(models):
+    models, old, _ = models
+    assert reload_model(registry=models) == old
+    engine = forecast.current_model_engine()
+    store = history.history_store()
+    assert reload_model(registry=models) is None
+    assert forecast.current_model_engine() is engine
+    assert history.history_store() is store
+
+def test_reload_to_a_named_version(models):
+    models, old, new = models
+    assert reload_model(new, registry=models) == new
+    assert models.active() == old
+
+def test_tampered_artifacts_are_refused(models):
+    models, old, new = models
+    reload_model(registry=models)
+    engine = forecast.current_model_engine()
+    forecast.predict_weather('Colombo', '2024-06-02')
+    with open(f'{models.path(new)}/{ENGINE_FILES[0]}', 'ab') as f:
+        f.write(b'!')
+    with pytest.raises(RegistryError, match='checksum'):
+        reload_model(new, registry=models)
+    assert forecast.current_model_engine() is engine
+    assert cached_versions()['forecasts'] == {old}
+
+def test_engines_that_fail_to_load_are_refused(models):
+    models, old, new = models
+    reload_model(registry=models)
+    engine = forecast.current_model_engine()
+    StubEngine.temperatures.pop(new)
+    with pytest.raises(RegistryError, match='could not be loaded'):
+        reload_model(new, registry=models)
+    assert forecast.current_model_engine() is engine
+
+def test_mock_mode_never_reloads(models, monkeypatch):
+    models, _, _ = models
+    monkeypatch.setenv('WEATHER_FORECAST_MODE', 'mock')
+    assert reload_model(registry=models) is None
+    assert forecast.current_model_engine() is None
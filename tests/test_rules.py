@@ -0,0 +1,171 @@
+# tests/test_rules.py
+# alerts.RULES, through rules.classify() and the scalar helpers, against the
+# if-ladders app.py had before the table, at every threshold and the floats
+# either side of it.
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import alerts
+from rules import classify
+
+# ---- The original helpers, verbatim but for their names ----
+
+def baseline_weather_type(prediction):
+    if prediction['rainfall'] > 30:
+        return 'storm' if prediction['windspeed'] > 30 else 'rainy'
+    elif prediction['temperature'] > 33:
+        return 'hot'
+    elif prediction['temperature'] < 22:
+        return 'cold'
+    elif prediction['windspeed'] > 25:
+        return 'windy'
+    elif prediction['rainfall'] > 10:
+        return 'rainy'
+    else:
+        return 'sunny'
+
+def baseline_temperature_trend(temp):
+    if temp > 33:
+        return "Hot"
+    elif temp < 22:
+        return "Cool"
+    else:
+        return "Normal"
+
+def baseline_rainfall_status(rainfall):
+    if rainfall > 50:
+        return "Heavy"
+    elif rainfall > 20:
+        return "Moderate"
+    elif rainfall > 0:
+        return "Light"
+    else:
+        return "None"
+
+def baseline_wind_status(windspeed):
+    if windspeed > 40:
+        return "Storm"
+    elif windspeed > 20:
+        return "Strong"
+    else:
+        return "Normal"
+
+def baseline_severe(prediction):
+    return (prediction['temperature'] > 35 or
+            prediction['rainfall'] > 50 or
+            prediction['windspeed'] > 40)
+
+def baseline_alert_level(pred, i):
+    alert_level = "low"
+    temp_threshold = 30 + (i * 1)
+    rain_threshold = 15 + (i * 5)
+    wind_threshold = 15 + (i * 3)
+    if pred['temperature'] > temp_threshold + 3 or pred['rainfall'] > rain_threshold + 15 or pred['windspeed'] > wind_threshold + 10:
+        alert_level = "high"
+    elif pred['temperature'] > temp_threshold or pred['rainfall'] > rain_threshold or pred['windspeed'] > wind_threshold:
+        alert_level = "medium"
+    return alert_level
+
+def baseline_risk_score(pred):
+    score = 0
+    if pred['temperature'] > 35: score += 3
+    if pred['rainfall'] > 50: score += 5
+    if pred['rainfall'] > 20: score += 2
+    if pred['windspeed'] > 40: score += 4
+    if pred['windspeed'] > 20: score += 1
+    return score
+
+def baseline_risk_levels(scores):
+    return pd.cut(pd.Series(scores), bins=[-1, 2, 5, 10], labels=['Low', 'Medium', 'High'])
+
+# ---- Threshold edges ----
+
+POSITIONS = range(len(alerts.ALERT_DISTRICTS))
+
+def _thresholds(variable):
+    """Every threshold of `variable` in the table, at every panel position"""
+    found = set()
+    for spec in alerts.RULES.values():
+        for _, tests in spec.get('rows') or spec['points']:
+            for name, _, threshold, *step in tests:
+                if name == variable:
+                    found.update(threshold + (step[0] * p if step else 0) for p in POSITIONS)
+    return found
+
+def edges(variable):
+    """Each threshold and the nearest floats below and above it"""
+    values = set()
+    for t in _thresholds(variable):
+        values.update([np.nextafter(t, -np.inf), float(t), np.nextafter(t, np.inf)])
+    return sorted(values)
+
+@pytest.fixture(scope='module')
+def grid():
+    rows = list(itertools.product(edges('temperature'), edges('rainfall'), edges('windspeed')))
+    return pd.DataFrame(rows, columns=['temperature', 'rainfall', 'windspeed'])
+
+def test_edges_cover_every_threshold():
+    assert {22, 33, 35}.issubset(edges('temperature'))
+    assert {0, 10, 20, 30, 50}.issubset(edges('rainfall'))
+    assert {20, 25, 30, 40}.issubset(edges('windspeed'))
+
+# ---- Vectorized classification ----
+
+@pytest.mark.parametrize('rule, baseline', [
+    ('weather_type', baseline_weather_type),
+    ('temperature_trend', lambda p: baseline_temperature_trend(p['temperature'])),
+    ('rainfall_status', lambda p: baseline_rainfall_status(p['rainfall'])),
+    ('wind_status', lambda p: baseline_wind_status(p['windspeed'])),
+    ('severe', baseline_severe),
+    ('risk_score', baseline_risk_score)
+])
+def test_classify_matches_the_baseline(grid, rule, baseline):
+    expected = [baseline(p) for p in grid.to_dict('records')]
+    assert classify(grid, [rule])[rule].tolist() == expected
+
+@pytest.mark.parametrize('position', POSITIONS)
+def test_alert_levels_match_the_baseline(grid, position):
+    expected = [baseline_alert_level(p, position) for p in grid.to_dict('records')]
+    assert classify(grid, ['alert_level'], position)['alert_level'].tolist() == expected
+
+def test_alert_levels_by_panel_position(grid):
+    # The whole panel in one call, a position per row
+    positions = np.arange(len(grid)) % len(POSITIONS)
+    expected = [baseline_alert_level(p, i) for p, i in zip(grid.to_dict('records'), positions)]
+    assert classify(grid, ['alert_level'], positions)['alert_level'].tolist() == expected
+
+def test_risk_levels_match_the_baseline(grid):
+    scores = [baseline_risk_score(p) for p in grid.to_dict('records')]
+    expected = baseline_risk_levels(scores)
+    levels = classify(grid, ['risk_level'])['risk_level']
+    binned = expected.notna().to_numpy()
+    assert levels[binned].tolist() == expected[binned].astype(str).tolist()
+    # The one deliberate change: pd.cut left scores above 10 without a level
+    assert (np.asarray(scores)[~binned] > 10).all()
+    assert set(levels[~binned].tolist()) == {'High'}
+
+@pytest.mark.parametrize('score, level', [(0, 'Low'), (2, 'Low'), (3, 'Medium'), (5, 'Medium'), (6, 'High'),
+                                          (10, 'High'), (11, 'High'), (15, 'High')])
+def test_risk_level_bins(score, level):
+    assert alerts.evaluate('risk_level', {'risk_score': score}) == level
+
+# ---- Scalar helpers ----
+
+def test_scalar_helpers_match_the_baseline(grid):
+    for p in grid.to_dict('records'):
+        assert alerts.get_weather_type(p) == baseline_weather_type(p)
+        assert alerts.get_temperature_trend(p['temperature']) == baseline_temperature_trend(p['temperature'])
+        assert alerts.get_rainfall_status(p['rainfall']) == baseline_rainfall_status(p['rainfall'])
+        assert alerts.get_wind_status(p['windspeed']) == baseline_wind_status(p['windspeed'])
+        assert alerts.is_severe_weather(p) == baseline_severe(p)
+        assert alerts.evaluate('risk_score', p) == baseline_risk_score(p)
+
+@pytest.mark.parametrize('position', POSITIONS)
+def test_scalar_alert_levels_match_the_baseline(grid, position):
+    for p in grid.to_dict('records'):
+        level, message = alerts.get_alert_level(p, position)
+        assert level == baseline_alert_level(p, position)
+        assert message == alerts.ALERT_MESSAGES[level]